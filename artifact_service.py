@@ -1,22 +1,68 @@
 import json
 import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, FrozenSet
 
 from repositories.artifact_repository import save_artifact, get_last_version, supersede_artifact
 from repositories.base import transaction
-from validation import validate_json_output, ValidationError, REQUIRED_FIELDS
+from validation import validate_json_output, ValidationError, REQUIRED_FIELDS, ValidatorRegistry, item_validator
+from utils.json_stream import IncrementalJSONParser, JSONStreamError  # ADDED
+from domain.artifact_repair import build_repair_messages, collect_item_errors, merge_patch, parse_patch  # ADDED
+from domain.prompt_template import compile_template, input_var_name, DEFAULT_USER_PROMPT_TEMPLATE  # ADDED
+from utils.metrics import counter  # ADDED
+from utils.tracing import span  # ADDED
 
 logger = logging.getLogger("artifact-service")
 
+# ADDED: исходы генерации — доля починок против перегенераций и цена ранних обрывов потока
+GENERATION_ATTEMPTS = counter("artifact_generation_attempts_total", "LLM generation attempts.", ("mode",))
+GENERATION_OUTCOMES = counter(
+    "artifact_generation_total", "Generation outcomes: early_abort, repaired, repair_failed, regenerated.", ("outcome",)
+)
+REPAIR_ROUNDS = counter("artifact_generation_repair_rounds_total", "Patch repair rounds sent to the LLM.")
+ABORTED_CHARS = counter("artifact_generation_aborted_chars_total", "Characters received before an early abort.")
+
+def _close_stream(stream) -> None:
+    """Закрывает HTTP-поток completion, чтобы провайдер перестал генерировать токены."""
+    close = getattr(stream, "close", None) or getattr(getattr(stream, "response", None), "close", None)
+    if close:
+        try:
+            close()
+        except Exception as e:
+            logger.debug(f"Failed to close completion stream: {e}")
+
+
 class ArtifactService:
     """
     Универсальный сервис для генерации артефактов.
     Все настройки передаются через generation_config (из ноды).
     """
 
-    def __init__(self, groq_client):
+    def __init__(
+        self,
+        groq_client,
+        validator_registry: Optional[ValidatorRegistry] = None,
+        stream_structured: bool = True,
+        max_repair_items: int = 5,
+        max_repair_rounds: int = 2,
+    ):
         self.groq_client = groq_client
+        # ADDED: валидаторы из artifact_types.schema; без реестра — встроенные REQUIRED_FIELDS
+        self.validator_registry = validator_registry
+        # ADDED: пакеты (JSON-массивы) генерируются потоково с проверкой каждого элемента
+        self.stream_structured = stream_structured
+        # ADDED: сколько невалидных элементов ещё чиним патчем и сколько раундов починки пробуем
+        self.max_repair_items = max_repair_items
+        self.max_repair_rounds = max_repair_rounds
+
+    async def _get_validator(self, artifact_type: str):
+        """Возвращает (validator, requires_json): JSON обязателен, если для типа есть правила."""
+        if self.validator_registry is None:
+            return (lambda content: validate_json_output(content, artifact_type)), artifact_type in REQUIRED_FIELDS
+        validator = await self.validator_registry.get(artifact_type)
+        if validator is None:
+            return (lambda content: (True, "OK")), False
+        return validator, True
 
     async def _call_llm_with_retry(
         self,
@@ -28,28 +74,47 @@ class ArtifactService:
     ) -> Any:
         attempt = 0
         last_error = None
+        validator, requires_json = await self._get_validator(artifact_type)
+        check_item = item_validator(validator)
+        messages = [
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
         while attempt <= retries:
             try:
-                response = self.groq_client.create_completion(
-                    model=model_id or "llama-3.3-70b-versatile",
-                    messages=[
-                        {"role": "system", "content": sys_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    temperature=0.6,
-                )
-                result_text = response.choices[0].message.content
+                if attempt:
+                    GENERATION_OUTCOMES.labels("regenerated").inc()
+                item_errors = None
+                if check_item is not None and self.stream_structured:
+                    result_data, item_errors = await self._generate_streaming(messages, model_id, check_item)
+                else:
+                    GENERATION_ATTEMPTS.labels("completion").inc()
+                    # CHANGED: синхронный клиент вызывается в потоке, чтобы не блокировать event loop
+                    response = await asyncio.to_thread(
+                        self.groq_client.create_completion,
+                        model=model_id or "llama-3.3-70b-versatile",
+                        messages=messages,
+                        temperature=0.6,
+                    )
+                    result_text = response.choices[0].message.content
 
-                try:
-                    result_data = json.loads(result_text)
-                except json.JSONDecodeError:
-                    if artifact_type in REQUIRED_FIELDS:
-                        raise ValueError("Response is not valid JSON")
-                    else:
-                        result_data = {"text": result_text}
-
-                valid, msg = validate_json_output(result_data, artifact_type)
+                    try:
+                        result_data = json.loads(result_text)
+                    except json.JSONDecodeError:
+                        if requires_json:
+                            raise ValueError("Response is not valid JSON")
+                        else:
+                            result_data = {"text": result_text}
+
+                valid, msg = validator(result_data)
                 if not valid:
+                    # CHANGED: сначала чиним только проблемные элементы, полная перегенерация — запасной путь
+                    if item_errors is None and check_item is not None:
+                        item_errors = collect_item_errors(result_data, check_item)
+                    if item_errors:
+                        repaired = await self._repair(sys_prompt, model_id, result_data, item_errors, validator, check_item)
+                        if repaired is not None:
+                            return repaired
                     raise ValueError(f"Validation failed: {msg}")
 
                 return result_data
@@ -67,23 +132,118 @@ class ArtifactService:
 
         raise ValidationError(f"Failed to generate valid {artifact_type} after {retries+1} attempts. Last error: {last_error}")
 
-    def _prepare_context(self, config: dict, input_artifacts: List[Dict]) -> Dict[str, str]:
-        """Преобразует входные артефакты в переменные для шаблона."""
+    async def _generate_streaming(self, messages: List[Dict[str, str]], model_id: Optional[str], check_item):
+        """
+        Стримит структурированную генерацию, разбирая JSON по мере поступления токенов.
+        Каждый закрывшийся элемент массива сразу проверяется. Ошибки элементов копятся для
+        точечной починки; синтаксическая ошибка или больше max_repair_items плохих элементов
+        невосстановимы — поток закрывается, и попытка стоит только префикс токенов.
+        Возвращает (data, item_errors).
+        """
+        GENERATION_ATTEMPTS.labels("streamed").inc()
+        # CHANGED: клиент и поток синхронные — чтение и разбор целиком в потоке, event loop свободен
+        return await asyncio.to_thread(self._stream_and_parse, messages, model_id, check_item)
+
+    def _stream_and_parse(self, messages: List[Dict[str, str]], model_id: Optional[str], check_item):
+        parser = IncrementalJSONParser()
+        item_errors = []
+        stream = self.groq_client.create_completion(
+            model=model_id or "llama-3.3-70b-versatile",
+            messages=messages,
+            stream=True,
+            temperature=0.6,
+        )
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                try:
+                    items = parser.feed(delta)
+                except JSONStreamError as e:
+                    raise ValueError(f"Response is not valid JSON: {e}")
+                for index, item in items:
+                    valid, msg = check_item(item, index)
+                    if not valid:
+                        item_errors.append((index, msg))
+                        if len(item_errors) > self.max_repair_items:
+                            raise ValueError(f"Validation failed: {msg}")
+        except ValueError:
+            GENERATION_OUTCOMES.labels("early_abort").inc()
+            ABORTED_CHARS.inc(len(parser.text))
+            logger.info(f"Aborted structured generation after {len(parser.text)} chars, {parser.items_parsed} items")
+            raise
+        finally:
+            _close_stream(stream)
+
+        try:
+            return parser.result(), item_errors
+        except JSONStreamError as e:
+            raise ValueError(str(e))
+
+    async def _repair(self, sys_prompt: str, model_id: Optional[str], data: Any, item_errors, validator, check_item) -> Optional[Any]:
+        """
+        Просит модель исправить только элементы с ошибками и вливает патч в прежний вывод.
+        Возвращает исправленные данные или None, если починка не удалась.
+        """
+        if not isinstance(data, list) or len(item_errors) > self.max_repair_items:
+            return None
+        for round_no in range(1, self.max_repair_rounds + 1):
+            REPAIR_ROUNDS.inc()
+            bad = {index for index, _ in item_errors}
+            try:
+                response = await asyncio.to_thread(
+                    self.groq_client.create_completion,
+                    model=model_id or "llama-3.3-70b-versatile",
+                    messages=build_repair_messages(sys_prompt, data, item_errors),
+                    temperature=0.2,
+                )
+                patch = parse_patch(response.choices[0].message.content)
+            except Exception as e:
+                logger.warning(f"Repair round {round_no} failed: {e}")
+                continue
+            data = merge_patch(data, patch, allowed=bad)
+            valid, msg = validator(data)
+            if valid:
+                GENERATION_OUTCOMES.labels("repaired").inc()
+                logger.info(f"Repaired {len(bad)} item(s) in {round_no} round(s)")
+                return data
+            item_errors = collect_item_errors(data, check_item)
+            if not item_errors:
+                # Ошибка уровня документа (например, minItems) — патчем элементов не исправить
+                break
+        GENERATION_OUTCOMES.labels("repair_failed").inc()
+        return None
+
+    def _prepare_context(
+        self,
+        config: dict,
+        input_artifacts: List[Dict],
+        fields: Optional[FrozenSet[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Преобразует входные артефакты в переменные для шаблона.
+        CHANGED: если передан fields, строятся только переменные, которые использует шаблон
+        (all_artifacts с сериализацией всех входов — самая дорогая из них).
+        """
         context = {}
 
-        all_parts = []
-        for art in input_artifacts:
-            all_parts.append(f"--- {art['type']} (id: {art['id']}) ---\n{json.dumps(art['content'], indent=2)}")
-        context["all_artifacts"] = "\n\n".join(all_parts)
+        if fields is None or "all_artifacts" in fields:
+            all_parts = []
+            for art in input_artifacts:
+                all_parts.append(f"--- {art['type']} (id: {art['id']}) ---\n{json.dumps(art['content'], indent=2)}")
+            context["all_artifacts"] = "\n\n".join(all_parts)
 
         for req_type in config.get("required_input_types", []):
+            var_name = input_var_name(req_type)
             art = next((a for a in input_artifacts if a["type"] == req_type), None)
-            var_name = req_type[0].lower() + req_type[1:]
-            if art:
-                context[var_name] = json.dumps(art["content"], indent=2)
-            else:
+            if not art:
                 logger.warning(f"Required input type '{req_type}' not found")
-                context[var_name] = ""
+            if fields is not None and var_name not in fields:
+                continue
+            context[var_name] = json.dumps(art["content"], indent=2) if art else ""
 
         return context
 
@@ -119,47 +279,48 @@ class ArtifactService:
         if not system_prompt:
             raise ValueError("generation_config must contain 'system_prompt'")
 
-        template = generation_config.get("user_prompt_template")
-        if not template:
-            template = "Context:\n{all_artifacts}\n\nUser input:\n{user_input}"
+        # CHANGED: шаблон разбирается один раз (кэш), ошибки всплывают до обращения к LLM
+        template = compile_template(generation_config.get("user_prompt_template") or DEFAULT_USER_PROMPT_TEMPLATE)
 
-        context = self._prepare_context(generation_config, input_artifacts)
+        context = self._prepare_context(generation_config, input_artifacts, template.fields)
         context["user_input"] = user_input
 
-        user_prompt = template.format(**context)
+        user_prompt = template.render(context)
 
-        result_data = await self._call_llm_with_retry(
-            sys_prompt=system_prompt,
-            user_prompt=user_prompt,
-            model_id=model_id,
-            artifact_type=artifact_type
-        )
+        with span("artifact.llm", artifact_type=artifact_type, model=model_id):
+            result_data = await self._call_llm_with_retry(
+                sys_prompt=system_prompt,
+                user_prompt=user_prompt,
+                model_id=model_id,
+                artifact_type=artifact_type
+            )
 
         # Логика версионирования: если указан logical_key, определяем следующую версию и заменяем активную
-        async with transaction() as tx:
-            next_version = 1
-            old_id = None
-            if logical_key and project_id:
-                last = await get_last_version(project_id, logical_key, tx=tx)
-                if last:
-                    next_version = last['version'] + 1
-                    if last['status'] == 'ACTIVE':
-                        old_id = last['id']
-
-            artifact_id = await save_artifact(
-                artifact_type=artifact_type,
-                content=result_data,
-                owner="system",
-                version=next_version,
-                status="ACTIVE",  # новая версия становится активной
-                project_id=project_id,
-                parent_id=None,
-                logical_key=logical_key,
-                tx=tx
-            )
+        with span("artifact.save", artifact_type=artifact_type):
+            async with transaction() as tx:
+                next_version = 1
+                old_id = None
+                if logical_key and project_id:
+                    last = await get_last_version(project_id, logical_key, tx=tx)
+                    if last:
+                        next_version = last['version'] + 1
+                        if last['status'] == 'ACTIVE':
+                            old_id = last['id']
+
+                artifact_id = await save_artifact(
+                    artifact_type=artifact_type,
+                    content=result_data,
+                    owner="system",
+                    version=next_version,
+                    status="ACTIVE",  # новая версия становится активной
+                    project_id=project_id,
+                    parent_id=None,
+                    logical_key=logical_key,
+                    tx=tx
+                )
 
-            if old_id:
-                await supersede_artifact(old_id, artifact_id, tx=tx)
+                if old_id:
+                    await supersede_artifact(old_id, artifact_id, tx=tx)
 
         logger.info(f"Generated artifact {artifact_id} of type {artifact_type} (version {next_version}, logical_key={logical_key})")
         return artifact_id
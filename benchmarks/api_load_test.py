@@ -0,0 +1,125 @@
+"""
+Load test: requests/sec of the API as the number of uvicorn workers grows.
+
+    python benchmarks/api_load_test.py [--workers 1,2,4] [--path /api/modes] \
+        [--duration 10] [--clients 4] [--concurrency 32]
+
+For every worker count it starts `uvicorn server:app --workers N` on a free port
+(environment as for the server itself; TEST_MODE=true unless set, so no session is
+needed), waits for /health, then drives it from --clients load-generator processes
+with --concurrency connections each, and prints throughput and latency.
+The load generators share the machine with the server, so run it on a host with
+more cores than the largest worker count for meaningful scaling numbers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(workers: int, port: int) -> subprocess.Popen:
+    env = {"TEST_MODE": "true", **os.environ, "API_WORKERS": str(workers)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def _wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become ready")
+
+
+async def _drive(base_url: str, path: str, duration: float, concurrency: int):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def loop():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    if resp.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def _client_process(args):
+    return asyncio.run(_drive(*args))
+
+
+def run_level(workers: int, args) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = _start_server(workers, port)
+    try:
+        _wait_ready(base_url)
+        # Прогрев: соединения, кэши, импорты во всех процессах
+        asyncio.run(_drive(base_url, args.path, 1.0, args.concurrency))
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(
+                _client_process, [(base_url, args.path, args.duration, args.concurrency)] * args.clients
+            )
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    latencies = sorted(l for lat, _ in results for l in lat)
+    return {
+        "rps": len(latencies) / args.duration,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": sum(e for _, e in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--path", default="/api/modes")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, GET {args.path}, {args.clients}x{args.concurrency} connections")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'scaling':>9}")
+    base = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        result = run_level(workers, args)
+        base = base or result["rps"]
+        print(f"{workers:>8}{result['rps']:>10.0f}{result['p50']:>9.1f}{result['p99']:>9.1f}"
+              f"{result['errors']:>8}{result['rps'] / base:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Storage and transfer benchmark for compressed artifact bodies (utils.compression).
+
+    python benchmarks/artifact_compression_bench.py [--packages 200] [--items 40]
+
+Generates requirement packages shaped like BusinessRequirementPackage. The dictionary
+is trained on the first half of them. The report covers the other half, stored as:
+plain canonical JSON, zlib without a dictionary, and zlib with the trained
+dictionary. It also prints the bytes a project list ships with bodies and with
+include_content=false (summary only), and the decompression throughput.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from repositories.artifact_repository import _summarize  # noqa: E402
+from utils.compression import COMPRESSION_THRESHOLD, compress, decompress, train_dictionary  # noqa: E402
+from utils.hash import canonical_json  # noqa: E402
+
+WORDS = ("the system shall allow user to export report within seconds after login "
+         "admin manager must review approve each request audit log store data secure "
+         "performance availability payment invoice customer order notification").split()
+PRIORITIES = ["MUST", "SHOULD", "COULD", "WONT"]
+STAKEHOLDERS = ["Product Owner", "Operations", "Finance", "Security Officer", "End User"]
+
+
+def make_package(rng: random.Random, items: int) -> list:
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+    return [
+        {
+            "id": f"{rng.getrandbits(128):032x}",
+            "description": sentence(rng.randint(20, 60)),
+            "priority": rng.choice(PRIORITIES),
+            "stakeholder": rng.choice(STAKEHOLDERS),
+            "acceptance_criteria": [sentence(rng.randint(8, 20)) for _ in range(rng.randint(2, 5))],
+            "business_value": sentence(rng.randint(10, 25)),
+        }
+        for _ in range(items)
+    ]
+
+
+def _fmt(n: int) -> str:
+    return f"{n / 1024 / 1024:.2f} MB" if n >= 1024 * 1024 else f"{n / 1024:.1f} KB"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--packages", type=int, default=200)
+    parser.add_argument("--items", type=int, default=40)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    packages = [make_package(rng, args.items) for _ in range(args.packages)]
+    train, test = packages[: len(packages) // 2], packages[len(packages) // 2:]
+
+    start = time.perf_counter()
+    zdict = train_dictionary(train)
+    train_time = time.perf_counter() - start
+
+    raw = [canonical_json(p).encode() for p in test]
+    plain = [compress(r) for r in raw]
+    with_dict = [compress(r, zdict) for r in raw]
+    total_raw = sum(map(len, raw))
+    total_plain = sum(map(len, plain))
+    total_dict = sum(map(len, with_dict))
+
+    start = time.perf_counter()
+    for packed in with_dict:
+        json.loads(decompress(packed, zdict))
+    decode_time = time.perf_counter() - start
+
+    summaries = sum(len(json.dumps(_summarize(p)).encode()) for p in test)
+
+    print(f"{len(test)} packages, avg {_fmt(total_raw // len(test))} (threshold {_fmt(COMPRESSION_THRESHOLD)})")
+    print(f"dictionary: {len(zdict)} bytes, trained on {len(train)} packages in {train_time * 1000:.0f} ms")
+    print(f"{'storage':<22}{'bytes':>12}{'ratio':>8}")
+    for name, size in (("plain JSON", total_raw), ("zlib", total_plain), ("zlib + dictionary", total_dict)):
+        print(f"{name:<22}{_fmt(size):>12}{size / total_raw:>8.2f}")
+    print(f"decompress + json.loads: {total_raw / decode_time / 1024 / 1024:.0f} MB/s of JSON")
+    print(f"list transfer: bodies {_fmt(total_raw)}, include_content=false {_fmt(summaries)}")
+
+
+if __name__ == "__main__":
+    main()
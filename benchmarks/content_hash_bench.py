@@ -0,0 +1,86 @@
+"""
+Benchmark of canonical content hashing (utils.hash) on 1 MB and 10 MB packages.
+
+    python benchmarks/content_hash_bench.py [--sizes 1 10] [--repeat 5]
+
+Compares the previous implementation (sha256 over the whole json.dumps string)
+with the streaming compute_content_hash using sha256 and blake2b. For each it
+reports the best time and the peak memory allocated while hashing (tracemalloc).
+All variants hash the same canonical bytes; the benchmark asserts equal digests.
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.hash import compute_content_hash  # noqa: E402
+
+WORDS = "system shall user report export audit payment order review latency".split()
+
+
+def make_package(size_bytes: int, seed: int = 5) -> list:
+    rng = random.Random(seed)
+    items, total = [], 2
+    while total < size_bytes:
+        item = {
+            "id": f"{rng.getrandbits(64):016x}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(40)),
+            "priority": rng.choice(["MUST", "SHOULD", "COULD"]),
+            "stakeholder": "Product Owner",
+            "acceptance_criteria": [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(3)],
+            "business_value": " ".join(rng.choice(WORDS) for _ in range(15)),
+            "estimate": rng.random() * 10,
+        }
+        items.append(item)
+        total += len(json.dumps(item)) + 2
+    return items
+
+
+def legacy_hash(content) -> str:
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def measure(fn, content, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(content)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    digest = fn(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return digest, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10], help="package sizes in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [
+        ("json.dumps + sha256 (old)", legacy_hash),
+        ("streaming sha256", compute_content_hash),
+        ("streaming blake2b", lambda c: compute_content_hash(c, algorithm="blake2b")),
+    ]
+    for size_mb in args.sizes:
+        content = make_package(size_mb * 1024 * 1024)
+        print(f"\n{size_mb} MB package ({len(content)} items)")
+        print(f"{'variant':<28}{'time ms':>10}{'MB/s':>8}{'peak MB':>10}")
+        digests = {}
+        for name, fn in variants:
+            digest, best, peak = measure(fn, content, args.repeat)
+            digests[name] = digest
+            print(f"{name:<28}{best * 1000:>10.1f}{size_mb / best:>8.0f}{peak / 1024 / 1024:>10.2f}")
+        assert digests[variants[0][0]] == digests[variants[1][0]], "streaming hash differs from json.dumps"
+
+
+if __name__ == "__main__":
+    main()
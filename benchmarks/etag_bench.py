@@ -0,0 +1,64 @@
+"""
+Conditional GET benchmark against a running server (needs a populated database).
+
+    python benchmarks/etag_bench.py --url http://localhost:8000 --project <id> \
+        [--workflow <id>] [--run <id>] [--requests 50]
+
+For every read-heavy endpoint it sends --requests unconditional GETs and the same
+number with If-None-Match set to the ETag from the first response, and reports
+the average response size and latency of both series and the savings.
+"""
+import argparse
+import statistics
+import time
+
+import httpx
+
+
+def _series(client: httpx.Client, path: str, n: int, headers=None):
+    sizes, times, statuses = [], [], set()
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.get(path, headers=headers or {})
+        times.append(time.perf_counter() - start)
+        sizes.append(len(resp.content) + sum(len(k) + len(v) + 4 for k, v in resp.headers.items()))
+        statuses.add(resp.status_code)
+    return statistics.mean(sizes), statistics.median(times), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--workflow")
+    parser.add_argument("--run")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    paths = [
+        f"/api/projects/{args.project}/artifacts",
+        f"/api/projects/{args.project}/truth",
+        "/api/artifact-types",
+    ]
+    if args.workflow:
+        paths.append(f"/api/workflows/{args.workflow}")
+    if args.run:
+        paths.append(f"/api/runs/{args.run}")
+
+    print(f"{'endpoint':<48}{'200 bytes':>10}{'304 bytes':>10}{'200 ms':>8}{'304 ms':>8}")
+    with httpx.Client(base_url=args.url, timeout=30) as client:
+        for path in paths:
+            first = client.get(path)
+            etag = first.headers.get("etag")
+            if not etag:
+                print(f"{path:<48} no ETag (status {first.status_code})")
+                continue
+            full_size, full_time, _ = _series(client, path, args.requests)
+            cond_size, cond_time, statuses = _series(client, path, args.requests, {"If-None-Match": etag})
+            note = "" if statuses == {304} else f"  statuses {sorted(statuses)}"
+            print(f"{path:<48}{full_size:>10.0f}{cond_size:>10.0f}"
+                  f"{full_time * 1000:>8.1f}{cond_time * 1000:>8.1f}{note}")
+
+
+if __name__ == "__main__":
+    main()
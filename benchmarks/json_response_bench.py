@@ -0,0 +1,103 @@
+"""
+Benchmark of the project JSON response class on a 5,000-artifact project listing.
+
+    python benchmarks/json_response_bench.py [--artifacts 5000] [--repeat 5]
+
+"stdlib" reproduces the previous path: the repository converts ids and datetimes
+to strings per row and starlette's JSONResponse renders with json.dumps. "orjson"
+is the current path: rows keep native datetime values and utils.responses.JSONResponse
+renders them directly. Both bodies are checked to decode to the same data.
+"""
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse as StdlibJSONResponse  # noqa: E402
+
+from utils.responses import JSONResponse  # noqa: E402
+
+WORDS = "system shall user report export audit payment order review latency".split()
+
+
+def make_rows(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    base = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    rows = []
+    for i in range(n):
+        created = base + datetime.timedelta(seconds=i * 37, microseconds=rng.randrange(10**6))
+        rows.append({
+            "id": uuid.UUID(int=rng.getrandbits(128)),
+            "type": rng.choice(["LLMResponse", "BusinessRequirementPackage", "CodeArtifact"]),
+            "parent_id": uuid.UUID(int=rng.getrandbits(128)) if i % 3 else None,
+            "content": {"text": " ".join(rng.choice(WORDS) for _ in range(60)), "n": i},
+            "created_at": created,
+            "updated_at": created + datetime.timedelta(minutes=5),
+            "version": 1 + i % 4,
+            "status": "ACTIVE",
+            "content_hash": f"{rng.getrandbits(256):064x}",
+            "logical_key": f"node-{i % 50}",
+            "superseded_by": None,
+            "node_execution_id": uuid.UUID(int=rng.getrandbits(128)),
+        })
+    return rows
+
+
+def legacy_convert(row: dict) -> dict:
+    art = dict(row)
+    art['id'] = str(art['id'])
+    art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
+    art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
+    art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
+    art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
+    art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
+    return art
+
+
+def current_convert(row: dict) -> dict:
+    art = dict(row)
+    art['id'] = str(art['id'])
+    art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
+    art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
+    art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
+    return art
+
+
+def best_of(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--artifacts", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rows = make_rows(args.artifacts)
+
+    variants = [
+        ("stdlib json + isoformat", lambda: StdlibJSONResponse([legacy_convert(r) for r in rows]).body),
+        ("orjson + native datetime", lambda: JSONResponse([current_convert(r) for r in rows]).body),
+    ]
+    bodies = []
+    print(f"{args.artifacts} artifacts")
+    print(f"{'variant':<28}{'ms':>8}{'body KB':>10}")
+    for name, fn in variants:
+        elapsed, body = best_of(fn, args.repeat)
+        bodies.append(body)
+        print(f"{name:<28}{elapsed * 1000:>8.1f}{len(body) / 1024:>10.0f}")
+    assert json.loads(bodies[0]) == json.loads(bodies[1]), "responses differ"
+
+
+if __name__ == "__main__":
+    main()
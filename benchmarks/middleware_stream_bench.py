@@ -0,0 +1,147 @@
+"""
+Streaming throughput and per-request overhead of the request middleware.
+
+    python benchmarks/middleware_stream_bench.py [--chunks 20000] [--requests 2000]
+
+"http-middleware" reproduces the previous stack (two @app.middleware("http")
+functions, i.e. BaseHTTPMiddleware); "asgi" is middleware.RequestContextMiddleware.
+The app is driven in-process through the ASGI interface, so the numbers are the
+middleware + framework cost without network or server overhead.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import structlog  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+
+from middleware import RequestContextMiddleware  # noqa: E402
+from utils.responses import JSONResponse  # noqa: E402
+
+# Как в server.py, но info-записи отфильтрованы, чтобы вывод не мешал замеру
+logging.basicConfig(level=logging.WARNING)
+structlog.configure(
+    processors=[structlog.stdlib.filter_by_level, structlog.processors.JSONRenderer()],
+    logger_factory=structlog.stdlib.LoggerFactory(),
+    wrapper_class=structlog.stdlib.BoundLogger,
+    cache_logger_on_first_use=True,
+)
+logger = structlog.get_logger("bench")
+TOKEN = "bench-token"
+
+
+async def validate_session(token: str) -> bool:
+    return token == TOKEN
+
+
+def build_app(chunks: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/stream")
+    async def stream():
+        async def gen():
+            for _ in range(chunks):
+                yield b"data: {\"token\": \"abc\"}\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def legacy_app(chunks: int) -> FastAPI:
+    app = build_app(chunks)
+
+    @app.middleware("http")
+    async def correlation_id_middleware(request: Request, call_next):
+        correlation_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+        request_logger = logger.bind(correlation_id=correlation_id, path=request.url.path, method=request.method)
+        request_logger.info("Request started", remote_addr=request.client.host if request.client else None)
+        response = await call_next(request)
+        request_logger.info("Request completed", status_code=response.status_code)
+        response.headers["X-Request-ID"] = correlation_id
+        return response
+
+    @app.middleware("http")
+    async def validate_session_middleware(request: Request, call_next):
+        if request.url.path.startswith("/api"):
+            auth_header = request.headers.get("Authorization", "")
+            if not auth_header.startswith("Bearer ") or not await validate_session(auth_header[7:]):
+                return JSONResponse(status_code=401, content={"detail": "Session expired or invalid"})
+        return await call_next(request)
+
+    return app
+
+
+def asgi_app(chunks: int) -> FastAPI:
+    app = build_app(chunks)
+    app.add_middleware(RequestContextMiddleware, logger=logger, validate_session=validate_session, test_mode=False)
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {TOKEN}".encode())],
+        "client": ("127.0.0.1", 5000), "server": ("127.0.0.1", 8000),
+    }
+    received = 0
+    requested = False
+    done = asyncio.Event()
+
+    async def receive():
+        # Как настоящий сервер: тело запроса один раз, затем disconnect после ответа
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return received
+
+
+async def run(args):
+    print(f"{'stack':<18}{'stream MB/s':>12}{'chunks/s':>12}{'ping us':>10}")
+    for name, factory in (("http-middleware", legacy_app), ("asgi", asgi_app)):
+        app = factory(args.chunks)
+        await call(app, "/api/ping")
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            size = await call(app, "/api/stream")
+            best = min(best, time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            await call(app, "/api/ping")
+        per_request = (time.perf_counter() - start) / args.requests
+        print(f"{name:<18}{size / best / 1e6:>12.1f}{args.chunks / best:>12.0f}{per_request * 1e6:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
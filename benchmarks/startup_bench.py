@@ -0,0 +1,85 @@
+"""
+Cold start of the API and the worker.
+
+    python benchmarks/startup_bench.py [--runs 5] [--timeout 60]
+
+Measures, in fresh interpreter processes:
+  * import time of `server` and `worker` (python -c "import ...");
+  * for `uvicorn server:app`: time from spawn until /health answers (live) and
+    until /health/ready returns 200 (ready: pool up and LLM client built).
+Readiness needs a reachable DATABASE_URL; without one only liveness is reported.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _import_time(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_start(timeout: float):
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        while time.perf_counter() - start < timeout and ready is None:
+            try:
+                if live is None and httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                    live = time.perf_counter() - start
+                if live is not None and httpx.get(f"{base}/health/ready", timeout=1).status_code == 200:
+                    ready = time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return live, ready
+
+
+def _fmt(values):
+    values = [v for v in values if v is not None]
+    return f"{statistics.median(values) * 1000:8.0f} ms" if values else "     n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} runs")
+    for module in ("server", "worker"):
+        print(f"import {module:<10}{_fmt([_import_time(module) for _ in range(args.runs)])}")
+    starts = [_server_start(args.timeout) for _ in range(args.runs)]
+    print(f"uvicorn live      {_fmt([s[0] for s in starts])}")
+    print(f"uvicorn ready     {_fmt([s[1] for s in starts])}")
+
+
+if __name__ == "__main__":
+    main()
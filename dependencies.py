@@ -1,13 +1,21 @@
 """
 Глобальные зависимости для внедрения в роутеры.
+
+Сервисы строятся в каждом процессе отдельно: build_dependencies() вызывается из lifespan
+в server.py, а геттеры строят их сами при первом обращении, если lifespan не запускался
+(например, TestClient без контекстного менеджера).
 """
+import os
 from artifact_service import ArtifactService
 from use_cases.execute_node import ExecuteNodeUseCase
 from prompt_loader import PromptLoader          # ADDED
 from prompt_service import PromptService        # ADDED
 from session_service import SessionService      # ADDED
 from services.llm_stream_service import LLMStreamService # FIXED import path
+from services.history_compaction_service import HistoryCompactionService
+from services.conversation_state_service import ConversationStateService
 from groq_client import GroqClient              # (опционально)
+from validation import validator_registry
 
 _artifact_service: ArtifactService = None
 _execute_use_case: ExecuteNodeUseCase = None
@@ -16,6 +24,9 @@ _execute_use_case: ExecuteNodeUseCase = None
 _llm_stream_service: LLMStreamService = None
 _prompt_service: PromptService = None
 _session_service: SessionService = None
+_history_compaction_service: HistoryCompactionService = None
+_conversation_state_service: ConversationStateService = None
+_prompt_loader: PromptLoader = None
 
 def init_dependencies(
     artifact_service: ArtifactService,
@@ -25,35 +36,60 @@ def init_dependencies(
 ):
     global _artifact_service, _execute_use_case
     global _prompt_service, _llm_stream_service, _session_service  # ADDED
+    global _history_compaction_service, _conversation_state_service, _prompt_loader
     _artifact_service = artifact_service
     # ExecuteNodeUseCase теперь требует prompt_service и session_service
     _execute_use_case = ExecuteNodeUseCase(artifact_service, prompt_service, session_service)
     _prompt_service = prompt_service
+    _prompt_loader = prompt_service.prompt_loader
     _llm_stream_service = llm_stream_service
     _session_service = session_service
+    _history_compaction_service = HistoryCompactionService(prompt_service)
+    _conversation_state_service = ConversationStateService(prompt_service)
 
-def get_artifact_service() -> ArtifactService:
+# ADDED: построение сервисов процесса из переменных окружения
+def build_dependencies() -> None:
+    groq_client = GroqClient(api_key=os.getenv("GROQ_API_KEY"))
+    artifact_service = ArtifactService(groq_client=groq_client, validator_registry=validator_registry)
+    prompt_loader = PromptLoader(gh_token=os.getenv("GITHUB_TOKEN"))
+    # mode_map пока пустой, так как модуль modes отключён
+    prompt_service = PromptService(groq_client, prompt_loader, {})
+    llm_stream_service = LLMStreamService(groq_client, prompt_loader)
+    init_dependencies(artifact_service, prompt_service, llm_stream_service, SessionService())
+
+def _ensure_initialized() -> None:
     if _artifact_service is None:
-        raise RuntimeError("ArtifactService not initialized")
+        build_dependencies()
+
+def get_prompt_loader() -> PromptLoader:
+    _ensure_initialized()
+    return _prompt_loader
+
+def get_artifact_service() -> ArtifactService:
+    _ensure_initialized()
     return _artifact_service
 
 def get_execute_use_case() -> ExecuteNodeUseCase:
-    if _execute_use_case is None:
-        raise RuntimeError("ExecuteNodeUseCase not initialized")
+    _ensure_initialized()
     return _execute_use_case
 
 # ADDED: новые геттеры
 def get_llm_stream_service() -> LLMStreamService:
-    if _llm_stream_service is None:
-        raise RuntimeError("LLMStreamService not initialized")
+    _ensure_initialized()
     return _llm_stream_service
 
 def get_prompt_service() -> PromptService:
-    if _prompt_service is None:
-        raise RuntimeError("PromptService not initialized")
+    _ensure_initialized()
     return _prompt_service
 
 def get_session_service() -> SessionService:
-    if _session_service is None:
-        raise RuntimeError("SessionService not initialized")
-    return _session_service
\ No newline at end of file
+    _ensure_initialized()
+    return _session_service
+
+def get_history_compaction_service() -> HistoryCompactionService:
+    _ensure_initialized()
+    return _history_compaction_service
+
+def get_conversation_state_service() -> ConversationStateService:
+    _ensure_initialized()
+    return _conversation_state_service
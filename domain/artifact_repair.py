@@ -0,0 +1,79 @@
+# ADDED: Targeted repair of structured artifacts that failed validation
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REPAIR_INSTRUCTIONS = (
+    "Some items of your previous JSON array failed validation. Fix ONLY the items listed "
+    "below so that every error is resolved; keep their other content unchanged. "
+    'Answer with JSON only, in the form {"items": [{"index": <int>, "item": <corrected item>}]}.'
+)
+
+ItemError = Tuple[int, str]
+
+
+def collect_item_errors(data: Any, check_item) -> List[ItemError]:
+    """Все ошибки валидации элементов массива (а не только первая)."""
+    if not isinstance(data, list):
+        return []
+    errors = []
+    for i, item in enumerate(data):
+        valid, msg = check_item(item, i)
+        if not valid:
+            errors.append((i, msg))
+    return errors
+
+
+def build_repair_messages(
+    system_prompt: str,
+    data: List[Any],
+    errors: List[ItemError],
+) -> List[Dict[str, str]]:
+    """Запрос на исправление: только ошибки и проблемные элементы, без полного вывода."""
+    by_index: Dict[int, List[str]] = {}
+    for index, msg in errors:
+        by_index.setdefault(index, []).append(msg)
+    blocks = []
+    for index, messages in sorted(by_index.items()):
+        blocks.append(
+            f"Item {index}:\n{json.dumps(data[index], ensure_ascii=False, indent=2)}\n"
+            f"Errors:\n" + "\n".join(f"- {m}" for m in messages)
+        )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": REPAIR_INSTRUCTIONS + "\n\n" + "\n\n".join(blocks)},
+    ]
+
+
+def parse_patch(text: str) -> Dict[int, Any]:
+    """Разбирает ответ модели в {index: item}; ValueError, если формат не тот."""
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Repair patch is not valid JSON: {e.msg}") from e
+    if isinstance(payload, dict):
+        payload = payload.get("items")
+    if not isinstance(payload, list):
+        raise ValueError("Repair patch must contain an 'items' list")
+    patch = {}
+    for entry in payload:
+        if not isinstance(entry, dict) or not isinstance(entry.get("index"), int) or "item" not in entry:
+            raise ValueError("Repair patch entries must look like {\"index\": <int>, \"item\": ...}")
+        patch[entry["index"]] = entry["item"]
+    return patch
+
+
+def merge_patch(data: List[Any], patch: Dict[int, Any], allowed: Optional[set] = None) -> List[Any]:
+    """Возвращает копию data с заменёнными элементами; индексы вне allowed игнорируются."""
+    merged = list(data)
+    for index, item in patch.items():
+        if not 0 <= index < len(merged):
+            logger.warning(f"Repair patch references missing item {index}, ignored")
+            continue
+        if allowed is not None and index not in allowed:
+            logger.warning(f"Repair patch touches valid item {index}, ignored")
+            continue
+        merged[index] = item
+    return merged
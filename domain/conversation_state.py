@@ -1,7 +1,7 @@
 # CHANGED: Fixed parse_response to set next_question=None when missing
 import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +19,22 @@ class ConversationStateSynthesizer:
         recent = history[-4:] if len(history) > 4 else history
         return "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent])
 
+    def build_fold_prompt(self, previous_state: Optional[Dict[str, Any]], new_messages: List[Dict]) -> str:
+        """Build the user prompt that folds new messages into an existing state."""
+        transcript = "\n".join([f"{msg['role']}: {msg['content']}" for msg in new_messages])
+        return (
+            f"Current state:\n{json.dumps(previous_state or self._default_state(), ensure_ascii=False)}\n\n"
+            f"New messages:\n{transcript}\n\n"
+            "Update the current state with the new messages and output the full JSON state."
+        )
+
     def parse_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response into a state dictionary."""
+        state = self._parse_state(response)
+        return state if state is not None else self._default_state()
+
+    def _parse_state(self, response: str) -> Optional[Dict[str, Any]]:
+        """Parse LLM response; returns None if it is not a JSON object."""
         if response.startswith("```json"):
             response = response[7:]
         if response.endswith("```"):
@@ -29,7 +43,10 @@ class ConversationStateSynthesizer:
             state = json.loads(response.strip())
         except json.JSONDecodeError:
             logger.error(f"Failed to parse state JSON: {response[:100]}...")
-            return self._default_state()
+            return None
+        if not isinstance(state, dict):
+            logger.error(f"State JSON is not an object: {response[:100]}...")
+            return None
         required_fields = [
             "clear_context", "unclear_context", "user_questions",
             "answered_questions", "next_question", "completion_score"
@@ -81,3 +98,31 @@ class ConversationStateSynthesizer:
         except Exception as e:
             logger.error(f"State synthesis failed: {e}")
             return self._default_state()
+
+    async def fold(
+        self,
+        previous_state: Optional[Dict[str, Any]],
+        new_messages: List[Dict],
+        model_id: str = "llama-3.3-70b-versatile"
+    ) -> Dict[str, Any]:
+        """
+        Incrementally update a previously synthesized state with new messages only.
+        Unlike synthesize(), failures raise instead of returning a default state,
+        so callers never overwrite a good state with an empty one.
+        """
+        if not new_messages:
+            return previous_state or self._default_state()
+
+        sys_prompt = await self.prompt_service.get_system_prompt("02sum_STATE_SYNTHESIZER")
+        if sys_prompt.startswith("System Error") or sys_prompt.startswith("Error"):
+            raise RuntimeError(f"Failed to load State Synthesizer prompt: {sys_prompt}")
+
+        messages = [
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": self.build_fold_prompt(previous_state, new_messages)}
+        ]
+        response = await self.prompt_service.get_chat_completion(messages, model_id)
+        state = self._parse_state(response)
+        if state is None:
+            raise ValueError("State synthesizer returned invalid JSON")
+        return state
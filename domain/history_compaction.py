@@ -0,0 +1,119 @@
+# ADDED: Rolling compaction of clarification dialogue history
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_TURNS = 6
+DEFAULT_TOKEN_BUDGET = 6000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a requirements clarification dialogue. "
+    "Merge the new messages into the existing summary. Keep every confirmed fact, "
+    "decision, constraint and open question; drop greetings and repetition. "
+    "Answer with the updated summary only, as plain text."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class CompactionSettings:
+    """Per-node compaction settings, read from node config key 'history_compaction'."""
+    enabled: bool = True
+    keep_turns: int = DEFAULT_KEEP_TURNS
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET
+    summary_model: Optional[str] = None
+
+    @property
+    def keep_messages(self) -> int:
+        # Один ход = сообщение пользователя + ответ ассистента
+        return max(self.keep_turns, 1) * 2
+
+    @classmethod
+    def from_node_config(cls, config: Dict[str, Any]) -> "CompactionSettings":
+        raw = (config or {}).get("history_compaction")
+        if raw is None:
+            return cls()
+        if isinstance(raw, bool):
+            return cls(enabled=raw)
+        return cls(
+            enabled=raw.get("enabled", True),
+            keep_turns=int(raw.get("keep_turns", DEFAULT_KEEP_TURNS)),
+            token_budget=raw.get("token_budget", DEFAULT_TOKEN_BUDGET),
+            summary_model=raw.get("summary_model"),
+        )
+
+
+def summary_target(history_len: int, settings: CompactionSettings) -> int:
+    """Number of leading messages that should be covered by the summary."""
+    return max(history_len - settings.keep_messages, 0)
+
+
+def build_compacted_messages(
+    system_prompt: str,
+    history: List[Dict[str, Any]],
+    summary: Optional[Dict[str, Any]],
+    settings: CompactionSettings,
+) -> List[Dict[str, str]]:
+    """
+    Builds LLM messages: system prompt, cached summary of older turns and the
+    last K turns verbatim. Messages that fell out of the window but are not yet
+    covered by the (background-refreshed) summary are kept verbatim while the
+    token budget allows, newest first.
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    plain = [{"role": m["role"], "content": m["content"]} for m in history]
+    if not settings.enabled:
+        return messages + plain
+
+    summary = summary or {}
+    covered = min(int(summary.get("covered_messages", 0)), len(plain))
+    summary_text = summary.get("text") if covered else None
+
+    tail_start = max(len(plain) - settings.keep_messages, covered)
+    tail = plain[tail_start:]
+    gap = plain[covered:tail_start]
+
+    budget = settings.token_budget
+    used = estimate_tokens(system_prompt) + sum(estimate_tokens(m["content"]) for m in tail)
+    if summary_text:
+        used += estimate_tokens(summary_text)
+
+    # Хвост урезаем только если он один не помещается в бюджет; последнее сообщение сохраняем всегда
+    while budget and used > budget and len(tail) > 1:
+        used -= estimate_tokens(tail.pop(0)["content"])
+
+    kept_gap: List[Dict[str, str]] = []
+    for msg in reversed(gap):
+        cost = estimate_tokens(msg["content"])
+        if budget and used + cost > budget:
+            break
+        kept_gap.insert(0, msg)
+        used += cost
+    if len(kept_gap) < len(gap):
+        logger.debug("Dropped %d uncovered messages over token budget", len(gap) - len(kept_gap))
+
+    if summary_text:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary_text}",
+        })
+    return messages + kept_gap + tail
+
+
+def build_summary_prompt(previous_text: Optional[str], new_messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Builds the incremental summarization request: previous summary + messages to fold in."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in new_messages)
+    user_content = (
+        f"Existing summary:\n{previous_text or '(empty)'}\n\n"
+        f"New messages:\n{transcript}"
+    )
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
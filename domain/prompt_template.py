@@ -0,0 +1,94 @@
+# ADDED: Precompiled user prompt templates
+import string
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, Iterable, Optional, Tuple
+
+DEFAULT_USER_PROMPT_TEMPLATE = "Context:\n{all_artifacts}\n\nUser input:\n{user_input}"
+
+# Переменные, которые ArtifactService подставляет всегда
+BUILTIN_VARIABLES = frozenset({"all_artifacts", "user_input"})
+
+_formatter = string.Formatter()
+
+
+class TemplateError(ValueError):
+    """Шаблон не разбирается или ссылается на переменные, которых не будет в контексте."""
+
+
+def input_var_name(artifact_type: str) -> str:
+    """Имя переменной шаблона для входного артефакта: 'BusinessRequirementPackage' -> 'businessRequirementPackage'."""
+    return artifact_type[0].lower() + artifact_type[1:] if artifact_type else artifact_type
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """Parsed str.format template: literal chunks interleaved with (field, conversion, spec)."""
+    source: str
+    parts: Tuple[Tuple[str, Optional[str], Optional[str], str], ...]
+    fields: FrozenSet[str]
+
+    def render(self, context: Dict[str, Any]) -> str:
+        missing = self.fields - context.keys()
+        if missing:
+            raise TemplateError(f"Template variables missing from context: {', '.join(sorted(missing))}")
+        out = []
+        for literal, field, conversion, spec in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = context[field]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "s":
+                value = str(value)
+            elif conversion == "a":
+                value = ascii(value)
+            out.append(format(value, spec))
+        return "".join(out)
+
+
+@lru_cache(maxsize=512)
+def compile_template(source: str) -> CompiledTemplate:
+    """Parses a template once; repeated calls with the same text hit the cache."""
+    try:
+        parsed = list(_formatter.parse(source))
+    except ValueError as e:
+        raise TemplateError(f"Invalid template syntax: {e}") from e
+
+    parts = []
+    fields = set()
+    for literal, field, spec, conversion in parsed:
+        if field is None:
+            parts.append((literal, None, None, ""))
+            continue
+        if not field.isidentifier():
+            raise TemplateError(f"Unsupported template field '{{{field}}}': use plain variable names")
+        if spec and "{" in spec:
+            raise TemplateError(f"Nested fields in format spec are not supported: '{{{field}:{spec}}}'")
+        fields.add(field)
+        parts.append((literal, field, conversion, spec or ""))
+    return CompiledTemplate(source=source, parts=tuple(parts), fields=frozenset(fields))
+
+
+def available_variables(required_input_types: Iterable[str]) -> FrozenSet[str]:
+    return BUILTIN_VARIABLES | {input_var_name(t) for t in required_input_types or []}
+
+
+def validate_node_template(config: Dict[str, Any]) -> Optional[CompiledTemplate]:
+    """
+    Проверяет user_prompt_template из конфига ноды при сохранении: синтаксис и то,
+    что каждая переменная будет в контексте. Возвращает скомпилированный шаблон.
+    """
+    source = (config or {}).get("user_prompt_template")
+    if not source:
+        return None
+    if not isinstance(source, str):
+        raise TemplateError("user_prompt_template must be a string")
+    template = compile_template(source)
+    unknown = template.fields - available_variables((config or {}).get("required_input_types", []))
+    if unknown:
+        raise TemplateError(
+            f"user_prompt_template references unknown variables: {', '.join(sorted(unknown))}"
+        )
+    return template
@@ -4,7 +4,8 @@ import { useAppStore } from '@/app/store';
 import { useProjectStore } from '@entities/project';
 import { api } from '@shared/api';
 
-// Локальный тип для артефакта (соответствует тому, что приходит с API)
+// Локальный тип для артефакта (соответствует тому, что приходит с API).
+// Список приходит без тел: content пуст, есть summary и content_size; тело — api.artifacts.get(id)
 interface ApiArtifact {
   id: string;
   type: string;
@@ -15,6 +16,7 @@ interface ApiArtifact {
   version: string;
   status: string;
   summary?: string;
+  content_size?: number;
 }
 
 /**
@@ -42,7 +44,7 @@ export const useArtifacts = () => {
         id: a.id,
         type: a.type,
         parent_id: a.parent_id ?? null,
-        content: (a.content ?? {}) as Record<string, unknown>,
+        content: (a.content ?? null) as Record<string, unknown> | null,
         created_at: a.created_at,
         updated_at: a.updated_at,
         version: a.version,
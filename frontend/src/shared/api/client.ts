@@ -190,6 +190,9 @@ export const api = {
   artifacts: {
     list: (projectId: string) =>
       client.GET('/api/projects/{project_id}/artifacts', { params: { path: { project_id: projectId } } }),
+    // Список отдаёт только summary; тело артефакта загружается отдельно, когда оно нужно
+    get: (artifactId: string) =>
+      client.GET('/api/artifact/{artifact_id}', { params: { path: { artifact_id: artifactId } } }),
   },
   messages: {
     list: (projectId: string) =>
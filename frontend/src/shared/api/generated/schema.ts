@@ -153,7 +153,8 @@ export interface paths {
             path?: never;
             cookie?: never;
         };
-        get?: never;
+        /** Get Artifact Endpoint */
+        get: operations["get_artifact_endpoint_api_artifact__artifact_id__get"];
         put?: never;
         post?: never;
         /** Delete Artifact Endpoint */
@@ -1207,6 +1208,7 @@ export interface operations {
         parameters: {
             query?: {
                 type?: string | null;
+                include_content?: boolean;
             };
             header?: never;
             path: {
@@ -1334,6 +1336,37 @@ export interface operations {
             };
         };
     };
+    get_artifact_endpoint_api_artifact__artifact_id__get: {
+        parameters: {
+            query?: never;
+            header?: never;
+            path: {
+                artifact_id: string;
+            };
+            cookie?: never;
+        };
+        requestBody?: never;
+        responses: {
+            /** @description Successful Response */
+            200: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": unknown;
+                };
+            };
+            /** @description Validation Error */
+            422: {
+                headers: {
+                    [name: string]: unknown;
+                };
+                content: {
+                    "application/json": components["schemas"]["HTTPValidationError"];
+                };
+            };
+        };
+    };
     delete_artifact_endpoint_api_artifact__artifact_id__delete: {
         parameters: {
             query?: never;
@@ -1466,6 +1499,7 @@ export interface operations {
         parameters: {
             query: {
                 project_id: string;
+                include_content?: boolean;
             };
             header?: never;
             path: {
@@ -1,14 +1,71 @@
-import httpx
-from groq import Groq
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.metrics import counter, histogram
+from utils.tracing import span
+
+# ADDED: метрики вызовов LLM (operation: completion, stream — до начала потока, models)
+LLM_REQUESTS = counter("llm_requests_total", "LLM API calls.", ("model", "operation", "outcome"))
+LLM_DURATION = histogram("llm_request_duration_seconds", "LLM API call latency.", ("model", "operation"))
+LLM_TIME_TO_FIRST_TOKEN = histogram(
+    "llm_time_to_first_token_seconds", "Time from the start of the response stream to the first content chunk.", ("model",)
+)
+LLM_COMPLETION_TOKENS = counter("llm_completion_tokens_total", "Generated tokens.", ("model",))
+LLM_TOKENS_PER_SECOND = histogram(
+    "llm_stream_tokens_per_second", "Streaming generation speed after the first token.", ("model",),
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800, 1600),
+)
+
+
+def record_llm_call(model, operation: str, started: float, ok: bool) -> None:
+    """started — time.perf_counter() before the call."""
+    model = model or "default"
+    LLM_REQUESTS.labels(model, operation, "ok" if ok else "error").inc()
+    LLM_DURATION.labels(model, operation).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def llm_call(model, operation: str):
+    """Records one LLM call; an exception leaving the block counts as an error."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record_llm_call(model, operation, started, ok)
+
 
 class GroqClient:
+    # CHANGED: SDK groq и httpx импортируются и клиент создаётся при первом обращении,
+    # а не при импорте server/worker (см. warm_up)
     def __init__(self, api_key=None):
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        self.client = Groq(
-            api_key=self.api_key, http_client=httpx.Client(timeout=120.0)
-        )
         self.base_url = "https://api.groq.com/openai/v1"
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from groq import Groq
+                    self._client = Groq(
+                        api_key=self.api_key, http_client=httpx.Client(timeout=120.0)
+                    )
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def warm_up(self) -> None:
+        """Builds the SDK client ahead of the first request (blocking; run in a thread)."""
+        _ = self.client
 
     def get_active_models(self):
         fallback_models = [
@@ -22,11 +79,15 @@ class GroqClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        import httpx
+        started = time.perf_counter()
+        ok = False
         try:
-            with httpx.Client() as client:
+            with span("llm.models"), httpx.Client() as client:
                 response = client.get(
                     f"{self.base_url}/models", headers=headers, timeout=10.0
                 )
+                ok = response.status_code == 200
                 if response.status_code == 200:
                     data = response.json()
                     active = [
@@ -38,11 +99,16 @@ class GroqClient:
                 return fallback_models
         except Exception:
             return fallback_models
+        finally:
+            record_llm_call(None, "models", started, ok)
 
     def create_completion(self, model, messages, stream=False, temperature=0.6):
-        return self.client.chat.completions.create(
-            model=model,
-            messages=messages,
-            stream=stream,
-            temperature=temperature,
-        )
+        # Для stream=True спан покрывает только запрос до начала потока
+        with span("llm.completion", model=model, stream=stream, messages=len(messages)), \
+                llm_call(model, "stream" if stream else "completion"):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=stream,
+                temperature=temperature,
+            )
@@ -0,0 +1,166 @@
+# ADDED: Pure-ASGI request middleware (correlation id + session check)
+"""
+Заменяет два @app.middleware("http") слоя одним ASGI-слоем.
+
+BaseHTTPMiddleware гонит каждый ответ через отдельную задачу и очередь, что стоит
+времени на каждом чанке стримингового ответа. Здесь тело проходит напрямую в send,
+а перехватывается только http.response.start (чтобы добавить X-Request-ID и
+залогировать статус).
+"""
+import os
+import time
+import uuid
+import weakref
+from typing import Awaitable, Callable, Iterable, Optional
+
+from utils.responses import JSONResponse
+from utils.metrics import COUNT_BUCKETS, count_request_work, counter, histogram
+from utils.tracing import start_trace
+
+# Проверяется только /api; /health, /assets и SPA открыты и так
+PROTECTED_PREFIX = "/api"
+PUBLIC_PREFIXES = ("/api/auth",)
+PUBLIC_PATHS = ("/api/models",)
+
+# Запросы, отклонённые до маршрутизации (401) или без маршрута
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_DURATION = histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is sent.", ("method", "route")
+)
+HTTP_REPOSITORY_CALLS = histogram(
+    "http_request_repository_calls", "Repository (database) calls per HTTP request.",
+    ("method", "route"), buckets=COUNT_BUCKETS,
+)
+# ADDED: SQL-запросы на HTTP-запрос (считаются в repositories.base) — N+1 виден сразу
+HTTP_DB_QUERIES = histogram(
+    "http_request_db_queries", "SQL statements per HTTP request.", ("method", "route"), buckets=COUNT_BUCKETS,
+)
+QUERIES_PER_REQUEST_WARN = int(os.getenv("DB_QUERIES_PER_REQUEST_WARN", "50"))
+
+
+def _observe_request(method: str, route: str, status: int, duration: float, work) -> None:
+    HTTP_REQUESTS.labels(method, route, status).inc()
+    HTTP_DURATION.labels(method, route).observe(duration)
+    HTTP_REPOSITORY_CALLS.labels(method, route).observe(work.repository_calls)
+    HTTP_DB_QUERIES.labels(method, route).observe(work.queries)
+
+
+_route_templates: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def route_template(scope) -> Optional[str]:
+    """Path template of the matched route ("/api/runs/{run_id}"), known after routing."""
+    app, endpoint = scope.get("app"), scope.get("endpoint")
+    if app is None or endpoint is None:
+        return None
+    templates = _route_templates.get(app)
+    if templates is None:
+        templates = _route_templates[app] = {
+            route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")
+        }
+    return templates.get(endpoint)
+
+
+class RequestContextMiddleware:
+    """
+    Assigns a correlation id (X-Request-ID, taken from the request or generated),
+    logs request start/completion and rejects /api requests without a valid
+    Bearer session with 401. Auth is skipped for public paths and in TEST_MODE.
+    """
+
+    def __init__(
+        self,
+        app,
+        logger,
+        validate_session: Callable[[str], Awaitable[bool]],
+        public_prefixes: Iterable[str] = PUBLIC_PREFIXES,
+        public_paths: Iterable[str] = PUBLIC_PATHS,
+        test_mode: bool = None,
+    ):
+        self.app = app
+        self.logger = logger
+        self.validate_session = validate_session
+        # str.startswith принимает кортеж — одна проверка вместо цепочки if
+        self.public_prefixes = tuple(public_prefixes)
+        self.public_paths = frozenset(public_paths)
+        self.test_mode = os.getenv("TEST_MODE") == "true" if test_mode is None else test_mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+            elif name == b"authorization":
+                auth_header = value.decode("latin-1")
+        correlation_id = request_id or str(uuid.uuid4())
+        correlation_header = (b"x-request-id", correlation_id.encode("latin-1"))
+
+        path = scope["path"]
+        request_logger = self.logger.bind(correlation_id=correlation_id, path=path, method=scope["method"])
+        client = scope.get("client")
+        request_logger.info("Request started", remote_addr=client[0] if client else None)
+
+        # ADDED: корневой спан трассировки запроса (если запрос попал в выборку)
+        status = {"code": 500}
+        started = time.perf_counter()
+        with start_trace("http.request", correlation_id, method=scope["method"], path=path) as root, \
+                count_request_work() as work:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [*message.get("headers", ()), correlation_header]
+                    status["code"] = message["status"]
+                    request_logger.info("Request completed", status_code=message["status"])
+                    if root is not None:
+                        root.set(status_code=message["status"])
+                await send(message)
+
+            try:
+                rejection = await self._check_session(path, auth_header, request_logger)
+                if rejection is not None:
+                    await rejection(scope, receive, send_wrapper)
+                    return
+                await self.app(scope, receive, send_wrapper)
+            except Exception as e:
+                request_logger.error("Request failed with 5xx", exc_info=e, error=str(e))
+                raise
+            finally:
+                # ADDED: метрики по шаблону маршрута, а не по пути — число рядов ограничено
+                route = route_template(scope)
+                _observe_request(scope["method"], route or UNMATCHED_ROUTE, status["code"],
+                                 time.perf_counter() - started, work)
+                if QUERIES_PER_REQUEST_WARN and work.queries >= QUERIES_PER_REQUEST_WARN:
+                    request_logger.warning("Many SQL statements in one request", route=route,
+                                           db_queries=work.queries,
+                                           db_time_ms=round(work.query_seconds * 1000, 1))
+                if root is not None:
+                    root.name = f"{scope['method']} {route or path}"
+
+    async def _check_session(self, path: str, auth_header, request_logger):
+        """None when the request may proceed, otherwise the 401 response to send."""
+        if self.test_mode or not path.startswith(PROTECTED_PREFIX):
+            return None
+        if path in self.public_paths or path.startswith(self.public_prefixes):
+            request_logger.debug("Skipping auth for endpoint")
+            return None
+        if not auth_header or not auth_header.startswith("Bearer "):
+            request_logger.warning("401: Missing or invalid Authorization header")
+            return JSONResponse(
+                status_code=401,
+                content={"detail": "Authentication required: send 'Authorization: Bearer <token>'"}
+            )
+        session_token = auth_header[7:]
+        if not session_token:
+            request_logger.warning("401: Empty session token")
+            return JSONResponse(status_code=401, content={"detail": "Authentication required"})
+        if not await self.validate_session(session_token):
+            request_logger.warning("401: Invalid session token")
+            return JSONResponse(status_code=401, content={"detail": "Session expired or invalid"})
+        request_logger.debug("200: Valid session")
+        return None
@@ -0,0 +1,5 @@
+-- Materialized conversation state per clarification session.
+-- state_version = number of history messages already folded into conversation_state.
+ALTER TABLE clarification_sessions
+    ADD COLUMN IF NOT EXISTS conversation_state JSONB,
+    ADD COLUMN IF NOT EXISTS state_version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,33 @@
+-- Content-addressed storage of artifact bodies.
+-- artifacts.content_ref = hash of the body in artifact_blobs; identical bodies are stored once.
+-- artifacts.content stays for rows written before this migration and is NULL for new rows.
+CREATE TABLE IF NOT EXISTS artifact_blobs (
+    hash TEXT PRIMARY KEY,
+    content JSONB NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE artifacts
+    ADD COLUMN IF NOT EXISTS content_ref TEXT REFERENCES artifact_blobs(hash);
+
+ALTER TABLE artifacts ALTER COLUMN content DROP NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_artifacts_content_ref ON artifacts(content_ref);
+
+-- Backfill: legacy bodies are keyed by sha256 of their jsonb text form. It differs from the
+-- application hash (sha256 of json.dumps(sort_keys=True)), so legacy duplicates are merged
+-- among themselves, and a body saved again later gets one more blob at most.
+INSERT INTO artifact_blobs (hash, content, size_bytes)
+SELECT DISTINCT ON (h.hash) h.hash, a.content, octet_length(a.content::text)
+FROM artifacts a
+CROSS JOIN LATERAL (
+    SELECT encode(sha256(convert_to(a.content::text, 'UTF8')), 'hex') AS hash
+) h
+WHERE a.content_ref IS NULL AND a.content IS NOT NULL
+ON CONFLICT (hash) DO NOTHING;
+
+UPDATE artifacts
+SET content_ref = encode(sha256(convert_to(content::text, 'UTF8')), 'hex'),
+    content = NULL
+WHERE content_ref IS NULL AND content IS NOT NULL;
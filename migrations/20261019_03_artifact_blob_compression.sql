@@ -0,0 +1,31 @@
+-- Compressed storage of large artifact bodies.
+-- encoding = 'json': body in content (JSONB); encoding = 'zlib': body in compressed,
+-- deflated canonical JSON, optionally with the preset dictionary dict_id.
+CREATE TABLE IF NOT EXISTS artifact_compression_dicts (
+    id SERIAL PRIMARY KEY,
+    artifact_type TEXT NOT NULL,
+    dictionary BYTEA NOT NULL,
+    sample_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_artifact_compression_dicts_type
+    ON artifact_compression_dicts(artifact_type, id DESC);
+
+ALTER TABLE artifact_blobs
+    ALTER COLUMN content DROP NOT NULL,
+    ADD COLUMN IF NOT EXISTS encoding TEXT NOT NULL DEFAULT 'json',
+    ADD COLUMN IF NOT EXISTS compressed BYTEA,
+    ADD COLUMN IF NOT EXISTS dict_id INTEGER REFERENCES artifact_compression_dicts(id),
+    ADD COLUMN IF NOT EXISTS stored_bytes INTEGER,
+    ADD COLUMN IF NOT EXISTS summary TEXT;
+
+-- Summaries let list views skip the body. Compression of existing bodies is done by
+-- scripts/compress_artifact_blobs.py (PostgreSQL has no zlib), which also reports savings.
+UPDATE artifact_blobs
+SET summary = CASE
+        WHEN jsonb_typeof(content) = 'object' AND content ? 'text' THEN left(content->>'text', 100)
+        ELSE left(content::text, 100)
+    END,
+    stored_bytes = octet_length(content::text)
+WHERE summary IS NULL AND content IS NOT NULL;
@@ -0,0 +1,55 @@
+-- Append-only history of the project truth (ADR-006): one row per validated execution
+-- with its validity interval [valid_from, valid_to); valid_to IS NULL for the current one.
+-- Column types are taken from node_executions / artifacts so values round-trip unchanged.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE TABLE IF NOT EXISTS project_truth_history AS
+SELECT
+    ne.project_id,
+    ne.node_definition_id,
+    ne.id AS execution_id,
+    ne.output_artifact_id AS artifact_id,
+    a.logical_key AS artifact_logical_key,
+    a.version AS artifact_version,
+    ne.validated_at AS valid_from,
+    ne.validated_at AS valid_to
+FROM node_executions ne
+LEFT JOIN artifacts a ON a.id = ne.output_artifact_id
+WITH NO DATA;
+
+ALTER TABLE project_truth_history
+    ADD COLUMN IF NOT EXISTS id BIGSERIAL PRIMARY KEY,
+    ALTER COLUMN project_id SET NOT NULL,
+    ALTER COLUMN node_definition_id SET NOT NULL,
+    ALTER COLUMN execution_id SET NOT NULL,
+    ALTER COLUMN valid_from SET NOT NULL;
+
+-- Backfill from the executions validated so far: each validation is valid until the next
+-- validation of the same node, exactly as the as_of window query used to compute it.
+INSERT INTO project_truth_history
+    (project_id, node_definition_id, execution_id, artifact_id,
+     artifact_logical_key, artifact_version, valid_from, valid_to)
+SELECT
+    ne.project_id,
+    ne.node_definition_id,
+    ne.id,
+    ne.output_artifact_id,
+    a.logical_key,
+    a.version,
+    ne.validated_at,
+    LEAD(ne.validated_at) OVER (
+        PARTITION BY ne.project_id, ne.node_definition_id ORDER BY ne.validated_at
+    )
+FROM node_executions ne
+LEFT JOIN artifacts a ON a.id = ne.output_artifact_id
+WHERE ne.validated_at IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM project_truth_history h WHERE h.execution_id = ne.id);
+
+-- Point-in-time lookup: one GiST range scan over the project's intervals containing as_of
+CREATE INDEX IF NOT EXISTS idx_truth_history_validity
+    ON project_truth_history USING gist (project_id, tstzrange(valid_from, valid_to, '[)'));
+
+-- At most one open interval per node; also serves the "close current interval" update
+CREATE UNIQUE INDEX IF NOT EXISTS idx_truth_history_current
+    ON project_truth_history (project_id, node_definition_id)
+    WHERE valid_to IS NULL;
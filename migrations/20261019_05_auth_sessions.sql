@@ -0,0 +1,10 @@
+-- Auth sessions shared by all API processes. The token itself is never stored,
+-- only its sha256; expired rows are removed by the periodic sweep (expires_at index).
+CREATE TABLE IF NOT EXISTS auth_sessions (
+    token_hash TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    master_key_hash TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_auth_sessions_expires_at ON auth_sessions (expires_at);
@@ -1,20 +1,191 @@
+import asyncio
+import datetime
 import json
+import logging
 import os
+import threading
 from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger("PROMPT-LOADER")
+
+MANIFEST_PATH = Path("prompts") / "manifest.json"
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+def mode_key(prompt_id: str) -> str:
+    """
+    Derives the mode key used by the UI from a manifest prompt id:
+    '02-idea-clarifier' -> '02_IDEA_CLARIFIER', '02sum-state-synthesizer' -> '02sum_STATE_SYNTHESIZER',
+    '01-core-prompt' -> '01_CORE'.
+    """
+    head, _, rest = prompt_id.partition("-")
+    if rest.endswith("-prompt"):
+        rest = rest[: -len("-prompt")]
+    if not rest:
+        return head
+    return f"{head}_{rest.replace('-', '_').upper()}"
+
+
+class PromptRegistry:
+    """
+    In-memory index of the prompts listed in prompts/manifest.json.
+
+    The manifest and all prompt files are read once; lookups are plain dict accesses
+    on an immutable snapshot. A background watcher polls mtimes of the manifest and
+    prompt files and, on change, builds a new snapshot off the event loop and swaps
+    it in with a single assignment, so readers never see a half-loaded registry.
+    """
+
+    def __init__(self, base_dir: Path, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.base_dir = Path(base_dir)
+        self.poll_interval = poll_interval
+        self._snapshot: Dict[str, Any] = self._empty_snapshot()
+        self._reload_lock = threading.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self.reload()
+
+    @staticmethod
+    def _empty_snapshot() -> Dict[str, Any]:
+        return {
+            "by_id": {},
+            "by_mode": {},
+            "fingerprint": (),
+            "bytes": 0,
+            "loaded_at": None,
+            "version": None,
+        }
+
+    # ---------- чтение ----------
+
+    def get(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshot["by_id"].get(prompt_id)
+
+    def resolve(self, mode: str, mode_map: Optional[dict] = None) -> Optional[Dict[str, Any]]:
+        """Находит промпт по явному mode_map, затем по производному ключу режима, затем по id."""
+        snapshot = self._snapshot
+        prompt_id = (mode_map or {}).get(mode)
+        if prompt_id:
+            return snapshot["by_id"].get(prompt_id)
+        return snapshot["by_mode"].get(mode) or snapshot["by_id"].get(mode)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "count": len(snapshot["by_id"]),
+            "bytes": snapshot["bytes"],
+            "manifest_version": snapshot["version"],
+            "last_reload": snapshot["loaded_at"],
+            "watching": self._watch_task is not None and not self._watch_task.done(),
+        }
+
+    # ---------- загрузка ----------
+
+    def _fingerprint(self, entries) -> Tuple:
+        stamps = []
+        for rel in [str(MANIFEST_PATH)] + [e.get("file", "") for e in entries]:
+            try:
+                stamps.append((rel, os.stat(self.base_dir / rel).st_mtime_ns))
+            except OSError:
+                stamps.append((rel, None))
+        return tuple(stamps)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        manifest_path = self.base_dir / MANIFEST_PATH
+        if not manifest_path.exists():
+            return {}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _build_snapshot(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        entries = manifest.get("prompts", [])
+        by_id: Dict[str, Dict[str, Any]] = {}
+        by_mode: Dict[str, Dict[str, Any]] = {}
+        total_bytes = 0
+        for entry in entries:
+            file_path = self.base_dir / entry["file"]
+            try:
+                text = file_path.read_text(encoding="utf-8").strip()
+            except OSError as e:
+                logger.warning(f"Prompt file {file_path} could not be read: {e}")
+                continue
+            record = {**entry, "text": text}
+            by_id[entry["id"]] = record
+            by_mode.setdefault(mode_key(entry["id"]), record)
+            total_bytes += len(text.encode("utf-8"))
+        return {
+            "by_id": by_id,
+            "by_mode": by_mode,
+            "fingerprint": self._fingerprint(entries),
+            "bytes": total_bytes,
+            "loaded_at": datetime.datetime.now().isoformat(),
+            "version": manifest.get("version"),
+        }
+
+    def reload(self) -> bool:
+        """Перечитывает манифест и файлы. Ошибка загрузки оставляет прежний снимок."""
+        with self._reload_lock:
+            try:
+                snapshot = self._build_snapshot(self._read_manifest())
+            except Exception as e:
+                logger.error(f"Prompt registry reload failed: {e}")
+                return False
+            self._snapshot = snapshot
+        logger.info(f"Prompt registry loaded: {len(snapshot['by_id'])} prompts, {snapshot['bytes']} bytes")
+        return True
+
+    def reload_if_changed(self) -> bool:
+        try:
+            entries = self._read_manifest().get("prompts", [])
+        except Exception as e:
+            logger.error(f"Prompt manifest is unreadable, keeping current registry: {e}")
+            return False
+        if self._fingerprint(entries) == self._snapshot["fingerprint"]:
+            return False
+        return self.reload()
+
+    # ---------- наблюдение за каталогом ----------
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                logger.error(f"Prompt registry watcher error: {e}")
+
+    def start_watching(self) -> None:
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+_registries: Dict[Path, PromptRegistry] = {}
+
+
+def get_registry(base_dir: Path) -> PromptRegistry:
+    """Один реестр на каталог — все PromptLoader'ы процесса делят его и его наблюдатель."""
+    key = Path(base_dir).resolve()
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = PromptRegistry(key)
+    return registry
+
 
 class PromptLoader:
-    def __init__(self, gh_token):
+    def __init__(self, gh_token, base_dir: Optional[Path] = None):
         self.gh_token = gh_token
-        self.base_dir = Path(__file__).parent
-        self.catalog = self._load_catalog()
-
-    def _load_catalog(self):
-        catalog_path = self.base_dir / "prompts" / "catalog.json"
-        if catalog_path.exists():
-            with open(catalog_path, "r") as f:
-                data = json.load(f)
-                return {item["id"]: item for item in data.get("prompts", [])}
-        return {}
+        self.base_dir = Path(base_dir) if base_dir else Path(__file__).parent
+        # CHANGED: промпты загружаются один раз в реестр в памяти вместо чтения файла на каждый запрос
+        self.registry = get_registry(self.base_dir)
 
     async def get_system_prompt(self, mode: str, mode_map: dict):
         """
@@ -22,21 +193,12 @@ class PromptLoader:
         Если промпт не найден локально, возвращает заглушку.
         Никаких запросов к GitHub не производится.
         """
-        # mode_map: например {"01_CORE": "01-core-prompt"}
-        prompt_id = mode_map.get(mode)
-        if not prompt_id:
-            return f"[Mode '{mode}' not implemented]"
-
-        # Ищем в каталоге
-        entry = self.catalog.get(prompt_id)
-        if not entry:
-            return f"[Prompt '{prompt_id}' not found in catalog]"
+        # mode_map: например {"01_CORE": "01-core-prompt"}; без записи режим ищется по id манифеста
+        entry = self.registry.resolve(mode, mode_map)
+        if entry:
+            return entry["text"]
 
-        file_path = self.base_dir / entry["file"]
-        if not file_path.exists():
-            return f"[Prompt file {file_path} not found]"
-
-        try:
-            return file_path.read_text().strip()
-        except Exception as e:
-            return f"[Error reading prompt file: {e}]"
+        prompt_id = (mode_map or {}).get(mode)
+        if prompt_id:
+            return f"[Prompt '{prompt_id}' not found in catalog]"
+        return f"[Mode '{mode}' not implemented]"
@@ -1,4 +1,5 @@
 # CHANGED: Delegates state synthesis to ConversationStateSynthesizer
+import asyncio
 import json
 import logging
 from typing import List, Dict, Any, Optional
@@ -22,7 +23,10 @@ class PromptService:
     async def get_chat_completion(self, messages: List[Dict[str, str]], model_id: str) -> str:
         """Выполняет запрос к LLM без стриминга, возвращает полный текст ответа."""
         try:
-            completion = self.groq_client.create_completion(
+            # CHANGED: синхронный клиент Groq — в отдельном потоке, чтобы фоновые сводки и
+            # свёртки состояния не блокировали event loop API на всё время запроса к модели
+            completion = await asyncio.to_thread(
+                self.groq_client.create_completion,
                 model=model_id,
                 messages=messages,
                 temperature=0.6,
@@ -1,7 +1,29 @@
 # ADDED: Repository package initializer
+# ADDED: каждая публичная корутина репозиториев выполняется в спане трассировки (utils.tracing);
+# модули оборачиваются до реэкспорта, поэтому и `from repositories.x import f`, и вызовы
+# внутри модуля получают обёрнутые функции
+# ADDED: и учитывается в метриках (utils.metrics: латентность, ошибки, вызовы на запрос)
+from utils.metrics import time_module
+from utils.tracing import instrument_module
+from . import (
+    project_repository, artifact_repository, session_repository, workflow_repository,
+    artifact_type_repository, run_repository, node_execution_repository,
+    execution_queue_repository, truth_repository, version_marker_repository,
+    auth_session_repository,
+)
+
+for _module in (
+    project_repository, artifact_repository, session_repository, workflow_repository,
+    artifact_type_repository, run_repository, node_execution_repository,
+    execution_queue_repository, truth_repository, version_marker_repository,
+    auth_session_repository,
+):
+    time_module(_module)
+    instrument_module(_module, "repo")
+
 from .project_repository import *
 from .artifact_repository import *
 from .session_repository import *
 from .workflow_repository import *
 from .artifact_type_repository import *
-from .run_repository import *
\ No newline at end of file
+from .run_repository import *
@@ -1,9 +1,156 @@
 import json
+import time
 import uuid
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from .base import get_connection
+from utils.compression import COMPRESSION_THRESHOLD, ENCODING_JSON, ENCODING_ZLIB, compress, decompress
+from utils.hash import canonical_json, hash_serialized
+from utils.metrics import cache_counters
 
-async def get_artifacts(project_id: str, artifact_type: Optional[str] = None, logical_key: Optional[str] = None, tx=None) -> List[Dict[str, Any]]:
+# ADDED: тела артефактов хранятся один раз в artifact_blobs (ключ — хэш содержимого);
+# artifacts.content заполнен только у строк, записанных до перехода на blobs.
+# CHANGED: крупные тела хранятся сжатыми (encoding = 'zlib') со словарём типа артефакта
+_ARTIFACT_SELECT = '''a.*, b.content AS blob_content, b.encoding AS blob_encoding,
+                   b.compressed AS blob_compressed, b.dict_id AS blob_dict_id
+            FROM artifacts a
+            LEFT JOIN artifact_blobs b ON b.hash = a.content_ref'''
+
+# Словари неизменяемы (переобучение создаёт новую запись), поэтому кэш по id не устаревает
+_dictionaries: Dict[int, bytes] = {}
+_latest_dictionary: Dict[str, Tuple[Optional[int], float]] = {}
+DICTIONARY_TTL = 300.0
+_dictionary_cache_hit, _dictionary_cache_miss = cache_counters("compression_dictionary")
+
+
+async def _get_dictionary(conn, dict_id: int) -> bytes:
+    dictionary = _dictionaries.get(dict_id)
+    if dictionary is None:
+        dictionary = await conn.fetchval(
+            'SELECT dictionary FROM artifact_compression_dicts WHERE id = $1', dict_id
+        )
+        if dictionary is None:
+            raise LookupError(f"Compression dictionary {dict_id} not found")
+        _dictionaries[dict_id] = bytes(dictionary)
+    return _dictionaries[dict_id]
+
+
+async def _get_latest_dictionary(conn, artifact_type: str) -> Tuple[Optional[int], Optional[bytes]]:
+    entry = _latest_dictionary.get(artifact_type)
+    if entry is not None and time.monotonic() - entry[1] < DICTIONARY_TTL:
+        _dictionary_cache_hit.inc()
+    else:
+        _dictionary_cache_miss.inc()
+        row = await conn.fetchrow('''
+            SELECT id, dictionary FROM artifact_compression_dicts
+            WHERE artifact_type = $1
+            ORDER BY id DESC
+            LIMIT 1
+        ''', artifact_type)
+        if row:
+            _dictionaries[row['id']] = bytes(row['dictionary'])
+        entry = (row['id'] if row else None, time.monotonic())
+        _latest_dictionary[artifact_type] = entry
+    dict_id = entry[0]
+    return dict_id, (_dictionaries.get(dict_id) if dict_id is not None else None)
+
+
+# ADDED: новый словарь виден всем процессам сразу, а не через DICTIONARY_TTL
+DICTIONARY_INVALIDATION_TOPIC = "artifact_dictionary"
+
+
+def invalidate_dictionary_cache(artifact_type: Optional[str] = None) -> None:
+    """Forgets the cached latest dictionary of a type (of every type for None)."""
+    if artifact_type is None:
+        _latest_dictionary.clear()
+    else:
+        _latest_dictionary.pop(artifact_type, None)
+
+
+def _summarize(content: Any) -> str:
+    if isinstance(content, dict):
+        return content.get('text', '')[:100] if 'text' in content else json.dumps(content)[:100]
+    return str(content)[:100]
+
+
+async def _row_to_artifact(conn, row) -> Dict[str, Any]:
+    # CHANGED: created_at/updated_at остаются datetime — JSON-ответ (orjson) сериализует их сам
+    art = dict(row)
+    blob_content = art.pop('blob_content', None)
+    encoding = art.pop('blob_encoding', None)
+    compressed = art.pop('blob_compressed', None)
+    dict_id = art.pop('blob_dict_id', None)
+    if encoding == ENCODING_ZLIB and compressed is not None:
+        zdict = await _get_dictionary(conn, dict_id) if dict_id is not None else None
+        art['content'] = json.loads(decompress(compressed, zdict))
+    elif blob_content is not None:
+        art['content'] = blob_content
+    art['id'] = str(art['id'])
+    art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
+    art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
+    art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
+    if isinstance(art.get('content'), str):
+        art['content'] = json.loads(art['content'])
+    return art
+
+
+def encode_blob(
+    serialized: str, zdict: Optional[bytes] = None, raw: Optional[bytes] = None
+) -> Tuple[str, Optional[str], Optional[bytes], int]:
+    """
+    Выбирает форму хранения тела: (encoding, content, compressed, stored_bytes).
+    Сжимаются только тела больше COMPRESSION_THRESHOLD и только если это выгодно.
+    raw — serialized.encode(), если вызывающий уже его получил.
+    """
+    if raw is None:
+        raw = serialized.encode()
+    if len(raw) >= COMPRESSION_THRESHOLD:
+        packed = compress(raw, zdict)
+        if len(packed) < len(raw):
+            return ENCODING_ZLIB, None, packed, len(packed)
+    return ENCODING_JSON, serialized, None, len(raw)
+
+
+async def _store_blob(
+    conn,
+    content: Any,
+    artifact_type: Optional[str] = None,
+    serialized: Optional[str] = None,
+    content_ref: Optional[str] = None,
+) -> str:
+    """
+    Сохраняет тело в artifact_blobs (если такого ещё нет) и возвращает его хэш.
+    serialized и content_ref — canonical_json(content) и его хэш, если вызывающий их уже посчитал.
+    """
+    # CHANGED: тело сериализуется и кодируется в байты один раз — для хэша, размера и хранения
+    if serialized is None:
+        serialized = canonical_json(content)
+        content_ref = None
+    raw = serialized.encode()
+    if content_ref is None:
+        content_ref = hash_serialized(raw)
+    dict_id, zdict = (None, None)
+    if artifact_type and len(raw) >= COMPRESSION_THRESHOLD:
+        dict_id, zdict = await _get_latest_dictionary(conn, artifact_type)
+    encoding, inline, packed, stored_bytes = encode_blob(serialized, zdict, raw)
+    await conn.execute('''
+        INSERT INTO artifact_blobs (hash, content, size_bytes, encoding, compressed, dict_id, stored_bytes, summary)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        ON CONFLICT (hash) DO NOTHING
+    ''', content_ref, inline, len(raw), encoding, packed,
+        dict_id if packed is not None else None, stored_bytes, _summarize(content))
+    return content_ref
+
+async def get_artifacts(
+    project_id: str,
+    artifact_type: Optional[str] = None,
+    logical_key: Optional[str] = None,
+    include_content: bool = True,
+    tx=None
+) -> List[Dict[str, Any]]:
+    """
+    Артефакты проекта. При include_content=False тела не читаются и не распаковываются:
+    в ответе только сохранённый summary и размер тела (для списков).
+    """
     if tx:
         conn = tx.conn
         close_conn = False
@@ -11,35 +158,35 @@ async def get_artifacts(project_id: str, artifact_type: Optional[str] = None, lo
         conn = await get_connection()
         close_conn = True
     try:
-        query = 'SELECT id, type, parent_id, content, created_at, updated_at, version, status, content_hash, logical_key, superseded_by, node_execution_id FROM artifacts WHERE project_id = $1'
+        # CHANGED: тело артефакта берётся из artifact_blobs по content_ref
+        if include_content:
+            body_columns = '''a.content, b.content AS blob_content, b.encoding AS blob_encoding,
+                   b.compressed AS blob_compressed, b.dict_id AS blob_dict_id,'''
+        else:
+            body_columns = 'b.summary AS blob_summary, b.size_bytes AS content_size,'
+        query = f'''
+            SELECT a.id, a.type, a.parent_id, {body_columns}
+                   a.created_at, a.updated_at, a.version, a.status, a.content_hash, a.content_ref,
+                   a.logical_key, a.superseded_by, a.node_execution_id
+            FROM artifacts a
+            LEFT JOIN artifact_blobs b ON b.hash = a.content_ref
+            WHERE a.project_id = $1'''
         params = [project_id]
         idx = 2
         if artifact_type:
-            query += f' AND type = ${idx}'
+            query += f' AND a.type = ${idx}'
             params.append(artifact_type)
             idx += 1
         if logical_key:
-            query += f' AND logical_key = ${idx}'
+            query += f' AND a.logical_key = ${idx}'
             params.append(logical_key)
             idx += 1
-        query += ' ORDER BY created_at DESC'
+        query += ' ORDER BY a.created_at DESC'
         rows = await conn.fetch(query, *params)
         artifacts = []
         for row in rows:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
-            content = art['content']
-            if isinstance(content, dict):
-                art['summary'] = content.get('text', '')[:100] if 'text' in content else json.dumps(content)[:100]
-            else:
-                art['summary'] = str(content)[:100]
+            art = await _row_to_artifact(conn, row)
+            art['summary'] = _summarize(art['content']) if include_content else (art.pop('blob_summary') or '')
             artifacts.append(art)
         return artifacts
     finally:
@@ -54,22 +201,14 @@ async def get_last_artifact(project_id: str, tx=None) -> Optional[Dict[str, Any]
         conn = await get_connection()
         close_conn = True
     try:
-        row = await conn.fetchrow('''
-            SELECT * FROM artifacts
-            WHERE project_id = $1
-            ORDER BY created_at DESC
+        row = await conn.fetchrow(f'''
+            SELECT {_ARTIFACT_SELECT}
+            WHERE a.project_id = $1
+            ORDER BY a.created_at DESC
             LIMIT 1
         ''', project_id)
         if row:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
+            art = await _row_to_artifact(conn, row)
             return art
         return None
     finally:
@@ -84,22 +223,14 @@ async def get_last_validated_artifact(project_id: str, tx=None) -> Optional[Dict
         conn = await get_connection()
         close_conn = True
     try:
-        row = await conn.fetchrow('''
-            SELECT * FROM artifacts
-            WHERE project_id = $1 AND status = 'VALIDATED'
-            ORDER BY created_at DESC
+        row = await conn.fetchrow(f'''
+            SELECT {_ARTIFACT_SELECT}
+            WHERE a.project_id = $1 AND a.status = 'VALIDATED'
+            ORDER BY a.created_at DESC
             LIMIT 1
         ''', project_id)
         if row:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
+            art = await _row_to_artifact(conn, row)
             return art
         return None
     finally:
@@ -114,22 +245,14 @@ async def get_last_package(parent_id: str, artifact_type: str, tx=None) -> Optio
         conn = await get_connection()
         close_conn = True
     try:
-        row = await conn.fetchrow('''
-            SELECT * FROM artifacts 
-            WHERE parent_id = $1 AND type = $2
-            ORDER BY version DESC
+        row = await conn.fetchrow(f'''
+            SELECT {_ARTIFACT_SELECT}
+            WHERE a.parent_id = $1 AND a.type = $2
+            ORDER BY a.version DESC
             LIMIT 1
         ''', parent_id, artifact_type)
         if row:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
+            art = await _row_to_artifact(conn, row)
             return art
         return None
     finally:
@@ -148,22 +271,14 @@ async def get_last_version(project_id: str, logical_key: str, tx=None) -> Option
         conn = await get_connection()
         close_conn = True
     try:
-        row = await conn.fetchrow("""
-            SELECT * FROM artifacts
-            WHERE project_id = $1 AND logical_key = $2
-            ORDER BY version DESC
+        row = await conn.fetchrow(f"""
+            SELECT {_ARTIFACT_SELECT}
+            WHERE a.project_id = $1 AND a.logical_key = $2
+            ORDER BY a.version DESC
             LIMIT 1
         """, project_id, logical_key)
         if row:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
+            art = await _row_to_artifact(conn, row)
             return art
         return None
     finally:
@@ -179,21 +294,13 @@ async def get_active_artifact_by_logical_key(project_id: str, logical_key: str,
         conn = await get_connection()
         close_conn = True
     try:
-        row = await conn.fetchrow("""
-            SELECT * FROM artifacts
-            WHERE project_id = $1 AND logical_key = $2 AND status = 'ACTIVE'
+        row = await conn.fetchrow(f"""
+            SELECT {_ARTIFACT_SELECT}
+            WHERE a.project_id = $1 AND a.logical_key = $2 AND a.status = 'ACTIVE'
             LIMIT 1
         """, project_id, logical_key)
         if row:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
+            art = await _row_to_artifact(conn, row)
             return art
         return None
     finally:
@@ -228,9 +335,16 @@ async def save_artifact(
     project_id: Optional[str] = None,
     parent_id: Optional[str] = None,
     logical_key: Optional[str] = None,
-    tx=None
+    tx=None,
+    serialized: Optional[str] = None,
+    content_ref: Optional[str] = None,
 ) -> str:
-    """Сохраняет новый артефакт. Версия должна быть целым числом."""
+    """
+    Сохраняет новый артефакт. Версия должна быть целым числом.
+    Тело пишется в artifact_blobs; content_hash по умолчанию равен хэшу тела.
+    serialized/content_ref — canonical_json(content) и hash_serialized от него, если вызывающий
+    уже посчитал их (например, для проверки дубликата): тело не сериализуется и не хэшируется повторно.
+    """
     if tx:
         conn = tx.conn
         close_conn = False
@@ -239,42 +353,60 @@ async def save_artifact(
         close_conn = True
     try:
         artifact_id = str(uuid.uuid4())
-        insert_fields = ['id', 'type', 'version', 'status', 'owner', 'content']
-        insert_values = [artifact_id, artifact_type, version, status, owner, json.dumps(content)]
-        placeholders = ['$1', '$2', '$3', '$4', '$5', '$6']
-        idx = 6
-
-        if project_id:
-            insert_fields.append('project_id')
-            insert_values.append(project_id)
-            idx += 1
-            placeholders.append(f'${idx}')
-        if parent_id:
-            insert_fields.append('parent_id')
-            insert_values.append(parent_id)
-            idx += 1
-            placeholders.append(f'${idx}')
-        if content_hash:
-            insert_fields.append('content_hash')
-            insert_values.append(content_hash)
-            idx += 1
-            placeholders.append(f'${idx}')
-        if logical_key:
-            insert_fields.append('logical_key')
-            insert_values.append(logical_key)
-            idx += 1
-            placeholders.append(f'${idx}')
-
-        query = f'''
-            INSERT INTO artifacts ({', '.join(insert_fields)})
-            VALUES ({', '.join(placeholders)})
-        '''
-        await conn.execute(query, *insert_values)
-        return artifact_id
+        if tx is None:
+            # blob и строка артефакта должны появиться атомарно
+            async with conn.transaction():
+                return await _insert_artifact(
+                    conn, artifact_id, artifact_type, content, owner, version, status,
+                    content_hash, project_id, parent_id, logical_key, serialized, content_ref
+                )
+        return await _insert_artifact(
+            conn, artifact_id, artifact_type, content, owner, version, status,
+            content_hash, project_id, parent_id, logical_key, serialized, content_ref
+        )
     finally:
         if close_conn:
             await conn.close()
 
+async def _insert_artifact(
+    conn, artifact_id, artifact_type, content, owner, version, status,
+    content_hash, project_id, parent_id, logical_key, serialized=None, content_ref=None
+) -> str:
+    content_ref = await _store_blob(conn, content, artifact_type, serialized, content_ref)
+    content_hash = content_hash or content_ref
+    insert_fields = ['id', 'type', 'version', 'status', 'owner', 'content_ref']
+    insert_values = [artifact_id, artifact_type, version, status, owner, content_ref]
+    placeholders = ['$1', '$2', '$3', '$4', '$5', '$6']
+    idx = 6
+
+    if project_id:
+        insert_fields.append('project_id')
+        insert_values.append(project_id)
+        idx += 1
+        placeholders.append(f'${idx}')
+    if parent_id:
+        insert_fields.append('parent_id')
+        insert_values.append(parent_id)
+        idx += 1
+        placeholders.append(f'${idx}')
+    if content_hash:
+        insert_fields.append('content_hash')
+        insert_values.append(content_hash)
+        idx += 1
+        placeholders.append(f'${idx}')
+    if logical_key:
+        insert_fields.append('logical_key')
+        insert_values.append(logical_key)
+        idx += 1
+        placeholders.append(f'${idx}')
+
+    query = f'''
+        INSERT INTO artifacts ({', '.join(insert_fields)})
+        VALUES ({', '.join(placeholders)})
+    '''
+    await conn.execute(query, *insert_values)
+    return artifact_id
+
 async def update_artifact_status(artifact_id: str, status: str, tx=None) -> None:
     """Обновляет статус артефакта."""
     if tx:
@@ -310,17 +442,9 @@ async def get_artifact(artifact_id: str, tx=None) -> Optional[Dict[str, Any]]:
         conn = await get_connection()
         close_conn = True
     try:
-        row = await conn.fetchrow('SELECT * FROM artifacts WHERE id = $1', artifact_id)
+        row = await conn.fetchrow(f'SELECT {_ARTIFACT_SELECT} WHERE a.id = $1', artifact_id)
         if row:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
-            if isinstance(art['content'], str):
-                art['content'] = json.loads(art['content'])
+            art = await _row_to_artifact(conn, row)
             return art
         return None
     finally:
@@ -337,16 +461,10 @@ async def get_artifacts_by_ids(artifact_ids: List[str], tx=None) -> List[Dict[st
         conn = await get_connection()
         close_conn = True
     try:
-        rows = await conn.fetch('SELECT * FROM artifacts WHERE id = ANY($1::uuid[])', artifact_ids)
+        rows = await conn.fetch(f'SELECT {_ARTIFACT_SELECT} WHERE a.id = ANY($1::uuid[])', artifact_ids)
         artifacts = []
         for row in rows:
-            art = dict(row)
-            art['id'] = str(art['id'])
-            art['parent_id'] = str(art['parent_id']) if art['parent_id'] else None
-            art['superseded_by'] = str(art['superseded_by']) if art['superseded_by'] else None
-            art['node_execution_id'] = str(art['node_execution_id']) if art['node_execution_id'] else None
-            art['created_at'] = art['created_at'].isoformat() if art['created_at'] else None
-            art['updated_at'] = art['updated_at'].isoformat() if art['updated_at'] else None
+            art = await _row_to_artifact(conn, row)
             artifacts.append(art)
         return artifacts
     finally:
@@ -368,3 +486,21 @@ async def update_artifact_node_execution(artifact_id: str, node_execution_id: st
     finally:
         if close_conn:
             await conn.close()
+
+async def prune_orphan_blobs(tx=None) -> int:
+    """Удаляет тела, на которые не ссылается ни один артефакт. Возвращает число удалённых."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        result = await conn.execute("""
+            DELETE FROM artifact_blobs b
+            WHERE NOT EXISTS (SELECT 1 FROM artifacts a WHERE a.content_ref = b.hash)
+        """)
+        return int(result.split()[-1])
+    finally:
+        if close_conn:
+            await conn.close()
@@ -0,0 +1,80 @@
+"""
+Репозиторий сессий авторизации (auth_sessions). Ключ — sha256 токена, сам токен в базе не хранится.
+"""
+from datetime import datetime
+from typing import Optional, Dict, Any
+from .base import get_connection
+
+
+async def save_session(
+    token_hash: str,
+    created_at: datetime,
+    expires_at: datetime,
+    master_key_hash: str,
+    tx=None
+) -> None:
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        await conn.execute('''
+            INSERT INTO auth_sessions (token_hash, created_at, expires_at, master_key_hash)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (token_hash) DO UPDATE SET expires_at = EXCLUDED.expires_at
+        ''', token_hash, created_at, expires_at, master_key_hash)
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+async def get_session(token_hash: str, tx=None) -> Optional[Dict[str, Any]]:
+    """Active (not expired) session or None."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        row = await conn.fetchrow('''
+            SELECT created_at, expires_at, master_key_hash
+            FROM auth_sessions
+            WHERE token_hash = $1 AND expires_at > NOW()
+        ''', token_hash)
+        return dict(row) if row else None
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+async def delete_session(token_hash: str, tx=None) -> None:
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        await conn.execute("DELETE FROM auth_sessions WHERE token_hash = $1", token_hash)
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+async def delete_expired_sessions(tx=None) -> int:
+    """Удаляет истёкшие сессии (по индексу expires_at), возвращает их число."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        status = await conn.execute("DELETE FROM auth_sessions WHERE expires_at <= NOW()")
+        return int(status.split()[-1])
+    finally:
+        if close_conn:
+            await conn.close()
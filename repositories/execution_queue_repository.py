@@ -108,4 +108,21 @@ async def reset_stuck_jobs(timeout_minutes: int = 10, tx=None) -> int:
         return len(rows)
     finally:
         if close_conn:
-            await conn.close()
\ No newline at end of file
+            await conn.close()
+
+
+# ADDED: глубина очереди по статусам для метрик worker
+async def count_jobs_by_status(tx=None) -> Dict[str, int]:
+    """Возвращает число задач в каждом статусе (статусы без задач отсутствуют)."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        rows = await conn.fetch("SELECT status, COUNT(*) AS n FROM execution_queue GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+    finally:
+        if close_conn:
+            await conn.close()
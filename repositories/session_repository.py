@@ -44,6 +44,10 @@ async def get_clarification_session(session_id: str, tx=None) -> Optional[Dict[s
             sess['final_artifact_id'] = str(sess['final_artifact_id']) if sess['final_artifact_id'] else None
             if isinstance(sess['history'], str):
                 sess['history'] = json.loads(sess['history'])
+            if isinstance(sess.get('context_summary'), str):
+                sess['context_summary'] = json.loads(sess['context_summary'])
+            if isinstance(sess.get('conversation_state'), str):
+                sess['conversation_state'] = json.loads(sess['conversation_state'])
             sess['created_at'] = sess['created_at'].isoformat() if sess['created_at'] else None
             sess['updated_at'] = sess['updated_at'].isoformat() if sess['updated_at'] else None
             return sess
@@ -70,7 +74,7 @@ async def update_clarification_session(
         for key, value in kwargs.items():
             if key in ('history', 'context_summary', 'status', 'final_artifact_id'):
                 set_clauses.append(f"{key} = ${idx}")
-                if key == 'history' and value is not None:
+                if key in ('history', 'context_summary') and value is not None:
                     values.append(json.dumps(value))
                 else:
                     values.append(value)
@@ -135,6 +139,10 @@ async def list_active_sessions_for_project(project_id: str, tx=None) -> List[Dic
             sess['final_artifact_id'] = str(sess['final_artifact_id']) if sess['final_artifact_id'] else None
             if isinstance(sess['history'], str):
                 sess['history'] = json.loads(sess['history'])
+            if isinstance(sess.get('context_summary'), str):
+                sess['context_summary'] = json.loads(sess['context_summary'])
+            if isinstance(sess.get('conversation_state'), str):
+                sess['conversation_state'] = json.loads(sess['conversation_state'])
             sess['created_at'] = sess['created_at'].isoformat() if sess['created_at'] else None
             sess['updated_at'] = sess['updated_at'].isoformat() if sess['updated_at'] else None
             sessions.append(sess)
@@ -142,3 +150,53 @@ async def list_active_sessions_for_project(project_id: str, tx=None) -> List[Dic
     finally:
         if close_conn:
             await conn.close()
+
+async def get_conversation_state(session_id: str, tx=None) -> Optional[Dict[str, Any]]:
+    """Возвращает материализованное состояние диалога и его версию (без истории)."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        row = await conn.fetchrow(
+            'SELECT conversation_state, state_version FROM clarification_sessions WHERE id = $1',
+            session_id
+        )
+        if not row:
+            return None
+        state = row['conversation_state']
+        if isinstance(state, str):
+            state = json.loads(state)
+        return {"state": state, "version": row['state_version']}
+    finally:
+        if close_conn:
+            await conn.close()
+
+async def save_conversation_state(
+    session_id: str,
+    state: Dict[str, Any],
+    version: int,
+    tx=None
+) -> bool:
+    """
+    Сохраняет состояние диалога, только если версия новее сохранённой.
+    Возвращает False, если запись уже содержит более свежее состояние.
+    """
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        result = await conn.execute('''
+            UPDATE clarification_sessions
+            SET conversation_state = $1, state_version = $2
+            WHERE id = $3 AND state_version < $2
+        ''', json.dumps(state), version, session_id)
+        return result.split()[-1] != '0'
+    finally:
+        if close_conn:
+            await conn.close()
@@ -0,0 +1,124 @@
+"""
+Репозиторий истории истины проекта (ADR-006): project_truth_history хранит
+для каждой ноды интервалы действия провалидированных выполнений [valid_from, valid_to).
+"""
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from .base import get_connection
+
+# Поля, которые роутер истины ожидает в строке узла
+_NODE_COLUMNS = """
+    h.execution_id,
+    h.node_definition_id,
+    h.artifact_id,
+    h.valid_from AS validated_at,
+    h.artifact_logical_key,
+    h.artifact_version,
+    wn.node_id,
+    wn.prompt_key AS node_type,
+    wn.config->>'title' AS node_title
+"""
+
+
+async def append_truth_history(
+    project_id: str,
+    node_definition_id: str,
+    execution_id: str,
+    artifact_id: Optional[str] = None,
+    tx=None
+) -> None:
+    """
+    Закрывает текущий интервал ноды и открывает новый с момента валидации (NOW()
+    транзакции, то же значение, что validated_at у выполнения). Вызывается внутри
+    транзакции validate_execution.
+    """
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        await conn.execute("""
+            UPDATE project_truth_history
+            SET valid_to = NOW()
+            WHERE project_id = $1 AND node_definition_id = $2 AND valid_to IS NULL
+        """, project_id, node_definition_id)
+        await conn.execute("""
+            INSERT INTO project_truth_history
+                (project_id, node_definition_id, execution_id, artifact_id,
+                 artifact_logical_key, artifact_version, valid_from)
+            SELECT $1, $2, $3, a.id, a.logical_key, a.version, NOW()
+            FROM (SELECT 1) AS one
+            LEFT JOIN artifacts a ON a.id = $4::uuid
+        """, project_id, node_definition_id, execution_id, artifact_id)
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+async def get_truth_as_of(project_id: str, as_of: datetime, tx=None) -> List[Dict[str, Any]]:
+    """Состояние истины на момент as_of: один GiST-поиск интервалов, содержащих as_of."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        rows = await conn.fetch(f"""
+            SELECT {_NODE_COLUMNS}
+            FROM project_truth_history h
+            JOIN workflow_nodes wn ON h.node_definition_id = wn.id
+            WHERE h.project_id = $1
+              AND tstzrange(h.valid_from, h.valid_to, '[)') @> $2::timestamptz
+        """, project_id, as_of)
+        return [dict(row) for row in rows]
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+
+async def get_truth_diff(project_id: str, from_ts: datetime, to_ts: datetime, tx=None) -> List[Dict[str, Any]]:
+    """
+    Ноды, состояние которых на from_ts и to_ts различается: два поиска по индексу интервалов
+    и FULL OUTER JOIN по ноде. У добавленных нод пусты поля from_*, у удалённых — to_*.
+    """
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        rows = await conn.fetch("""
+            WITH before AS (
+                SELECT * FROM project_truth_history h
+                WHERE h.project_id = $1
+                  AND tstzrange(h.valid_from, h.valid_to, '[)') @> $2::timestamptz
+            ), after AS (
+                SELECT * FROM project_truth_history h
+                WHERE h.project_id = $1
+                  AND tstzrange(h.valid_from, h.valid_to, '[)') @> $3::timestamptz
+            )
+            SELECT
+                COALESCE(b.node_definition_id, a.node_definition_id) AS node_definition_id,
+                b.execution_id AS from_execution_id,
+                b.artifact_id AS from_artifact_id,
+                b.artifact_logical_key AS from_logical_key,
+                b.artifact_version AS from_version,
+                b.valid_from AS from_validated_at,
+                a.execution_id AS to_execution_id,
+                a.artifact_id AS to_artifact_id,
+                a.artifact_logical_key AS to_logical_key,
+                a.artifact_version AS to_version,
+                a.valid_from AS to_validated_at
+            FROM before b
+            FULL OUTER JOIN after a ON a.node_definition_id = b.node_definition_id
+            WHERE b.execution_id IS DISTINCT FROM a.execution_id
+        """, project_id, from_ts, to_ts)
+        return [dict(row) for row in rows]
+    finally:
+        if close_conn:
+            await conn.close()
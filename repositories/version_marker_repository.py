@@ -0,0 +1,62 @@
+"""
+Дешёвые маркеры версий для ETag: агрегаты по индексированным строкам без чтения тел.
+
+max(xmin) меняется при любой вставке и обновлении строки (в том числе без updated_at),
+а count(*) ловит удаления; вместе они однозначно меняются при любом изменении набора.
+Маркер — кортеж; None означает, что сущности нет.
+"""
+from typing import Optional, Tuple
+from .base import get_connection
+
+_XMIN = "max(xmin::text::bigint)"
+
+
+async def _fetch_marker(query: str, *args, tx=None) -> Optional[Tuple]:
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        row = await conn.fetchrow(query, *args)
+        return tuple(row) if row else None
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+async def workflow_marker(workflow_id: str, tx=None) -> Optional[Tuple]:
+    return await _fetch_marker(f"""
+        SELECT w.xmin::text,
+               (SELECT (count(*), {_XMIN})::text FROM workflow_nodes WHERE workflow_id = w.id),
+               (SELECT (count(*), {_XMIN})::text FROM workflow_edges WHERE workflow_id = w.id)
+        FROM workflows w
+        WHERE w.id = $1
+    """, workflow_id, tx=tx)
+
+
+async def project_artifacts_marker(project_id: str, tx=None) -> Optional[Tuple]:
+    return await _fetch_marker(f"""
+        SELECT count(*), {_XMIN} FROM artifacts WHERE project_id = $1
+    """, project_id, tx=tx)
+
+
+async def project_truth_marker(project_id: str, tx=None) -> Optional[Tuple]:
+    # Названия нод берутся из workflow_nodes, поэтому их изменения тоже входят в маркер
+    return await _fetch_marker(f"""
+        SELECT
+            (SELECT (count(*), {_XMIN})::text FROM project_truth_snapshot WHERE project_id = $1),
+            (SELECT max(id) FROM project_truth_history WHERE project_id = $1),
+            (SELECT (count(*), max(wn.xmin::text::bigint))::text
+             FROM workflow_nodes wn
+             WHERE wn.id IN (SELECT node_definition_id FROM project_truth_history WHERE project_id = $1))
+    """, project_id, tx=tx)
+
+
+async def artifact_types_marker(tx=None) -> Optional[Tuple]:
+    return await _fetch_marker(f"SELECT count(*), {_XMIN} FROM artifact_types", tx=tx)
+
+
+async def run_marker(run_id: str, tx=None) -> Optional[Tuple]:
+    return await _fetch_marker("SELECT xmin::text FROM runs WHERE id = $1", run_id, tx=tx)
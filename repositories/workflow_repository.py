@@ -53,8 +53,6 @@ async def get_workflow(workflow_id: str, tx=None) -> Optional[Dict[str, Any]]:
             wf = dict(row)
             wf['id'] = str(wf['id'])
             wf['project_id'] = str(wf['project_id']) if wf['project_id'] else None
-            wf['created_at'] = wf['created_at'].isoformat() if wf['created_at'] else None
-            wf['updated_at'] = wf['updated_at'].isoformat() if wf['updated_at'] else None
             return wf
         logger.debug("Workflow %s not found", workflow_id)
         return None
@@ -83,8 +81,6 @@ async def list_workflows(project_id: Optional[str] = None, tx=None) -> List[Dict
             wf = dict(row)
             wf['id'] = str(wf['id'])
             wf['project_id'] = str(wf['project_id']) if wf['project_id'] else None
-            wf['created_at'] = wf['created_at'].isoformat() if wf['created_at'] else None
-            wf['updated_at'] = wf['updated_at'].isoformat() if wf['updated_at'] else None
             workflows.append(wf)
         logger.debug("Found %d workflows for project %s", len(workflows), project_id)
         return workflows
@@ -206,8 +202,6 @@ async def get_workflow_nodes(workflow_id: str, tx=None) -> List[Dict[str, Any]]:
             node['id'] = str(node['id'])
             node['workflow_id'] = str(node['workflow_id'])
             node['config'] = json.loads(node['config']) if node['config'] else {}
-            node['created_at'] = node['created_at'].isoformat() if node['created_at'] else None
-            node['updated_at'] = node['updated_at'].isoformat() if node['updated_at'] else None
             nodes.append(node)
         logger.debug("Retrieved %d nodes for workflow %s", len(nodes), workflow_id)
         return nodes
@@ -348,7 +342,6 @@ async def get_workflow_edges(workflow_id: str, tx=None) -> List[Dict[str, Any]]:
             edge = dict(row)
             edge['id'] = str(edge['id'])
             edge['workflow_id'] = str(edge['workflow_id'])
-            edge['created_at'] = edge['created_at'].isoformat() if edge['created_at'] else None
             edges.append(edge)
         logger.debug("Retrieved %d edges for workflow %s", len(edges), workflow_id)
         return edges
@@ -0,0 +1,122 @@
+# ADDED: Admin diagnostics (always require a session, even in TEST_MODE)
+"""
+Диагностика живого процесса. За одним портом может работать несколько uvicorn-воркеров
+(API_WORKERS>1), и каждый запрос попадает в один из них: ответы содержат pid воркера,
+а действия, которые должны затронуть все воркеры, рассылаются через pg_notify.
+"""
+import asyncio
+import logging
+import os
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from repositories.base import QUERY_STATS
+from routers.auth import get_current_session
+from services import cache_invalidation
+from utils import profiler
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(get_current_session)])
+
+QUERY_STATS_RESET_TOPIC = "query_stats_reset"
+
+
+def reset_query_stats_handler(key: Optional[str]) -> None:
+    """Invalidation handler: a reset requested through any worker clears this worker's table."""
+    # key=None приходит и при переподключении слушателя — тогда таблицу не трогаем
+    if key == QUERY_STATS_RESET_TOPIC:
+        QUERY_STATS.reset()
+
+
+@router.get("/queries")
+async def get_query_stats(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: Literal["total", "mean", "max", "calls"] = "total",
+):
+    """
+    SQL statements aggregated by normalized text, slowest first. The table belongs to the
+    uvicorn worker that answered (see pid); totals across workers are in db_query_* on /metrics.
+    """
+    return {"pid": os.getpid(), "statements": QUERY_STATS.snapshot(limit=limit, order_by=order_by)}
+
+
+@router.delete("/queries", status_code=204)
+async def reset_query_stats():
+    """Clears the statement table of every API worker (this one at once, the others via pg_notify)."""
+    QUERY_STATS.reset()
+    await cache_invalidation.publish(QUERY_STATS_RESET_TOPIC, QUERY_STATS_RESET_TOPIC)
+
+
+# ADDED: профилирование живого процесса (того uvicorn-воркера, который принял запрос)
+_profile_lock = asyncio.Lock()
+
+# CHANGED: профиль всех воркеров — по уведомлению каждый пишет файлы в PROFILE_DIR, как worker по SIGUSR1
+PROFILE_TOPIC = "admin_profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/mrak-profiles")
+_profile_task: Optional[asyncio.Task] = None
+
+
+async def _write_profile(seconds: float) -> None:
+    try:
+        async with _profile_lock:
+            collapsed, tasks = await profiler.profile_to_files(PROFILE_DIR, f"api-{os.getpid()}", seconds)
+        logger.info(f"Profile written: {collapsed} (flamegraph input), {tasks} (asyncio tasks)")
+    except Exception as e:
+        logger.error(f"Profiling failed: {e}")
+
+
+def profile_handler(key: Optional[str]) -> None:
+    """Invalidation handler: profiles this worker to files unless a profile is already running."""
+    global _profile_task
+    if key is None:
+        return
+    if _profile_lock.locked() or (_profile_task is not None and not _profile_task.done()):
+        logger.info("Profile already running, request ignored")
+        return
+    _profile_task = asyncio.create_task(_write_profile(float(key)))
+
+
+@router.post("/profile")
+async def profile_process(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    format: Literal["json", "collapsed"] = "json",
+):
+    """
+    Samples every thread of the uvicorn worker that took the request (pid in the response)
+    for `seconds`, then dumps its asyncio tasks. format=collapsed returns only the flamegraph
+    input as text, with the pid in the X-Worker-Pid header. POST /profile/all profiles every worker.
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with _profile_lock:
+        stacks = await profiler.profile(seconds, interval_ms / 1000)
+    collapsed = profiler.render_collapsed(stacks)
+    if format == "collapsed":
+        return PlainTextResponse(collapsed, headers={"X-Worker-Pid": str(os.getpid())})
+    return {
+        "pid": os.getpid(),
+        "seconds": seconds,
+        "samples": sum(stacks.values()),
+        "collapsed": collapsed,
+        "tasks": profiler.dump_tasks(),
+    }
+
+
+@router.post("/profile/all", status_code=202)
+async def profile_all_workers(seconds: float = Query(10.0, gt=0, le=60)):
+    """
+    Asks every API worker (via pg_notify) to profile itself for `seconds` and write
+    api-<pid>-<time>.collapsed and .tasks.txt to PROFILE_DIR on its host.
+    """
+    await cache_invalidation.publish(PROFILE_TOPIC, str(seconds))
+    return {"pid": os.getpid(), "seconds": seconds, "directory": PROFILE_DIR}
+
+
+@router.get("/tasks")
+async def get_tasks():
+    """Pending asyncio tasks of the uvicorn worker that answered (pid) with their await chains."""
+    return {"pid": os.getpid(), "tasks": profiler.dump_tasks()}
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from utils.responses import JSONResponse
 from typing import Optional
 import db
 from repositories.base import transaction
+from repositories import version_marker_repository
 from schemas import (
     ArtifactCreate, GenerateArtifactRequest, SavePackageRequest,
     ValidateArtifactRequest
 )
-from validation import ValidationError
+from validation import INVALIDATION_TOPIC as ARTIFACT_TYPE_TOPIC, ValidationError, validator_registry
+from services import cache_invalidation
 from use_cases.generate_artifact import GenerateArtifactUseCase
 from use_cases.save_artifact_package import SaveArtifactPackageUseCase
 from utils.hash import compute_content_hash
+from utils.etag import etag_headers, make_etag, not_modified
 from dependencies import get_artifact_service
 from artifact_service import ArtifactService
 import logging
@@ -27,9 +30,24 @@ def _make_generation_config(artifact_type: str) -> dict:
     }
 
 @router.get("/projects/{project_id}/artifacts")
-async def list_artifacts(project_id: str, type: Optional[str] = None):
-    artifacts = await db.get_artifacts(project_id, type)
-    return JSONResponse(content=artifacts)
+async def list_artifacts(request: Request, project_id: str, type: Optional[str] = None, include_content: bool = False):
+    # CHANGED: по умолчанию список без тел (только summary и размер) — тела не читаются и не
+    # распаковываются; тело — через GET /artifact/{id}, старое поведение — include_content=true
+    async with transaction() as tx:
+        marker = await version_marker_repository.project_artifacts_marker(project_id, tx=tx)
+        etag = make_etag("artifacts", project_id, type, include_content, marker)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        artifacts = await db.get_artifacts(project_id, type, include_content=include_content, tx=tx)
+    return JSONResponse(content=artifacts, headers=etag_headers(etag))
+
+@router.get("/artifact/{artifact_id}")
+async def get_artifact_endpoint(artifact_id: str):
+    artifact = await db.get_artifact(artifact_id)
+    if not artifact:
+        return JSONResponse(content={"error": "Artifact not found"}, status_code=404)
+    return JSONResponse(content=artifact)
 
 @router.post("/artifact")
 async def create_artifact(
@@ -143,37 +161,46 @@ async def generate_artifact_endpoint(
 
 @router.post("/save_artifact_package")
 async def save_artifact_package(req: SavePackageRequest):
-    use_case = SaveArtifactPackageUseCase()
+    use_case = SaveArtifactPackageUseCase(validator_registry)
     try:
         result = await use_case.execute(req)
         return JSONResponse(content=result)
+    except ValidationError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=422)
     except Exception as e:
         logger.error(f"Error saving package: {e}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @router.get("/projects/{project_id}/messages")
 async def get_project_messages(project_id: str):
-    artifacts = await db.get_artifacts(project_id, artifact_type="LLMResponse")
+    # Тела нужны: это сама переписка, которую показывает чат, а не список для выбора
+    artifacts = await db.get_artifacts(project_id, artifact_type="LLMResponse", include_content=True)
     artifacts.sort(key=lambda x: x['created_at'])
     return JSONResponse(content=artifacts)
 
 # ==================== ВЕРСИОНИРОВАНИЕ АРТЕФАКТОВ (ADR-002) ====================
 @router.get("/artifacts/{logical_key}/versions")
-async def get_artifact_versions(project_id: str, logical_key: str):
+async def get_artifact_versions(project_id: str, logical_key: str, include_content: bool = False):
     """
     Возвращает все версии артефакта с данным logical_key в проекте.
     Параметры:
     - project_id: query parameter
     - logical_key: path parameter
+    - include_content: query parameter; по умолчанию только summary без тел
     """
-    artifacts = await db.get_artifacts(project_id, logical_key=logical_key)
+    artifacts = await db.get_artifacts(project_id, logical_key=logical_key, include_content=include_content)
     return JSONResponse(content=artifacts)
 
 # ==================== ТИПЫ АРТЕФАКТОВ ====================
 
 @router.get("/artifact-types")
-async def list_artifact_types():
+async def list_artifact_types(request: Request):
     async with transaction() as tx:
+        marker = await version_marker_repository.artifact_types_marker(tx=tx)
+        etag = make_etag("artifact-types", marker)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
         rows = await tx.fetch("SELECT * FROM artifact_types ORDER BY type")
     types = []
     for row in rows:
@@ -183,21 +210,16 @@ async def list_artifact_types():
             "allowed_parents": row["allowed_parents"],
             "requires_clarification": row["requires_clarification"],
             "icon": row["icon"],
-            "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-            "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
         })
-    return JSONResponse(content=types)
+    return JSONResponse(content=types, headers=etag_headers(etag))
 
 @router.get("/artifact-types/{type}")
 async def get_artifact_type(type: str):
     t = await db.get_artifact_type(type)
     if not t:
         return JSONResponse(content={"error": "Type not found"}, status_code=404)
-    # Convert datetime fields to strings
-    if t.get("created_at"):
-        t["created_at"] = t["created_at"].isoformat()
-    if t.get("updated_at"):
-        t["updated_at"] = t["updated_at"].isoformat()
     return JSONResponse(content=t)
 
 @router.post("/artifact-types", status_code=201)
@@ -216,6 +238,8 @@ async def create_artifact_type_endpoint(req: dict):
                 icon=req.get("icon"),
                 tx=tx
             )
+            await cache_invalidation.publish(ARTIFACT_TYPE_TOPIC, req["type"], tx=tx)
+        validator_registry.invalidate(req["type"])
         return {"type": req["type"]}
     except Exception as e:
         logger.error(f"Error creating artifact type: {e}")
@@ -229,6 +253,8 @@ async def update_artifact_type_endpoint(type: str, req: dict):
     try:
         async with transaction() as tx:
             await db.update_artifact_type(type, tx=tx, **req)
+            await cache_invalidation.publish(ARTIFACT_TYPE_TOPIC, type, tx=tx)
+        validator_registry.invalidate(type)
         return JSONResponse(content={"status": "updated"})
     except Exception as e:
         logger.error(f"Error updating artifact type: {e}")
@@ -242,6 +268,8 @@ async def delete_artifact_type_endpoint(type: str):
     try:
         async with transaction() as tx:
             await db.delete_artifact_type(type, tx=tx)
+            await cache_invalidation.publish(ARTIFACT_TYPE_TOPIC, type, tx=tx)
+        validator_registry.invalidate(type)
         return JSONResponse(content={"status": "deleted"})
     except Exception as e:
         logger.error(f"Error deleting artifact type: {e}")
@@ -1,20 +1,21 @@
 # routers/auth.py
 from fastapi import APIRouter, Response, Request, HTTPException, Depends, Security
-from fastapi.responses import JSONResponse
+from utils.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from datetime import datetime, timedelta
 
 import os
 import hashlib
 import secrets
 import logging
 
+from services.auth_session_store import SessionStore, SESSION_DURATION
+
 logger = logging.getLogger("MRAK-SERVER")
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
-active_sessions = {}
-SESSION_DURATION = timedelta(hours=24)
+# CHANGED: сессии в auth_sessions (общие для всех процессов) с LRU-кэшем в процессе
+session_store = SessionStore()
 
 security = HTTPBearer(auto_error=False)
 
@@ -23,25 +24,19 @@ def generate_session_token(master_key: str) -> str:
     session_salt = secrets.token_hex(16)
     return f"{key_hash[:32]}:{session_salt}"
 
-def validate_session(session_token: str) -> bool:
-    if session_token not in active_sessions:
-        return False
-    session = active_sessions[session_token]
-    if datetime.now() > session["expires_at"]:
-        del active_sessions[session_token]
-        return False
-    return True
+async def validate_session(session_token: str) -> bool:
+    return await session_store.get(session_token) is not None
 
-def get_current_session(credentials: HTTPAuthorizationCredentials = Security(security)):
+async def get_current_session(credentials: HTTPAuthorizationCredentials = Security(security)):
     """Dependency to get current session from Bearer token"""
     if not credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    token = credentials.credentials
-    if token not in active_sessions or not validate_session(token):
+    session = await session_store.get(credentials.credentials)
+    if session is None:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    return active_sessions[token]
+    return session
 
 @router.post("/login")
 async def login(body: dict):
@@ -63,11 +58,7 @@ async def login(body: dict):
     
     session_token = generate_session_token(master_key)
     
-    active_sessions[session_token] = {
-        "created_at": datetime.now(),
-        "expires_at": datetime.now() + SESSION_DURATION,
-        "master_key_hash": hashlib.sha256(master_key.encode()).hexdigest(),
-    }
+    await session_store.create(session_token, hashlib.sha256(master_key.encode()).hexdigest())
     
     logger.info(f"Login successful")
     
@@ -79,8 +70,11 @@ async def login(body: dict):
     })
 
 @router.post("/logout")
-async def logout():
+async def logout(credentials: HTTPAuthorizationCredentials = Security(security)):
     """Logout - client should clear sessionStorage"""
+    # ADDED: токен отзывается во всех процессах
+    if credentials:
+        await session_store.revoke(credentials.credentials)
     return JSONResponse(content={"status": "logged_out"})
 
 @router.get("/session")
@@ -90,8 +84,8 @@ async def get_session(request: Request, credentials: HTTPAuthorizationCredential
     if credentials:
         token = credentials.credentials
         logger.info(f"Session check via Bearer token")
-        if token in active_sessions and validate_session(token):
-            session = active_sessions[token]
+        session = await session_store.get(token)
+        if session is not None:
             return JSONResponse(content={
                 "authenticated": True,
                 "expires_at": session["expires_at"].isoformat(),
@@ -99,9 +93,9 @@ async def get_session(request: Request, credentials: HTTPAuthorizationCredential
     
     # Fallback to cookie (old method - for backwards compat)
     session_token = request.cookies.get("mrak_session")
-    if session_token and validate_session(session_token):
+    session = await session_store.get(session_token) if session_token else None
+    if session is not None:
         logger.info(f"Session check via cookie")
-        session = active_sessions[session_token]
         return JSONResponse(content={
             "authenticated": True,
             "expires_at": session["expires_at"].isoformat(),
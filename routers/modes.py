@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from utils.responses import JSONResponse
 import logging
-from services import prompt_service, llm_stream_service
+from dependencies import get_prompt_service, get_llm_stream_service  # CHANGED: сервисы процесса
+from prompt_service import PromptService
+from services.llm_stream_service import LLMStreamService
 
 logger = logging.getLogger("MRAK-SERVER")
 
 router = APIRouter(prefix="/api", tags=["modes"])
 
 @router.get("/models")
-async def get_models():
+async def get_models(prompt_service: PromptService = Depends(get_prompt_service)):
     print(f"GET /api/models called, prompt_service.groq_client: {prompt_service.groq_client}")
     models = prompt_service.groq_client.get_active_models()
     print(f"models: {models}")
@@ -58,8 +61,17 @@ async def get_available_modes():
         {"id": "02sum_STATE_SYNTHESIZER", "name": "02sum: STATE_SYNTHESIZER"},
     ]
 
+# ADDED: состояние реестра промптов (количество, объём, время последней перезагрузки)
+@router.get("/prompts/stats")
+async def get_prompt_registry_stats(prompt_service: PromptService = Depends(get_prompt_service)):
+    return JSONResponse(content=prompt_service.prompt_loader.registry.stats())
+
 @router.post("/analyze")
-async def analyze(request: Request):
+async def analyze(
+    request: Request,
+    prompt_service: PromptService = Depends(get_prompt_service),
+    llm_stream_service: LLMStreamService = Depends(get_llm_stream_service),
+):
     try:
         data = await request.json()
     except Exception as e:
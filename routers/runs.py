@@ -1,5 +1,5 @@
 import uuid
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
 from fastapi.responses import StreamingResponse
 from schemas import (
     RunCreate, RunResponse,
@@ -11,7 +11,8 @@ from schemas import (
 from repositories import (
     run_repository, node_execution_repository, project_repository,
     workflow_repository, artifact_repository, session_repository,
-    execution_queue_repository    # ADDED
+    execution_queue_repository,    # ADDED
+    truth_repository, version_marker_repository
 )
 from repositories.base import transaction
 from use_cases.execute_node import ExecuteNodeUseCase
@@ -19,9 +20,15 @@ from dependencies import (
     get_execute_use_case,
     get_llm_stream_service,
     get_prompt_service,
-    get_session_service
+    get_session_service,
+    get_history_compaction_service,
+    get_conversation_state_service,
 )
 from services.llm_stream_service import LLMStreamService
+from services.history_compaction_service import HistoryCompactionService
+from services.conversation_state_service import ConversationStateService
+from domain.history_compaction import CompactionSettings
+from utils.etag import etag_headers, make_etag, not_modified
 from prompt_service import PromptService
 from session_service import SessionService
 import logging
@@ -53,10 +60,20 @@ async def create_run(run_data: RunCreate):
     return run
 
 @router.get("/runs/{run_id}", response_model=RunResponse)
-async def get_run(run_id: str):
-    run = await run_repository.get_run(run_id)
+async def get_run(run_id: str, request: Request, response: Response):
+    # ADDED: ETag по xmin строки run
+    async with transaction() as tx:
+        marker = await version_marker_repository.run_marker(run_id, tx=tx)
+        if marker is None:
+            raise HTTPException(status_code=404, detail="Run not found")
+        etag = make_etag("run", run_id, marker)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        run = await run_repository.get_run(run_id, tx=tx)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
+    response.headers.update(etag_headers(etag))
     return run
 
 @router.post("/runs/{run_id}/nodes/{node_id}/execute", response_model=NodeExecutionResponse)
@@ -104,6 +121,29 @@ async def get_execution_messages(exec_id: str):
     return session.get("history", [])
 
 
+@router.get("/executions/{exec_id}/state")
+async def get_execution_state(
+    exec_id: str,
+    state_service: ConversationStateService = Depends(get_conversation_state_service),
+):
+    """
+    Возвращает последнее материализованное состояние диалога выполнения.
+    Состояние обновляется в фоне после каждого сообщения; запрос не вызывает LLM.
+    """
+    execution = await node_execution_repository.get_node_execution(exec_id)
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+
+    session_id = execution.get("clarification_session_id")
+    if not session_id:
+        raise HTTPException(status_code=404, detail="No clarification session associated with this execution")
+
+    latest = await state_service.get_latest(session_id)
+    if not latest:
+        raise HTTPException(status_code=404, detail="Clarification session not found")
+    return {"session_id": str(session_id), "version": latest["version"], "state": latest["state"]}
+
+
 @router.post("/executions/{exec_id}/messages")
 async def send_execution_message(
     exec_id: str,
@@ -111,6 +151,8 @@ async def send_execution_message(
     stream_service: LLMStreamService = Depends(get_llm_stream_service),
     prompt_service: PromptService = Depends(get_prompt_service),
     session_service: SessionService = Depends(get_session_service),
+    compaction_service: HistoryCompactionService = Depends(get_history_compaction_service),
+    state_service: ConversationStateService = Depends(get_conversation_state_service),
 ):
     """
     Отправляет сообщение пользователя в диалог выполнения.
@@ -136,14 +178,13 @@ async def send_execution_message(
     # 3. Сохраняем сообщение пользователя в сессию
     await session_service.add_message_to_session(session_id, "user", req.message)
 
-    # 4. Получаем полную историю сессии для передачи в LLM
+    # 4. Получаем историю сессии и кэшированную сводку старых ходов
     session = await session_service.get_clarification_session(session_id)
-    history = session["history"]  # список сообщений с ключами role, content
+    history_version = len(session["history"])
+    compaction = CompactionSettings.from_node_config(node.get("config", {}))
 
-    # 5. Формируем сообщения для LLM: системный + вся история
-    messages = [{"role": "system", "content": system_prompt}]
-    for msg in history:
-        messages.append({"role": msg["role"], "content": msg["content"]})
+    # 5. Формируем сообщения для LLM: системный + сводка + последние K ходов
+    messages = compaction_service.build_messages(system_prompt, session, compaction)
 
     # 6. Определяем модель: можно из запроса или из конфига узла
     model = req.model or node.get("config", {}).get("default_model", "llama-3.3-70b-versatile")
@@ -166,6 +207,10 @@ async def send_execution_message(
             # После завершения стрима сохраняем полный ответ ассистента
             if full_response:
                 await session_service.add_message_to_session(session_id, "assistant", full_response)
+                compaction_service.schedule_refresh(session_id, compaction)
+            # CHANGED: состояние сворачивается только после ответа — вместе с сообщением
+            # пользователя, — чтобы запрос к модели-синтезатору не шёл параллельно со стримом
+            state_service.schedule_update(session_id, history_version + (1 if full_response else 0))
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
@@ -305,6 +350,10 @@ async def validate_execution(
                 artifact_version = EXCLUDED.artifact_version,
                 updated_at = NOW()
         """, project_id, node_def_id, exec_id, artifact_id, logical_key, version)
+        # ADDED: интервал действия в истории истины (для запросов as_of)
+        await truth_repository.append_truth_history(
+            project_id, node_def_id, exec_id, artifact_id, tx=tx
+        )
 
         # ===== СОЗДАНИЕ СЛЕДУЮЩЕГО УЗЛА =====
         next_execution_id = None
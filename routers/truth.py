@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
-from datetime import datetime, timezone
+from fastapi import APIRouter, Query, Request
+from utils.responses import JSONResponse
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from repositories.base import transaction
+from repositories import truth_repository, version_marker_repository
+from utils.etag import etag_headers, make_etag, not_modified
+from utils.metrics import cache_counters
 
 router = APIRouter(prefix="/api", tags=["truth"])
 
 @router.get("/projects/{project_id}/truth")
 async def get_project_truth(
+    request: Request,
     project_id: str,
     as_of: Optional[datetime] = Query(None, description="Исторический срез на указанное время (ISO 8601)")
 ):
@@ -16,37 +21,17 @@ async def get_project_truth(
     Если указан параметр as_of, возвращает состояние на указанный момент времени.
     """
     async with transaction() as tx:
+        # ADDED: ETag по маркеру версии истины. Без as_of поле "as_of" ответа — текущее время,
+        # тело не совпадает побайтно, поэтому тег слабый: не изменились только узлы
+        marker = await version_marker_repository.project_truth_marker(project_id, tx=tx)
+        etag = make_etag("truth", project_id, as_of.isoformat() if as_of else None, marker, weak=as_of is None)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
         if as_of:
-            # Исторический срез через оконную функцию
-            rows = await tx.conn.fetch("""
-                WITH ranked AS (
-                    SELECT
-                        ne.id AS execution_id,
-                        ne.node_definition_id,
-                        ne.output_artifact_id AS artifact_id,
-                        ne.validated_at,
-                        a.logical_key AS artifact_logical_key,
-                        a.version AS artifact_version,
-                        ROW_NUMBER() OVER (PARTITION BY ne.node_definition_id ORDER BY ne.validated_at DESC) AS rn
-                    FROM node_executions ne
-                    LEFT JOIN artifacts a ON ne.output_artifact_id = a.id
-                    WHERE ne.project_id = $1
-                      AND ne.validated_at <= $2
-                )
-                SELECT
-                    ranked.execution_id,
-                    ranked.node_definition_id,
-                    ranked.artifact_id,
-                    ranked.validated_at,
-                    ranked.artifact_logical_key,
-                    ranked.artifact_version,
-                    wn.node_id,
-                    wn.prompt_key as node_type,
-                    wn.config->>'title' as node_title
-                FROM ranked
-                JOIN workflow_nodes wn ON ranked.node_definition_id = wn.id
-                WHERE ranked.rn = 1
-            """, project_id, as_of)
+            # CHANGED: исторический срез по project_truth_history (один поиск по индексу
+            # интервалов) вместо оконной функции по всем выполнениям проекта
+            rows = await truth_repository.get_truth_as_of(project_id, as_of, tx=tx)
         else:
             # Текущее состояние из snapshot
             rows = await tx.conn.fetch("""
@@ -85,4 +70,107 @@ async def get_project_truth(
             }
         }
         result["nodes"].append(node_info)
-    return JSONResponse(content=result)
\ No newline at end of file
+    return JSONResponse(content=result, headers=etag_headers(etag))
+
+# ==================== DIFF ИСТИНЫ ====================
+# ADDED: изменения истины между двумя моментами времени
+
+# История только дописывается, поэтому диапазон в прошлом даёт неизменный результат.
+# Запас покрывает транзакции, которые начались до to, но ещё не закоммичены (NOW() = начало)
+IMMUTABLE_AFTER = timedelta(minutes=5)
+DIFF_CACHE_SIZE = 256
+_diff_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_diff_cache_hit, _diff_cache_miss = cache_counters("truth_diff")
+
+
+def _version_delta(old, new) -> Optional[int]:
+    try:
+        return int(new) - int(old)
+    except (TypeError, ValueError):
+        return None
+
+
+def _artifact_side(row, prefix: str) -> Optional[dict]:
+    if row[f"{prefix}_execution_id"] is None:
+        return None
+    return {
+        "execution_id": str(row[f"{prefix}_execution_id"]),
+        "validated_at": row[f"{prefix}_validated_at"].isoformat(),
+        "artifact_id": str(row[f"{prefix}_artifact_id"]) if row[f"{prefix}_artifact_id"] else None,
+        "logical_key": row[f"{prefix}_logical_key"],
+        "version": row[f"{prefix}_version"],
+    }
+
+
+def build_truth_diff(rows) -> dict:
+    diff = {"added": [], "removed": [], "changed": []}
+    for row in rows:
+        before = _artifact_side(row, "from")
+        after = _artifact_side(row, "to")
+        # CHANGED: только поля из истории — без имени и типа ноды из изменяемой workflow_nodes,
+        # иначе ответ за прошлый интервал нельзя отдавать как immutable
+        entry = {
+            "node_id": str(row["node_definition_id"]),
+            "from": before,
+            "to": after,
+        }
+        if before is None:
+            diff["added"].append(entry)
+        elif after is None:
+            diff["removed"].append(entry)
+        else:
+            entry["version_delta"] = _version_delta(before["version"], after["version"])
+            diff["changed"].append(entry)
+    for group in diff.values():
+        group.sort(key=lambda e: e["node_id"])
+    return diff
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat().replace('+00:00', 'Z')
+
+
+@router.get("/projects/{project_id}/truth/diff")
+async def get_project_truth_diff(
+    project_id: str,
+    from_ts: datetime = Query(..., alias="from", description="Начало интервала (ISO 8601)"),
+    to_ts: datetime = Query(..., alias="to", description="Конец интервала (ISO 8601)"),
+):
+    """
+    Что изменилось в истине проекта между from и to: добавленные, удалённые и изменённые
+    ноды с разницей версий артефактов. Диапазоны в прошлом кэшируются и отдаются
+    с Cache-Control: private, immutable — ответ зависит только от истории истины, а имена
+    нод клиент берёт из воркфлоу.
+    """
+    from_ts, to_ts = _as_utc(from_ts), _as_utc(to_ts)
+    if from_ts > to_ts:
+        return JSONResponse(content={"error": "'from' must not be later than 'to'"}, status_code=422)
+
+    immutable = to_ts <= datetime.now(timezone.utc) - IMMUTABLE_AFTER
+    key = (project_id, from_ts, to_ts)
+    result = _diff_cache.get(key) if immutable else None
+    if result is not None:
+        _diff_cache.move_to_end(key)
+        _diff_cache_hit.inc()
+    else:
+        if immutable:
+            _diff_cache_miss.inc()
+        rows = await truth_repository.get_truth_diff(project_id, from_ts, to_ts)
+        result = {
+            "project_id": project_id,
+            "from": _iso(from_ts),
+            "to": _iso(to_ts),
+            **build_truth_diff(rows),
+        }
+        if immutable:
+            _diff_cache[key] = result
+            if len(_diff_cache) > DIFF_CACHE_SIZE:
+                _diff_cache.popitem(last=False)
+
+    # CHANGED: private — эндпоинт за сессией, общие прокси и CDN не должны хранить ответ
+    cache_control = "private, max-age=31536000, immutable" if immutable else "no-cache"
+    return JSONResponse(content=result, headers={"Cache-Control": cache_control})
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query, Request
+from utils.responses import JSONResponse
 from typing import Optional
 import db
 from repositories.base import transaction
+from repositories import version_marker_repository
+from utils.etag import etag_headers, make_etag, not_modified
 from schemas import (
     WorkflowCreate, WorkflowUpdate, WorkflowNodeCreate,
     WorkflowNodeUpdate, WorkflowEdgeCreate
@@ -35,17 +37,26 @@ async def create_workflow(workflow: WorkflowCreate):
     return {"id": wf_id}
 
 @router.get("/workflows/{workflow_id}")
-async def get_workflow(workflow_id: str):
-    wf = await db.get_workflow(workflow_id)
+async def get_workflow(workflow_id: str, request: Request):
+    # CHANGED: ETag по маркеру версии; при совпадении 304 без чтения графа
+    async with transaction() as tx:
+        marker = await version_marker_repository.workflow_marker(workflow_id, tx=tx)
+        if marker is None:
+            return JSONResponse(content={"error": "Workflow not found"}, status_code=404)
+        etag = make_etag("workflow", workflow_id, marker)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        wf = await db.get_workflow(workflow_id, tx=tx)
+        nodes = await db.get_workflow_nodes(workflow_id, tx=tx)
+        edges = await db.get_workflow_edges(workflow_id, tx=tx)
     if not wf:
         return JSONResponse(content={"error": "Workflow not found"}, status_code=404)
-    nodes = await db.get_workflow_nodes(workflow_id)
-    edges = await db.get_workflow_edges(workflow_id)
     return JSONResponse(content={
         "workflow": wf,
         "nodes": nodes,
         "edges": edges
-    })
+    }, headers=etag_headers(etag))
 
 @router.put("/workflows/{workflow_id}")
 async def update_workflow(workflow_id: str, wf_update: WorkflowUpdate):
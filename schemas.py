@@ -8,6 +8,8 @@ from typing import Optional, List, Dict, Any
 
 from pydantic import BaseModel, Field, ConfigDict, field_validator
 
+from domain.prompt_template import validate_node_template  # ADDED
+
 # ==================== Project Schemas ====================
 
 class ProjectBase(BaseModel):
@@ -91,6 +93,13 @@ class WorkflowNodeCreate(BaseModel):
     # ADDED for dialogue support: optional field, if not provided, DB default (false) will be used
     requires_dialogue: Optional[bool] = Field(None, description="Whether this node requires dialogue")
 
+    # ADDED: шаблон проверяется при сохранении ноды, а не когда воркер уже взял задачу
+    @field_validator('config')
+    @classmethod
+    def validate_prompt_template(cls, v: Dict[str, Any]) -> Dict[str, Any]:
+        validate_node_template(v)
+        return v
+
 class WorkflowEdgeCreate(BaseModel):
     source_node: str
     target_node: str
@@ -118,6 +127,13 @@ class WorkflowNodeUpdate(BaseModel):
     position_x: Optional[float] = None
     position_y: Optional[float] = None
 
+    @field_validator('config')
+    @classmethod
+    def validate_prompt_template(cls, v: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if v is not None:
+            validate_node_template(v)
+        return v
+
 class WorkflowResponse(BaseModel):
     id: str
     name: str
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Сжатие уже сохранённых тел артефактов (дополнение к миграции 20261019_03).
+
+Для каждого типа артефакта обучает словарь zlib по образцам его тел, затем
+переписывает тела больше COMPRESSION_THRESHOLD в сжатом виде и печатает отчёт:
+сколько байт было, сколько стало и сколько дал словарь по сравнению с обычным zlib.
+
+    python scripts/compress_artifact_blobs.py [--dry-run] [--samples 200] [--batch 100]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import asyncpg
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.compression import COMPRESSION_THRESHOLD, compress, train_dictionary  # noqa: E402
+from repositories.artifact_repository import DICTIONARY_INVALIDATION_TOPIC  # noqa: E402
+from services.cache_invalidation import publish  # noqa: E402
+
+
+def _fmt(n: int) -> str:
+    return f"{n / 1024 / 1024:.2f} MB" if n >= 1024 * 1024 else f"{n / 1024:.1f} KB"
+
+
+async def _candidates(conn, artifact_type: str, limit=None):
+    # Тело может принадлежать нескольким типам — оно сжимается словарём первого из них
+    query = """
+        SELECT b.hash, b.content::text AS body
+        FROM artifact_blobs b
+        WHERE b.encoding = 'json' AND b.size_bytes >= $1
+          AND (SELECT min(a.type) FROM artifacts a WHERE a.content_ref = b.hash) = $2
+        ORDER BY b.size_bytes DESC
+    """
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return await conn.fetch(query, COMPRESSION_THRESHOLD, artifact_type)
+
+
+async def compress_blobs(conn, dry_run: bool, samples: int, batch: int) -> dict:
+    totals = {"blobs": 0, "raw": 0, "plain_zlib": 0, "stored": 0}
+    types = [r["type"] for r in await conn.fetch("""
+        SELECT DISTINCT a.type
+        FROM artifacts a JOIN artifact_blobs b ON b.hash = a.content_ref
+        WHERE b.encoding = 'json' AND b.size_bytes >= $1
+    """, COMPRESSION_THRESHOLD)]
+
+    for artifact_type in types:
+        sample_rows = await _candidates(conn, artifact_type, limit=samples)
+        zdict = train_dictionary(json.loads(r["body"]) for r in sample_rows)
+        dict_id = None
+        if zdict and not dry_run:
+            dict_id = await conn.fetchval("""
+                INSERT INTO artifact_compression_dicts (artifact_type, dictionary, sample_count)
+                VALUES ($1, $2, $3) RETURNING id
+            """, artifact_type, zdict, len(sample_rows))
+
+        type_totals = {"blobs": 0, "raw": 0, "plain_zlib": 0, "stored": 0}
+        updates = []
+        for row in await _candidates(conn, artifact_type):
+            # Сжимается каноническая форма (json.dumps(sort_keys=True)), как при записи
+            raw = json.dumps(json.loads(row["body"]), sort_keys=True).encode()
+            packed = compress(raw, zdict or None)
+            if len(packed) >= len(raw):
+                continue
+            type_totals["blobs"] += 1
+            type_totals["raw"] += len(raw)
+            type_totals["plain_zlib"] += len(compress(raw))
+            type_totals["stored"] += len(packed)
+            updates.append((row["hash"], packed, dict_id if zdict else None, len(packed)))
+            if len(updates) >= batch and not dry_run:
+                await _apply(conn, updates)
+                updates = []
+        if updates and not dry_run:
+            await _apply(conn, updates)
+
+        print(
+            f"{artifact_type}: {type_totals['blobs']} bodies, {_fmt(type_totals['raw'])} -> "
+            f"{_fmt(type_totals['stored'])} (zlib without dictionary: {_fmt(type_totals['plain_zlib'])}, "
+            f"dictionary {len(zdict)} bytes)"
+        )
+        for key in totals:
+            totals[key] += type_totals[key]
+    return totals
+
+
+async def _apply(conn, updates):
+    async with conn.transaction():
+        await conn.executemany("""
+            UPDATE artifact_blobs
+            SET encoding = 'zlib', compressed = $2, dict_id = $3, stored_bytes = $4, content = NULL
+            WHERE hash = $1 AND encoding = 'json'
+        """, updates)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать экономию, ничего не записывать")
+    parser.add_argument("--samples", type=int, default=200, help="сколько тел типа использовать для обучения словаря")
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL не задан")
+        sys.exit(1)
+
+    conn = await asyncpg.connect(database_url)
+    try:
+        totals = await compress_blobs(conn, args.dry_run, args.samples, args.batch)
+        if not args.dry_run:
+            # Запущенные API-процессы начинают сжимать новые тела новыми словарями
+            await publish(DICTIONARY_INVALIDATION_TOPIC, tx=SimpleNamespace(conn=conn))
+    finally:
+        await conn.close()
+
+    if totals["raw"]:
+        saved = totals["raw"] - totals["stored"]
+        print(
+            f"\nTotal: {totals['blobs']} bodies, {_fmt(totals['raw'])} -> {_fmt(totals['stored'])}, "
+            f"saved {_fmt(saved)} ({saved / totals['raw']:.0%}); "
+            f"zlib without dictionaries would store {_fmt(totals['plain_zlib'])}"
+        )
+    else:
+        print("\nNothing to compress")
+    if args.dry_run:
+        print("(dry run, nothing written)")
+    else:
+        print("Run VACUUM artifact_blobs to return the freed space to the OS.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,31 @@
+import asyncio
 import os
-import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, Response
+from utils.responses import JSONResponse
 import structlog
 
 from routers import projects, artifacts, workflows, auth, truth
 from routers import runs
 from routers import modes
-import db
-from groq_client import GroqClient
-from artifact_service import ArtifactService
-from dependencies import init_dependencies
-
-# ADDED: импорты новых сервисов
-from prompt_loader import PromptLoader
-from prompt_service import PromptService
-from session_service import SessionService
-from services.llm_stream_service import LLMStreamService  # FIXED import path
-
-load_dotenv()
+from routers import admin  # ADDED
+from dependencies import (
+    build_dependencies, get_conversation_state_service, get_prompt_loader, get_prompt_service,
+)
+from middleware import RequestContextMiddleware  # ADDED
+from repositories import artifact_repository
+from repositories.base import close_pool, get_connection, init_pool
+from services.auth_session_store import INVALIDATION_TOPIC as AUTH_SESSION_TOPIC
+from services.cache_invalidation import CacheInvalidationListener
+from services.conversation_state_service import INVALIDATION_TOPIC as CONVERSATION_STATE_TOPIC
+from utils.env import load_env
+from validation import INVALIDATION_TOPIC as ARTIFACT_TYPE_TOPIC, validator_registry
+from utils import loop_watchdog, metrics
+
+load_env()
 
 def validate_env():
     required = ["DATABASE_URL", "MASTER_KEY"]
@@ -52,31 +56,106 @@ structlog.configure(
 )
 
 logger = structlog.get_logger("MRAK-SERVER")
-app = FastAPI(title="MRAK-OS Factory API")
+
+# ADDED: сброс кэшей процесса по уведомлениям из других процессов (uvicorn --workers N)
+cache_listener = CacheInvalidationListener()
+cache_listener.subscribe(AUTH_SESSION_TOPIC, auth.session_store.forget)
+cache_listener.subscribe(artifact_repository.DICTIONARY_INVALIDATION_TOPIC,
+                         artifact_repository.invalidate_dictionary_cache)
+cache_listener.subscribe(ARTIFACT_TYPE_TOPIC, validator_registry.invalidate)
+cache_listener.subscribe(admin.QUERY_STATS_RESET_TOPIC, admin.reset_query_stats_handler)
+cache_listener.subscribe(admin.PROFILE_TOPIC, admin.profile_handler)
+cache_listener.subscribe(CONVERSATION_STATE_TOPIC, lambda key: get_conversation_state_service().forget(key))
+
+# ==================== LIFESPAN ====================
+# ADDED: готовность (readiness) отдельно от живости (liveness): процесс принимает
+# запросы сразу, а пул БД и клиент LLM прогреваются в фоне
+DB_RETRY_DELAY = 2.0
+readiness = {"dependencies": False, "database": False, "llm_client": False}
+
+async def _warm_up_database():
+    while True:
+        try:
+            await init_pool()
+            conn = await get_connection()
+            try:
+                await conn.execute('SELECT 1')
+            finally:
+                await conn.close()
+            readiness["database"] = True
+            logger.info("Database connection OK.")
+            return
+        except Exception as e:
+            logger.error("Database connection failed, retrying", error=str(e))
+            await asyncio.sleep(DB_RETRY_DELAY)
+
+async def _warm_up_llm_client():
+    try:
+        await asyncio.to_thread(get_prompt_service().groq_client.warm_up)
+        readiness["llm_client"] = True
+    except Exception as e:
+        logger.error("LLM client warm-up failed", exc_info=e, error=str(e))
+
+# CHANGED: сервисы создаются при старте каждого процесса, а не при импорте модуля
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up...", pid=os.getpid())
+    # ADDED: LOOP_WATCHDOG=true — лог и метрика, когда что-то блокирует event loop
+    watchdog = loop_watchdog.start_from_env()
+    build_dependencies()
+    readiness["dependencies"] = True
+    warm_up = [asyncio.create_task(_warm_up_database()), asyncio.create_task(_warm_up_llm_client())]
+    prompt_loader = get_prompt_loader()
+    # ADDED: горячая перезагрузка промптов при изменении файлов в prompts/
+    prompt_loader.registry.start_watching()
+    # ADDED: периодическое удаление истёкших сессий авторизации
+    auth.session_store.start_sweeping()
+    cache_listener.start()
+    # ADDED: снимок метрик воркера для /metrics любого другого воркера (API_WORKERS>1)
+    background = []
+    if metrics.MULTIPROC_DIR:
+        background.append(asyncio.create_task(metrics.snapshot_loop(metrics.MULTIPROC_DIR)))
+    try:
+        yield
+    finally:
+        for task in warm_up + background:
+            task.cancel()
+        await asyncio.gather(*warm_up, *background, return_exceptions=True)
+        await cache_listener.stop()
+        await prompt_loader.registry.stop_watching()
+        await auth.session_store.stop_sweeping()
+        await close_pool()
+        if watchdog is not None:
+            await watchdog.stop()
+        for key in readiness:
+            readiness[key] = False
+
+# CHANGED: orjson-ответы по умолчанию, в том числе для эндпоинтов с response_model
+app = FastAPI(title="MRAK-OS Factory API", default_response_class=JSONResponse, lifespan=lifespan)
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
-
-# Инициализация сервисов
-groq_client = GroqClient(api_key=os.getenv("GROQ_API_KEY"))
-artifact_service = ArtifactService(groq_client=groq_client)
-
-# ADDED: создаём необходимые сервисы
-prompt_loader = PromptLoader(gh_token=os.getenv("GITHUB_TOKEN"))  # если нет токена, можно None
-# mode_map пока пустой, так как модуль modes отключён
-mode_map = {}
-prompt_service = PromptService(groq_client, prompt_loader, mode_map)
-llm_stream_service = LLMStreamService(groq_client, prompt_loader)
-session_service = SessionService()  # если нужны параметры, добавить
-
-# Инициализируем зависимости, передавая все сервисы
-init_dependencies(
-    artifact_service,
-    prompt_service,
-    llm_stream_service,
-    session_service
-)
+    """Liveness: the process is up and serving; says nothing about dependencies."""
+    return {"status": "ok", "ready": all(readiness.values())}
+
+# ADDED: readiness для балансировщика/оркестратора — 503, пока прогрев не закончен
+@app.get("/health/ready")
+async def health_ready():
+    ready = all(readiness.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "checks": readiness},
+    )
+
+# ADDED: метрики в формате Prometheus. CHANGED: с METRICS_MULTIPROC_DIR — сумма по всем
+# uvicorn-воркерам, а не реестр того воркера, которому досталось соединение
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if metrics.MULTIPROC_DIR:
+        content = await asyncio.to_thread(metrics.render_processes, metrics.MULTIPROC_DIR)
+    else:
+        content = metrics.render()
+    return Response(content=content, media_type=metrics.CONTENT_TYPE)
 
 # Подключение роутеров
 app.include_router(projects.router)
@@ -86,68 +165,14 @@ app.include_router(workflows.router)
 app.include_router(auth.router)
 app.include_router(truth.router)
 app.include_router(runs.router)
+app.include_router(admin.router)  # ADDED: /api/admin — диагностика процесса
 
 # Модуль modes временно отключён — будет переписан позже
 app.include_router(modes.router)
 
-# ==================== STARTUP EVENT ====================
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up... Testing database connection.")
-    try:
-        conn = await db.get_connection()
-        await conn.execute('SELECT 1')
-        await conn.close()
-        logger.info("Database connection OK.")
-    except Exception as e:
-        logger.error("Database connection failed", exc_info=e, error=str(e))
-
 # ==================== MIDDLEWARE ====================
-@app.middleware("http")
-async def correlation_id_middleware(request: Request, call_next):
-    correlation_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-    request_logger = logger.bind(correlation_id=correlation_id, path=request.url.path, method=request.method)
-    request_logger.info("Request started", remote_addr=request.client.host if request.client else None)
-    try:
-        response = await call_next(request)
-        request_logger.info("Request completed", status_code=response.status_code)
-        response.headers["X-Request-ID"] = correlation_id
-        return response
-    except Exception as e:
-        request_logger.error("Request failed with 5xx", exc_info=e, error=str(e))
-        raise
-
-@app.middleware("http")
-async def validate_session_middleware(request: Request, call_next):
-    request_logger = logger.bind(path=request.url.path)
-    if os.getenv("TEST_MODE") == "true":
-        return await call_next(request)
-    if request.url.path.startswith("/api/auth") or request.url.path == "/api/models":
-        request_logger.debug("Skipping auth for endpoint")
-        return await call_next(request)
-    if request.url.path.startswith("/assets"):
-        return await call_next(request)
-    if request.url.path == "/health":
-        request_logger.debug("Skipping auth for health endpoint")
-        return await call_next(request)
-    if request.url.path.startswith("/api"):
-        auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Bearer "):
-            request_logger.warning("401: Missing or invalid Authorization header")
-            return JSONResponse(
-                status_code=401,
-                content={"detail": "Authentication required: send 'Authorization: Bearer <token>'"}
-            )
-        session_token = auth_header[7:]
-        if not session_token:
-            request_logger.warning("401: Empty session token")
-            return JSONResponse(status_code=401, content={"detail": "Authentication required"})
-        from routers.auth import validate_session
-        if not validate_session(session_token):
-            request_logger.warning("401: Invalid session token")
-            return JSONResponse(status_code=401, content={"detail": "Session expired or invalid"})
-        request_logger.debug("200: Valid session")
-    return await call_next(request)
+# CHANGED: correlation id и проверка сессии — один pure-ASGI слой (см. middleware.py)
+app.add_middleware(RequestContextMiddleware, logger=logger, validate_session=auth.validate_session)
 
 # ==================== STATIC FILES ====================
 BASE_DIR = Path(__file__).parent
@@ -166,7 +191,7 @@ async def serve_frontend():
 
 @app.get("/{path:path}")
 async def serve_spa(path: str):
-    if path.startswith("api/") or path.startswith("docs") or path.startswith("openapi") or path == "health":
+    if path.startswith("api/") or path.startswith("docs") or path.startswith("openapi") or path == "health" or path.startswith("health/"):
         return {"detail": "Not Found"}
     if path == "favicon.ico":
         return {"detail": "Not Found"}
@@ -0,0 +1,135 @@
+# ADDED: Auth session store shared across API processes
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+
+from repositories import auth_session_repository as repo
+from services import cache_invalidation
+from utils.metrics import cache_counters
+
+logger = logging.getLogger(__name__)
+
+SESSION_DURATION = timedelta(hours=24)
+MAX_CACHED_SESSIONS = 10_000
+REVALIDATE_AFTER = 60.0
+SWEEP_INTERVAL = 300.0
+INVALIDATION_TOPIC = "auth_session"
+
+_cache_hit, _cache_miss = cache_counters("auth_session")
+
+
+def hash_token(session_token: str) -> str:
+    return hashlib.sha256(session_token.encode()).hexdigest()
+
+
+class SessionStore:
+    """
+    Sessions live in auth_sessions, so a token issued by one process is valid in all
+    of them; each process keeps an LRU of recently seen sessions in front of it.
+    A cache hit is an O(1) dict lookup. A logout is broadcast to the other processes
+    through cache_invalidation; as a fallback an entry is re-read from the table
+    after REVALIDATE_AFTER seconds.
+    """
+
+    def __init__(
+        self,
+        duration: timedelta = SESSION_DURATION,
+        max_entries: int = MAX_CACHED_SESSIONS,
+        revalidate_after: float = REVALIDATE_AFTER,
+        sweep_interval: float = SWEEP_INTERVAL,
+    ):
+        self.duration = duration
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self.sweep_interval = sweep_interval
+        # sha256(token) -> (session, monotonic time of the last read from the table)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    def _remember(self, token_hash: str, session: Dict[str, Any]) -> None:
+        self._cache[token_hash] = (session, time.monotonic())
+        self._cache.move_to_end(token_hash)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def create(self, session_token: str, master_key_hash: str) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        session = {
+            "created_at": now,
+            "expires_at": now + self.duration,
+            "master_key_hash": master_key_hash,
+        }
+        token_hash = hash_token(session_token)
+        await repo.save_session(token_hash, session["created_at"], session["expires_at"], master_key_hash)
+        self._remember(token_hash, session)
+        return session
+
+    async def get(self, session_token: str) -> Optional[Dict[str, Any]]:
+        """Active session for the token or None."""
+        token_hash = hash_token(session_token)
+        cached = self._cache.get(token_hash)
+        if cached is not None:
+            session, checked_at = cached
+            if datetime.now(timezone.utc) >= session["expires_at"]:
+                del self._cache[token_hash]
+                return None
+            if time.monotonic() - checked_at < self.revalidate_after:
+                self._cache.move_to_end(token_hash)
+                _cache_hit.inc()
+                return session
+        _cache_miss.inc()
+        session = await repo.get_session(token_hash)
+        if session is None:
+            self._cache.pop(token_hash, None)
+            return None
+        self._remember(token_hash, session)
+        return session
+
+    async def revoke(self, session_token: str) -> None:
+        token_hash = hash_token(session_token)
+        self._cache.pop(token_hash, None)
+        await repo.delete_session(token_hash)
+        await cache_invalidation.publish(INVALIDATION_TOPIC, token_hash)
+
+    def forget(self, token_hash: Optional[str]) -> None:
+        """Invalidation handler: drops one cached session, or all of them for None."""
+        if token_hash is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(token_hash, None)
+
+    async def sweep(self) -> int:
+        """Drops expired sessions from the local cache and from the table."""
+        now = datetime.now(timezone.utc)
+        for token_hash in [t for t, (s, _) in self._cache.items() if now >= s["expires_at"]]:
+            del self._cache[token_hash]
+        return await repo.delete_expired_sessions()
+
+    # ---------- периодическая очистка ----------
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info(f"Auth session sweep removed {removed} expired sessions")
+            except Exception as e:
+                logger.error(f"Auth session sweep failed: {e}")
+
+    def start_sweeping(self) -> None:
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop_sweeping(self) -> None:
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
@@ -0,0 +1,105 @@
+# ADDED: Cross-process invalidation of in-memory caches via Postgres LISTEN/NOTIFY
+"""
+Каждый API-процесс (uvicorn --workers N) держит свои кэши. Изменение, после которого
+кэш другого процесса устарел, публикуется через pg_notify; слушатель в каждом процессе
+вызывает обработчики темы. Обработчик получает ключ или None — «сбросить всё»: так
+вызываются все обработчики после переподключения, потому что уведомления,
+пришедшие без соединения, потеряны.
+"""
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+
+from repositories.base import connect, get_connection
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "mrak_cache_invalidation"
+RECONNECT_DELAY = 5.0
+
+Handler = Callable[[Optional[str]], None]
+
+
+async def publish(topic: str, key: Optional[str] = None, tx=None) -> None:
+    """Notifies every listening process; inside tx the notification is sent on commit."""
+    if tx:
+        conn = tx.conn
+        close_conn = False
+    else:
+        conn = await get_connection()
+        close_conn = True
+    try:
+        await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps({"topic": topic, "key": key}))
+    finally:
+        if close_conn:
+            await conn.close()
+
+
+class CacheInvalidationListener:
+    """Holds one LISTEN connection per process and dispatches notifications by topic."""
+
+    def __init__(self, channel: str = CHANNEL, reconnect_delay: float = RECONNECT_DELAY):
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def dispatch(self, topic: str, key: Optional[str]) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"Cache invalidation handler for {topic} failed: {e}")
+
+    def _on_notification(self, conn, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Malformed cache invalidation payload: {payload!r}")
+            return
+        self.dispatch(message.get("topic"), message.get("key"))
+
+    def _flush_all(self) -> None:
+        for topic in self._handlers:
+            self.dispatch(topic, None)
+
+    async def _listen(self) -> None:
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                # Отдельное соединение вне пула: LISTEN держит его всё время работы процесса
+                conn = await connect()
+                await conn.add_listener(self.channel, self._on_notification)
+                if connected_before:
+                    self._flush_all()
+                connected_before = True
+                logger.info(f"Listening for cache invalidations on {self.channel}")
+                while not conn.is_closed():
+                    await asyncio.sleep(self.reconnect_delay)
+                logger.warning("Cache invalidation connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener unavailable: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,123 @@
+# ADDED: Incremental, background conversation-state synthesis
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+
+from repositories.session_repository import (
+    get_clarification_session,
+    get_conversation_state,
+    save_conversation_state,
+)
+from services import cache_invalidation
+from utils.metrics import cache_counters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_MODEL = "llama-3.3-70b-versatile"
+CACHE_SIZE = 1024
+INVALIDATION_TOPIC = "conversation_state"
+
+_cache_hit, _cache_miss = cache_counters("conversation_state")
+
+
+class ConversationStateService:
+    """
+    Materializes the structured conversation state per clarification session.
+
+    Each appended message schedules a background fold of only the messages that are
+    newer than the stored state; the result is persisted together with its version
+    (number of history messages folded in). Readers get the latest materialized state
+    from memory or a single-row read, never an LLM round trip. Requests for the same
+    (session, history version) share one task, and folds of one session are serialized.
+    """
+
+    def __init__(self, prompt_service, model_id: str = DEFAULT_STATE_MODEL):
+        self.synthesizer = prompt_service.state_synthesizer
+        self.model_id = model_id
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get_latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает последнее материализованное состояние: {"state": ..., "version": N}."""
+        cached = self._cache.get(session_id)
+        if cached is not None:
+            self._cache.move_to_end(session_id)
+            _cache_hit.inc()
+            return cached
+        _cache_miss.inc()
+        stored = await get_conversation_state(session_id)
+        if stored and stored["state"] is not None:
+            self._remember(session_id, stored)
+        return stored
+
+    def schedule_update(self, session_id: str, history_version: int) -> asyncio.Task:
+        """Планирует фоновое обновление до версии history_version (дубликаты склеиваются)."""
+        key = (session_id, history_version)
+        task = self._in_flight.get(key)
+        if task is not None:
+            return task
+        task = asyncio.create_task(self._update_safely(session_id, history_version))
+        self._in_flight[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return task
+
+    async def _update_safely(self, session_id: str, history_version: int) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.update(session_id, history_version)
+        except Exception as e:
+            logger.error(f"Conversation state update failed for session {session_id}: {e}")
+            return None
+
+    async def update(self, session_id: str, history_version: int) -> Optional[Dict[str, Any]]:
+        """Folds messages newer than the stored state into it and persists the result."""
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._lock_users[session_id] = self._lock_users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                current = await self.get_latest(session_id) or {"state": None, "version": 0}
+                if current["version"] >= history_version:
+                    return current
+
+                session = await get_clarification_session(session_id)
+                if not session:
+                    return None
+                history = session.get("history", [])
+                target = len(history)
+                new_messages = history[current["version"]:target]
+                state = await self.synthesizer.fold(current["state"], new_messages, self.model_id)
+
+                if await save_conversation_state(session_id, state, target):
+                    result = {"state": state, "version": target}
+                    # ADDED: другие API-процессы сбрасывают свою копию состояния сессии
+                    await cache_invalidation.publish(INVALIDATION_TOPIC, session_id)
+                else:
+                    # Другой процесс уже сохранил более свежее состояние
+                    result = await get_conversation_state(session_id)
+                if result and result["state"] is not None:
+                    self._remember(session_id, result)
+                logger.info(f"Conversation state for session {session_id} at version {target}")
+                return result
+        finally:
+            self._lock_users[session_id] -= 1
+            if not self._lock_users[session_id]:
+                del self._lock_users[session_id]
+                self._locks.pop(session_id, None)
+
+    def forget(self, session_id: Optional[str]) -> None:
+        """Invalidation handler: drops one cached state, or all of them for None."""
+        if session_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(session_id, None)
+
+    def _remember(self, session_id: str, value: Dict[str, Any]) -> None:
+        self._cache[session_id] = value
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
@@ -0,0 +1,107 @@
+# ADDED: Background maintenance of the rolling dialogue summary
+import asyncio
+import datetime
+import logging
+from typing import Dict, Any, List, Optional, Set
+
+from domain.history_compaction import (
+    CompactionSettings,
+    build_compacted_messages,
+    build_summary_prompt,
+    summary_target,
+)
+from repositories.session_repository import (
+    get_clarification_session,
+    update_clarification_session,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUMMARY_MODEL = "llama-3.1-8b-instant"
+
+
+class HistoryCompactionService:
+    """
+    Keeps a cached summary of older dialogue turns in clarification_sessions.context_summary
+    and builds constant-size prompts from it. The summary is folded forward incrementally
+    in the background: only messages that left the verbatim window since the last refresh
+    are sent to the summarizer.
+    """
+
+    def __init__(self, prompt_service):
+        self.prompt_service = prompt_service
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Сессии, для которых пришёл вызов во время обновления, с последними настройками
+        self._dirty: Dict[str, CompactionSettings] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def build_messages(
+        self,
+        system_prompt: str,
+        session: Dict[str, Any],
+        settings: CompactionSettings,
+    ) -> List[Dict[str, str]]:
+        return build_compacted_messages(
+            system_prompt,
+            session.get("history", []),
+            session.get("context_summary"),
+            settings,
+        )
+
+    def schedule_refresh(self, session_id: str, settings: CompactionSettings) -> Optional[asyncio.Task]:
+        """
+        Запускает фоновое обновление сводки; повторные вызовы для той же сессии склеиваются.
+        Вызов во время обновления помечает сессию, и задача делает ещё один проход перед
+        завершением, чтобы сообщения, добавленные за это время, не ждали следующего хода.
+        """
+        if not settings.enabled:
+            return None
+        running = self._in_flight.get(session_id)
+        if running and not running.done():
+            self._dirty[session_id] = settings
+            return running
+        task = asyncio.create_task(self._refresh_safely(session_id, settings))
+        self._in_flight[session_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _refresh_safely(self, session_id: str, settings: CompactionSettings) -> None:
+        try:
+            while True:
+                # Вызовы, пришедшие до начала прохода, он и так учтёт
+                settings = self._dirty.pop(session_id, settings)
+                try:
+                    await self.refresh(session_id, settings)
+                except Exception as e:
+                    logger.error(f"History summary refresh failed for session {session_id}: {e}")
+                if session_id not in self._dirty:
+                    break
+        finally:
+            self._in_flight.pop(session_id, None)
+            self._dirty.pop(session_id, None)
+
+    async def refresh(self, session_id: str, settings: CompactionSettings) -> Optional[Dict[str, Any]]:
+        """Folds messages that left the verbatim window into the stored summary."""
+        session = await get_clarification_session(session_id)
+        if not session:
+            return None
+        history = session.get("history", [])
+        summary = session.get("context_summary") or {}
+        covered = int(summary.get("covered_messages", 0))
+        target = summary_target(len(history), settings)
+        if target <= covered:
+            return summary
+
+        messages = build_summary_prompt(summary.get("text"), history[covered:target])
+        model = settings.summary_model or DEFAULT_SUMMARY_MODEL
+        text = await self.prompt_service.get_chat_completion(messages, model)
+
+        new_summary = {
+            "text": text.strip(),
+            "covered_messages": target,
+            "updated_at": datetime.datetime.now().isoformat(),
+        }
+        await update_clarification_session(session_id, context_summary=new_summary)
+        logger.info(f"History summary for session {session_id} now covers {target} messages")
+        return new_summary
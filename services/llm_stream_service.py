@@ -1,47 +1,91 @@
 # ADDED: LLM streaming service
 import asyncio
-import re
 import logging
+import time
 from typing import List, Dict, Optional, Any
 import db
-from groq_client import GroqClient
+from groq_client import (
+    GroqClient, LLM_COMPLETION_TOKENS, LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS_PER_SECOND, llm_call,
+)
 from prompt_loader import PromptLoader
+from utils.pii_redaction import PIIRedactor, default_redactor  # ADDED
+from utils.tracing import record_span, span  # ADDED
 
 logger = logging.getLogger(__name__)
 
 class LLMStreamService:
-    def __init__(self, groq_client: GroqClient, prompt_loader: PromptLoader):
+    def __init__(self, groq_client: GroqClient, prompt_loader: PromptLoader, redactor: Optional[PIIRedactor] = None):
         self.groq_client = groq_client
         self.prompt_loader = prompt_loader
+        # CHANGED: один проход скомпилированного набора правил вместо re.sub на каждое правило
+        self.redactor = redactor or default_redactor
 
     def _pii_filter(self, text: str) -> str:
-        text = re.sub(r"[\w\.-]+@[\w\.-]+\.\w+", "[EMAIL_REDACTED]", text)
-        text = re.sub(r"(gsk_|sk-)[a-zA-Z0-9]{20,}", "[KEY_REDACTED]", text)
-        return text
+        return self.redactor.redact_cached(text)
+
+    async def _redacted_stream(self, raw_res, model_id: Optional[str] = None):
+        """Редактирует ответ модели на лету; секрет, разрезанный между чанками, тоже скрывается."""
+        # ADDED: спан потока записывается по его окончании (генератор не держит contextvar между yield)
+        started = time.time_ns()
+        first_token_ns = None
+        chunks = 0
+        usage_tokens = None
+        stream = self.redactor.stream()
+        try:
+            for chunk in raw_res.parse():
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token_ns is None:
+                        first_token_ns = time.time_ns() - started
+                    chunks += 1
+                    content = stream.feed(chunk.choices[0].delta.content)
+                    if content:
+                        yield content
+                # Groq присылает usage в последнем чанке (x_groq.usage)
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if isinstance(getattr(usage, "completion_tokens", None), int):
+                    usage_tokens = usage.completion_tokens
+            tail = stream.flush()
+            if tail:
+                yield tail
+        finally:
+            record_span("llm.stream", started, model=model_id, chunks=chunks,
+                        time_to_first_token_ms=first_token_ns / 1e6 if first_token_ns is not None else None)
+            self._observe_stream(model_id, started, first_token_ns, usage_tokens or chunks)
+
+    @staticmethod
+    def _observe_stream(model_id: Optional[str], started_ns: int, first_token_ns: Optional[int], tokens: int) -> None:
+        """TTFT и скорость генерации; без usage число токенов оценивается числом чанков."""
+        if first_token_ns is None:
+            return
+        model = model_id or "default"
+        LLM_TIME_TO_FIRST_TOKEN.labels(model).observe(first_token_ns / 1e9)
+        LLM_COMPLETION_TOKENS.labels(model).inc(tokens)
+        generation_s = (time.time_ns() - started_ns - first_token_ns) / 1e9
+        if generation_s > 0 and tokens > 1:
+            LLM_TOKENS_PER_SECOND.labels(model).observe(tokens / generation_s)
 
     async def stream_analysis(self, user_input: str, system_prompt: str, model_id: str, mode: str, project_id: Optional[str] = None):
         clean_input = self._pii_filter(user_input)
         full_response = ""
         try:
-            raw_res = self.groq_client.client.chat.completions.with_raw_response.create(
-                model=model_id,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": clean_input},
-                ],
-                stream=True,
-                temperature=0.6,
-            )
+            with span("llm.request", model=model_id, mode=mode), llm_call(model_id, "stream"):
+                raw_res = self.groq_client.client.chat.completions.with_raw_response.create(
+                    model=model_id,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": clean_input},
+                    ],
+                    stream=True,
+                    temperature=0.6,
+                )
 
             rt = raw_res.headers.get("x-ratelimit-remaining-tokens", "---")
             rr = raw_res.headers.get("x-ratelimit-remaining-requests", "---")
             yield f"__METADATA__{rt}|{rr}__"
 
-            for chunk in raw_res.parse():
-                if chunk.choices and chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield content
+            async for content in self._redacted_stream(raw_res, model_id):
+                full_response += content
+                yield content
 
             if full_response and project_id:
                 artifact_data = {
@@ -79,27 +123,21 @@ class LLMStreamService:
         Streams a chat completion based on a full message history.
         Yields chunks of the assistant's response.
         """
-        # Optionally filter PII in each message content
-        filtered_messages = []
-        for msg in messages:
-            filtered_msg = msg.copy()
-            if msg.get("content"):
-                filtered_msg["content"] = self._pii_filter(msg["content"])
-            filtered_messages.append(filtered_msg)
+        # CHANGED: история повторяется от хода к ходу — редактированные формы берутся из кэша
+        filtered_messages = self.redactor.redact_messages(messages)
 
         full_response = ""
         try:
-            raw_res = self.groq_client.client.chat.completions.with_raw_response.create(
-                model=model_id,
-                messages=filtered_messages,
-                stream=True,
-                temperature=0.6,
-            )
-            for chunk in raw_res.parse():
-                if chunk.choices and chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield content
+            with span("llm.request", model=model_id), llm_call(model_id, "stream"):
+                raw_res = self.groq_client.client.chat.completions.with_raw_response.create(
+                    model=model_id,
+                    messages=filtered_messages,
+                    stream=True,
+                    temperature=0.6,
+                )
+            async for content in self._redacted_stream(raw_res, model_id):
+                full_response += content
+                yield content
 
             # Optionally save the full response as an artifact
             if full_response and project_id:
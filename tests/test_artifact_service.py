@@ -1,5 +1,7 @@
 import pytest
+import asyncio
 import json
+import time
 import uuid
 import logging
 from unittest.mock import AsyncMock, MagicMock, call, ANY
@@ -592,3 +594,226 @@ async def test_generate_artifact_with_transaction_error(
             generation_config=config,
             logical_key=None
         )
+
+def test_prepare_context_builds_only_used_fields(artifact_service, sample_artifact):
+    config = {"required_input_types": ["test_type"]}
+    context = artifact_service._prepare_context(config, [sample_artifact], frozenset({"test_type"}))
+    assert "all_artifacts" not in context
+    assert json.loads(context["test_type"]) == {"some": "data"}
+
+@pytest.mark.asyncio
+async def test_generate_artifact_invalid_template_fails_before_llm(
+    artifact_service,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction
+):
+    config = {"system_prompt": "Test", "user_prompt_template": "Broken {"}
+    with pytest.raises(ValueError, match="Invalid template syntax"):
+        await artifact_service.generate_artifact(artifact_type="t", generation_config=config)
+    mock_groq_client.create_completion.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_generate_artifact_uses_registry_schema(
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction,
+    mocker
+):
+    from validation import ValidatorRegistry
+    registry = ValidatorRegistry(loader=AsyncMock(return_value={"schema": {"type": "object", "required": ["title"]}}))
+    service = ArtifactService(groq_client=mock_groq_client, validator_registry=registry)
+    mock_groq_client.create_completion.side_effect = [
+        mock_llm_response('{"bad": "data"}'),
+        mock_llm_response('{"title": "ok"}'),
+    ]
+    mocker.patch('asyncio.sleep', return_value=None)
+
+    await service.generate_artifact(artifact_type="Doc", generation_config={"system_prompt": "Test"})
+
+    assert mock_groq_client.create_completion.call_count == 2
+    assert mock_save_artifact.call_args.kwargs["content"] == {"title": "ok"}
+
+def stream_chunks(text, size=5):
+    chunks = []
+    for i in range(0, len(text), size):
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = text[i:i + size]
+        chunks.append(chunk)
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(chunks)
+    return stream, chunks
+
+@pytest.fixture
+def generation_metrics():
+    """Приращения счётчиков генерации за тест (реестр метрик общий на процесс)."""
+    from artifact_service import ABORTED_CHARS, GENERATION_OUTCOMES, REPAIR_ROUNDS
+    tracked = {
+        outcome: GENERATION_OUTCOMES.labels(outcome)
+        for outcome in ("early_abort", "repaired", "repair_failed", "regenerated")
+    }
+    tracked.update(repair_rounds=REPAIR_ROUNDS.labels(), aborted_chars=ABORTED_CHARS.labels())
+    start = {name: child.value for name, child in tracked.items()}
+    return lambda name: tracked[name].value - start[name]
+
+@pytest.fixture
+def package_service(mock_groq_client):
+    from validation import ValidatorRegistry
+    schema = {"type": "array", "items": {"type": "object", "required": ["title"]}}
+    return ArtifactService(mock_groq_client, ValidatorRegistry(loader=AsyncMock(return_value={"schema": schema})))
+
+@pytest.mark.asyncio
+async def test_structured_generation_aborts_on_broken_json(
+    package_service,
+    generation_metrics,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction,
+    mocker
+):
+    bad_stream, bad_chunks = stream_chunks('[{"title": "a"}}, ' + '{"title": "never read"}, ' * 20 + ']')
+    good_stream, _ = stream_chunks('[{"title": "a"}, {"title": "b"}]')
+    mock_groq_client.create_completion.side_effect = [bad_stream, good_stream]
+    mocker.patch('asyncio.sleep', return_value=None)
+
+    await package_service.generate_artifact(artifact_type="Pkg", generation_config={"system_prompt": "Test"})
+
+    assert mock_groq_client.create_completion.call_args.kwargs["stream"] is True
+    bad_stream.close.assert_called_once()
+    assert generation_metrics("early_abort") == 1
+    assert generation_metrics("aborted_chars") < len(bad_chunks) * 5 // 2
+    assert mock_save_artifact.call_args.kwargs["content"] == [{"title": "a"}, {"title": "b"}]
+
+@pytest.mark.asyncio
+async def test_structured_generation_aborts_when_too_many_items_invalid(
+    package_service,
+    generation_metrics,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction,
+    mocker
+):
+    package_service.max_repair_items = 1
+    bad_stream, _ = stream_chunks('[{"x": 1}, {"x": 2}, ' + '{"title": "never read"}, ' * 20 + ']')
+    good_stream, _ = stream_chunks('[{"title": "a"}]')
+    mock_groq_client.create_completion.side_effect = [bad_stream, good_stream]
+    mocker.patch('asyncio.sleep', return_value=None)
+
+    await package_service.generate_artifact(artifact_type="Pkg", generation_config={"system_prompt": "Test"})
+
+    bad_stream.close.assert_called_once()
+    assert generation_metrics("early_abort") == 1
+    assert generation_metrics("repair_rounds") == 0
+
+@pytest.mark.asyncio
+async def test_invalid_item_is_repaired_with_patch(
+    package_service,
+    generation_metrics,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction
+):
+    stream, _ = stream_chunks('[{"title": "a"}, {"oops": 1}, {"title": "c"}]')
+    patch = mock_llm_response('{"items": [{"index": 1, "item": {"title": "b"}}, {"index": 0, "item": {"title": "hijack"}}]}')
+    mock_groq_client.create_completion.side_effect = [stream, patch]
+
+    await package_service.generate_artifact(artifact_type="Pkg", generation_config={"system_prompt": "Test"})
+
+    repair_prompt = mock_groq_client.create_completion.call_args.kwargs["messages"][1]["content"]
+    assert "Item 1 missing required field 'title'" in repair_prompt
+    assert '"c"' not in repair_prompt
+    assert mock_save_artifact.call_args.kwargs["content"] == [{"title": "a"}, {"title": "b"}, {"title": "c"}]
+    assert generation_metrics("repaired") == 1
+    assert generation_metrics("regenerated") == 0
+
+@pytest.mark.asyncio
+async def test_failed_repair_falls_back_to_regeneration(
+    package_service,
+    generation_metrics,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction,
+    mocker
+):
+    bad_stream, _ = stream_chunks('[{"oops": 1}]')
+    good_stream, _ = stream_chunks('[{"title": "fresh"}]')
+    mock_groq_client.create_completion.side_effect = [
+        bad_stream,
+        mock_llm_response("not json"),
+        mock_llm_response('{"items": [{"index": 0, "item": {"still": "bad"}}]}'),
+        good_stream,
+    ]
+    mocker.patch('asyncio.sleep', return_value=None)
+
+    await package_service.generate_artifact(artifact_type="Pkg", generation_config={"system_prompt": "Test"})
+
+    assert generation_metrics("repair_failed") == 1
+    assert generation_metrics("repair_rounds") == 2
+    assert generation_metrics("regenerated") == 1
+    assert mock_save_artifact.call_args.kwargs["content"] == [{"title": "fresh"}]
+
+@pytest.mark.asyncio
+async def test_structured_generation_does_not_block_event_loop(
+    package_service,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction
+):
+    _, chunks = stream_chunks('[{"title": "a"}, {"title": "b"}]')
+
+    def slow_stream():
+        for chunk in chunks:
+            time.sleep(0.02)
+            yield chunk
+
+    mock_groq_client.create_completion.side_effect = lambda **kwargs: slow_stream()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    try:
+        await package_service.generate_artifact(artifact_type="Pkg", generation_config={"system_prompt": "Test"})
+    finally:
+        ticking.cancel()
+    assert mock_save_artifact.call_args.kwargs["content"] == [{"title": "a"}, {"title": "b"}]
+    assert ticks >= 5
+
+@pytest.mark.asyncio
+async def test_completion_and_repair_do_not_block_event_loop(
+    package_service,
+    mock_groq_client,
+    mock_save_artifact,
+    mock_transaction
+):
+    package_service.stream_structured = False
+    responses = iter([
+        mock_llm_response('[{"title": "a"}, {"oops": 1}]'),
+        mock_llm_response('{"items": [{"index": 1, "item": {"title": "b"}}]}'),
+    ])
+
+    def slow_completion(**kwargs):
+        time.sleep(0.1)
+        return next(responses)
+
+    mock_groq_client.create_completion.side_effect = slow_completion
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    try:
+        await package_service.generate_artifact(artifact_type="Pkg", generation_config={"system_prompt": "Test"})
+    finally:
+        ticking.cancel()
+    assert mock_save_artifact.call_args.kwargs["content"] == [{"title": "a"}, {"title": "b"}]
+    assert ticks >= 10
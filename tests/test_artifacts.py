@@ -80,6 +80,27 @@ def test_list_artifacts_with_type_filter(sync_client):
     assert len(data) == 1
     assert data[0]["type"] == "typeA"
 
+def test_list_artifacts_returns_summaries_by_default(sync_client):
+    proj_resp = sync_client.post("/api/projects", json={"name": unique_name("SummaryProj")})
+    assert proj_resp.status_code == 201, f"Failed to create project: {proj_resp.text}"
+    proj_id = proj_resp.json()["id"]
+    art = sync_client.post("/api/artifact", json={
+        "project_id": proj_id,
+        "artifact_type": "typeA",
+        "content": "full body " * 50,
+        "generate": False
+    })
+    assert art.status_code == 200, f"Failed to create artifact: {art.text}"
+
+    listed = sync_client.get(f"/api/projects/{proj_id}/artifacts").json()
+    assert listed[0]["summary"]
+    assert listed[0].get("content") is None
+
+    full = sync_client.get(f"/api/projects/{proj_id}/artifacts", params={"include_content": "true"}).json()
+    assert full[0]["content"]
+    body = sync_client.get(f"/api/artifact/{listed[0]['id']}").json()
+    assert body["content"] == full[0]["content"]
+
 def test_create_artifact_draft_success(sync_client):
     proj_resp = sync_client.post("/api/projects", json={"name": unique_name("DraftProj")})
     assert proj_resp.status_code == 201, f"Failed to create project: {proj_resp.text}"
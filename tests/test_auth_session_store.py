@@ -0,0 +1,95 @@
+"""
+Unit tests for SessionStore; the auth_sessions repository is mocked.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from services.auth_session_store import SessionStore, hash_token
+
+
+@pytest.fixture
+def repo():
+    with patch("services.auth_session_store.repo") as mock_repo, \
+            patch("services.auth_session_store.cache_invalidation") as bus:
+        bus.publish = AsyncMock()
+        mock_repo.bus = bus
+        mock_repo.save_session = AsyncMock()
+        mock_repo.get_session = AsyncMock(return_value=None)
+        mock_repo.delete_session = AsyncMock()
+        mock_repo.delete_expired_sessions = AsyncMock(return_value=3)
+        yield mock_repo
+
+
+def _session(expires_in=timedelta(hours=1)):
+    now = datetime.now(timezone.utc)
+    return {"created_at": now, "expires_at": now + expires_in, "master_key_hash": "h"}
+
+
+@pytest.mark.asyncio
+async def test_created_session_is_validated_from_cache(repo):
+    store = SessionStore()
+    session = await store.create("tok", "h")
+    assert repo.save_session.await_args[0][0] == hash_token("tok")
+    assert await store.get("tok") is session
+    repo.get_session.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_session_from_another_process_is_loaded_once(repo):
+    store = SessionStore()
+    repo.get_session.return_value = _session()
+    assert await store.get("tok") is not None
+    assert await store.get("tok") is not None
+    repo.get_session.assert_awaited_once_with(hash_token("tok"))
+
+
+@pytest.mark.asyncio
+async def test_unknown_and_expired_tokens_are_rejected(repo):
+    store = SessionStore()
+    assert await store.get("unknown") is None
+    store._remember(hash_token("old"), _session(expires_in=timedelta(seconds=-1)))
+    assert await store.get("old") is None
+    assert not store._cache
+
+
+@pytest.mark.asyncio
+async def test_cached_entry_is_revalidated(repo):
+    store = SessionStore(revalidate_after=0)
+    await store.create("tok", "h")
+    # Сессию отозвали в другом процессе
+    assert await store.get("tok") is None
+    assert not store._cache
+
+
+@pytest.mark.asyncio
+async def test_lru_is_bounded(repo):
+    store = SessionStore(max_entries=2)
+    for token in ("a", "b", "c"):
+        await store.create(token, "h")
+    assert list(store._cache) == [hash_token("b"), hash_token("c")]
+
+
+@pytest.mark.asyncio
+async def test_revoke_and_sweep(repo):
+    store = SessionStore()
+    await store.create("tok", "h")
+    store._remember(hash_token("old"), _session(expires_in=timedelta(seconds=-1)))
+    assert await store.sweep() == 3
+    assert list(store._cache) == [hash_token("tok")]
+    await store.revoke("tok")
+    repo.delete_session.assert_awaited_once_with(hash_token("tok"))
+    repo.bus.publish.assert_awaited_once_with("auth_session", hash_token("tok"))
+    assert not store._cache
+
+
+@pytest.mark.asyncio
+async def test_forget_drops_sessions_revoked_elsewhere(repo):
+    store = SessionStore()
+    await store.create("a", "h")
+    await store.create("b", "h")
+    store.forget(hash_token("a"))
+    assert list(store._cache) == [hash_token("b")]
+    store.forget(None)
+    assert not store._cache
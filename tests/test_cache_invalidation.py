@@ -0,0 +1,70 @@
+"""
+Unit tests for cross-process cache invalidation; no database connection is opened.
+"""
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from repositories import artifact_repository
+from services.cache_invalidation import CHANNEL, CacheInvalidationListener, publish
+
+
+def test_notifications_are_dispatched_by_topic():
+    listener = CacheInvalidationListener()
+    seen, other = [], []
+    listener.subscribe("auth_session", seen.append)
+    listener.subscribe("artifact_dictionary", other.append)
+    listener._on_notification(None, 1, CHANNEL, json.dumps({"topic": "auth_session", "key": "h1"}))
+    listener._on_notification(None, 1, CHANNEL, "not json")
+    assert seen == ["h1"]
+    assert other == []
+
+
+def test_failing_handler_does_not_block_others():
+    listener = CacheInvalidationListener()
+    seen = []
+    listener.subscribe("t", MagicMock(side_effect=RuntimeError("boom")))
+    listener.subscribe("t", seen.append)
+    listener.dispatch("t", "k")
+    assert seen == ["k"]
+
+
+def test_flush_all_sends_none_to_every_topic():
+    listener = CacheInvalidationListener()
+    seen = []
+    listener.subscribe("a", seen.append)
+    listener.subscribe("b", seen.append)
+    listener._flush_all()
+    assert seen == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_publish_uses_pg_notify_in_transaction():
+    tx = MagicMock()
+    tx.conn.execute = AsyncMock()
+    await publish("auth_session", "h1", tx=tx)
+    query, channel, payload = tx.conn.execute.await_args[0]
+    assert "pg_notify" in query
+    assert channel == CHANNEL
+    assert json.loads(payload) == {"topic": "auth_session", "key": "h1"}
+
+
+def test_dictionary_cache_invalidation():
+    artifact_repository._latest_dictionary.update({"A": (1, 0.0), "B": (2, 0.0)})
+    artifact_repository.invalidate_dictionary_cache("A")
+    assert "A" not in artifact_repository._latest_dictionary
+    artifact_repository.invalidate_dictionary_cache()
+    assert not artifact_repository._latest_dictionary
+
+
+def test_server_listener_resets_validators_of_changed_artifact_type():
+    import server
+    from validation import validator_registry
+
+    validator_registry._cache.update({"A": (None, 0.0), "B": (None, 0.0)})
+    try:
+        server.cache_listener.dispatch("artifact_type", "A")
+        assert "A" not in validator_registry._cache and "B" in validator_registry._cache
+    finally:
+        validator_registry.invalidate()
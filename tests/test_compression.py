@@ -0,0 +1,102 @@
+import json
+import datetime
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+
+from repositories import artifact_repository
+from repositories.artifact_repository import _row_to_artifact, encode_blob
+from utils.compression import (
+    COMPRESSION_THRESHOLD, ENCODING_JSON, ENCODING_ZLIB, MAX_DICT_SIZE,
+    compress, decompress, train_dictionary,
+)
+from utils.hash import canonical_json
+
+
+def _package(n, seed=0):
+    return [
+        {
+            "description": f"The system shall export report number {i + seed} within five seconds",
+            "priority": "MUST",
+            "stakeholder": "Product Owner",
+            "acceptance_criteria": ["Report is generated", "User is notified"],
+            "business_value": "Saves time of the operations team",
+        }
+        for i in range(n)
+    ]
+
+
+def test_roundtrip_with_and_without_dictionary():
+    data = canonical_json(_package(50)).encode()
+    zdict = train_dictionary([_package(20, seed=100), _package(20, seed=200)])
+    assert decompress(compress(data), None) == data
+    assert decompress(compress(data, zdict), zdict) == data
+
+
+def test_dictionary_improves_small_bodies():
+    samples = [_package(10, seed=s * 10) for s in range(10)]
+    zdict = train_dictionary(samples)
+    data = canonical_json(_package(3, seed=999)).encode()
+    assert len(compress(data, zdict)) < len(compress(data))
+
+
+def test_train_dictionary_respects_size_and_puts_frequent_fragments_last():
+    samples = [{"priority": "MUST", "rare": str(i)} for i in range(5)]
+    zdict = train_dictionary(samples)
+    assert b'"rare"' in zdict  # ключ повторяется во всех образцах
+    assert zdict.endswith(b'"priority": ') or zdict.endswith(b'"MUST"')
+    assert len(train_dictionary([_package(200)] * 3)) <= MAX_DICT_SIZE
+    assert train_dictionary([]) == b""
+
+
+def test_encode_blob_compresses_only_large_bodies():
+    small = canonical_json({"text": "hello"})
+    assert encode_blob(small) == (ENCODING_JSON, small, None, len(small))
+
+    large = canonical_json(_package(100))
+    assert len(large) >= COMPRESSION_THRESHOLD
+    encoding, inline, packed, stored = encode_blob(large)
+    assert encoding == ENCODING_ZLIB
+    assert inline is None
+    assert stored == len(packed) < len(large)
+    assert decompress(packed).decode() == large
+
+
+def _row(**blob):
+    row = {
+        "id": uuid.uuid4(), "parent_id": None, "superseded_by": None, "node_execution_id": None,
+        "created_at": datetime.datetime(2026, 10, 19), "updated_at": None, "content": None,
+        "blob_content": None, "blob_encoding": None, "blob_compressed": None, "blob_dict_id": None,
+    }
+    row.update(blob)
+    return row
+
+
+@pytest.mark.asyncio
+async def test_row_to_artifact_decompresses_with_cached_dictionary(monkeypatch):
+    content = _package(100)
+    zdict = train_dictionary([_package(10, seed=500)])
+    monkeypatch.setattr(artifact_repository, "_dictionaries", {})
+    conn = AsyncMock()
+    conn.fetchval.return_value = zdict
+    row = _row(
+        blob_encoding=ENCODING_ZLIB,
+        blob_compressed=compress(canonical_json(content).encode(), zdict),
+        blob_dict_id=7,
+    )
+
+    art = await _row_to_artifact(conn, row)
+    assert art["content"] == content
+    assert not any(key.startswith("blob_") for key in art)
+    await _row_to_artifact(conn, row)
+    conn.fetchval.assert_awaited_once()  # словарь загружается один раз
+
+
+@pytest.mark.asyncio
+async def test_row_to_artifact_reads_plain_and_legacy_bodies():
+    conn = AsyncMock()
+    plain = await _row_to_artifact(conn, _row(blob_encoding=ENCODING_JSON, blob_content=json.dumps({"a": 1})))
+    legacy = await _row_to_artifact(conn, _row(content=json.dumps({"b": 2})))
+    assert plain["content"] == {"a": 1}
+    assert legacy["content"] == {"b": 2}
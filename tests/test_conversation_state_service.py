@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services.conversation_state_service import ConversationStateService
+
+
+def make_history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"} for i in range(n)]
+
+
+@pytest.fixture
+def prompt_service():
+    service = MagicMock()
+    service.state_synthesizer.fold = AsyncMock(side_effect=lambda prev, msgs, model: {"seen": len(msgs)})
+    return service
+
+
+@pytest.fixture
+def repo():
+    with patch("services.conversation_state_service.get_clarification_session", new_callable=AsyncMock) as get_session, \
+         patch("services.conversation_state_service.get_conversation_state", new_callable=AsyncMock) as get_state, \
+         patch("services.conversation_state_service.save_conversation_state", new_callable=AsyncMock) as save_state, \
+         patch("services.conversation_state_service.cache_invalidation.publish", new_callable=AsyncMock) as publish:
+        save_state.return_value = True
+        yield MagicMock(get_session=get_session, get_state=get_state, save_state=save_state, publish=publish)
+
+
+@pytest.mark.asyncio
+async def test_update_folds_only_new_messages(prompt_service, repo):
+    repo.get_state.return_value = {"state": {"seen": 3}, "version": 3}
+    repo.get_session.return_value = {"history": make_history(5)}
+    service = ConversationStateService(prompt_service)
+
+    result = await service.update("s1", 5)
+
+    previous, new_messages, _ = prompt_service.state_synthesizer.fold.call_args[0]
+    assert previous == {"seen": 3}
+    assert [m["content"] for m in new_messages] == ["m3", "m4"]
+    repo.save_state.assert_awaited_once_with("s1", {"seen": 2}, 5)
+    assert result == {"state": {"seen": 2}, "version": 5}
+
+
+@pytest.mark.asyncio
+async def test_get_latest_served_from_memory_after_update(prompt_service, repo):
+    repo.get_state.return_value = {"state": None, "version": 0}
+    repo.get_session.return_value = {"history": make_history(2)}
+    service = ConversationStateService(prompt_service)
+
+    await service.update("s1", 2)
+    repo.get_state.reset_mock()
+    latest = await service.get_latest("s1")
+
+    assert latest["version"] == 2
+    repo.get_state.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_update_notifies_other_processes_and_forget_drops_cache(prompt_service, repo):
+    repo.get_state.return_value = {"state": None, "version": 0}
+    repo.get_session.return_value = {"history": make_history(2)}
+    service = ConversationStateService(prompt_service)
+
+    await service.update("s1", 2)
+    repo.publish.assert_awaited_once_with("conversation_state", "s1")
+
+    # Другой процесс свернул новые сообщения: уведомление сбрасывает локальную копию
+    service.forget("s1")
+    repo.get_state.return_value = {"state": {"seen": 2}, "version": 4}
+    assert (await service.get_latest("s1"))["version"] == 4
+
+
+@pytest.mark.asyncio
+async def test_update_skips_when_state_is_current(prompt_service, repo):
+    repo.get_state.return_value = {"state": {"seen": 4}, "version": 4}
+    service = ConversationStateService(prompt_service)
+
+    await service.update("s1", 4)
+
+    prompt_service.state_synthesizer.fold.assert_not_called()
+    repo.get_session.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_schedule_update_coalesces_same_version(prompt_service, repo):
+    repo.get_state.return_value = {"state": None, "version": 0}
+    repo.get_session.return_value = {"history": make_history(1)}
+    service = ConversationStateService(prompt_service)
+
+    first = service.schedule_update("s1", 1)
+    second = service.schedule_update("s1", 1)
+    assert first is second
+    await first
+    prompt_service.state_synthesizer.fold.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_versions_are_serialized(prompt_service, repo):
+    stored = {"state": None, "version": 0}
+    repo.get_state.side_effect = lambda sid: dict(stored)
+    repo.get_session.return_value = {"history": make_history(2)}
+
+    async def save(sid, state, version):
+        stored.update(state=state, version=version)
+        return True
+    repo.save_state.side_effect = save
+    service = ConversationStateService(prompt_service)
+
+    await asyncio.gather(service.schedule_update("s1", 1), service.schedule_update("s1", 2))
+
+    # Первая свёртка забирает оба сообщения, вторая видит актуальное состояние
+    prompt_service.state_synthesizer.fold.assert_awaited_once()
+    assert stored["version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_fold_keeps_previous_state(prompt_service, repo):
+    repo.get_state.return_value = {"state": {"seen": 1}, "version": 1}
+    repo.get_session.return_value = {"history": make_history(2)}
+    prompt_service.state_synthesizer.fold.side_effect = ValueError("bad json")
+    service = ConversationStateService(prompt_service)
+
+    assert await service.schedule_update("s1", 2) is None
+    repo.save_state.assert_not_called()
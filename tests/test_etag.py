@@ -0,0 +1,78 @@
+"""
+Unit tests for ETag / If-None-Match handling; version markers and repositories are mocked.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import workflows
+from utils.etag import etag_matches, make_etag
+
+
+def _request(header=None):
+    request = MagicMock()
+    request.headers = {"if-none-match": header} if header is not None else {}
+    return request
+
+
+def test_make_etag_depends_on_every_part():
+    assert make_etag("wf", "1", (3, 10)) == make_etag("wf", "1", (3, 10))
+    assert make_etag("wf", "1", (3, 10)) != make_etag("wf", "1", (3, 11))
+    assert make_etag("wf", "1", (3, 10)).startswith('"')
+    assert make_etag("wf", weak=True).startswith('W/"')
+
+
+def test_etag_matches_uses_weak_comparison():
+    tag = make_etag("x")
+    assert etag_matches(_request(tag), tag)
+    assert etag_matches(_request(f'"other", W/{tag}'), tag)
+    assert etag_matches(_request("*"), tag)
+    assert etag_matches(_request(tag), "W/" + tag)
+    assert not etag_matches(_request('"other"'), tag)
+    assert not etag_matches(_request(), tag)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(workflows.router)
+    with patch("routers.workflows.transaction") as mock_tx, \
+            patch("routers.workflows.db") as mock_db, \
+            patch("routers.workflows.version_marker_repository") as markers:
+        mock_tx.return_value.__aenter__.return_value = MagicMock()
+        markers.workflow_marker = AsyncMock(return_value=("100", "(2,101)", "(1,99)"))
+        mock_db.get_workflow = AsyncMock(return_value={"id": "wf1", "name": "WF"})
+        mock_db.get_workflow_nodes = AsyncMock(return_value=[{"id": "n1"}, {"id": "n2"}])
+        mock_db.get_workflow_edges = AsyncMock(return_value=[{"id": "e1"}])
+        yield TestClient(app), mock_db, markers
+
+
+def test_workflow_returns_304_without_reading_the_graph(client):
+    http, mock_db, _ = client
+    first = http.get("/api/workflows/wf1")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    second = http.get("/api/workflows/wf1", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert mock_db.get_workflow_nodes.await_count == 1
+
+
+def test_workflow_etag_changes_with_marker(client):
+    http, _, markers = client
+    etag = http.get("/api/workflows/wf1").headers["etag"]
+    markers.workflow_marker.return_value = ("100", "(3,120)", "(1,99)")
+    resp = http.get("/api/workflows/wf1", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+
+
+def test_missing_workflow_is_404(client):
+    http, _, markers = client
+    markers.workflow_marker.return_value = None
+    assert http.get("/api/workflows/missing").status_code == 404
@@ -0,0 +1,52 @@
+import hashlib
+import json
+import random
+
+import pytest
+
+from utils.hash import canonical_json, compute_content_hash, hash_serialized, iter_canonical_json
+
+
+def _random_value(rng, depth):
+    kind = rng.randrange(8 if depth < 4 else 5)
+    if kind == 0:
+        return rng.randint(-10**6, 10**6)
+    if kind == 1:
+        return rng.random() * 1000
+    if kind == 2:
+        return rng.choice(["", "plain", "юникод ✓", 'quote " and \\ slash', "\n\t\x00"])
+    if kind == 3:
+        return rng.choice([True, False, None])
+    if kind == 4:
+        return rng.choice([[], {}])
+    # Длинные контейнеры (потоковый путь) только на верхних уровнях, иначе размер взрывается
+    size = rng.choice([1, 3, 70, 300] if depth < 1 else [1, 3, 70] if depth < 2 else [1, 3])
+    if kind in (5, 6):
+        return [_random_value(rng, depth + 1) for _ in range(size)]
+    return {f"k{rng.randrange(1000)}": _random_value(rng, depth + 1) for _ in range(size)}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_streaming_encoding_matches_json_dumps(seed):
+    value = _random_value(random.Random(seed), 0)
+    assert "".join(iter_canonical_json(value)) == json.dumps(value, sort_keys=True)
+    assert compute_content_hash(value) == hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+@pytest.mark.parametrize("value", [
+    [], {}, "text", 1, None,
+    [{"b": 1, "a": [1, 2]}] * 600,
+    {"items": [{"x": i} for i in range(1000)], "meta": {"count": 1000}},
+    {1: "int key", 2: "x"},
+    {"nested": {i: i for i in range(100)}},
+    [[i] * 100 for i in range(10)],
+])
+def test_edge_cases_match_json_dumps(value):
+    assert "".join(iter_canonical_json(value)) == canonical_json(value)
+    assert compute_content_hash(value) == hash_serialized(canonical_json(value))
+
+
+def test_algorithm_is_configurable():
+    content = {"a": 1}
+    assert compute_content_hash(content, algorithm="blake2b") == \
+        hashlib.blake2b(canonical_json(content).encode()).hexdigest()
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch, ANY
+
+from domain.history_compaction import (
+    CompactionSettings,
+    build_compacted_messages,
+    build_summary_prompt,
+    estimate_tokens,
+    summary_target,
+)
+from services.history_compaction_service import HistoryCompactionService
+
+
+def make_history(n):
+    roles = ["user", "assistant"]
+    return [{"role": roles[i % 2], "content": f"message {i}", "timestamp": "t"} for i in range(n)]
+
+
+def test_settings_from_node_config_defaults():
+    settings = CompactionSettings.from_node_config({})
+    assert settings.enabled is True
+    assert settings.keep_messages == settings.keep_turns * 2
+
+
+def test_settings_from_node_config_overrides():
+    settings = CompactionSettings.from_node_config(
+        {"history_compaction": {"keep_turns": 2, "token_budget": 100, "summary_model": "m"}}
+    )
+    assert settings.keep_messages == 4
+    assert settings.token_budget == 100
+    assert settings.summary_model == "m"
+    assert CompactionSettings.from_node_config({"history_compaction": False}).enabled is False
+
+
+def test_short_history_is_sent_verbatim():
+    history = make_history(3)
+    messages = build_compacted_messages("sys", history, None, CompactionSettings(keep_turns=2))
+    assert messages[0] == {"role": "system", "content": "sys"}
+    assert [m["content"] for m in messages[1:]] == ["message 0", "message 1", "message 2"]
+
+
+def test_disabled_compaction_sends_full_history():
+    history = make_history(40)
+    messages = build_compacted_messages("sys", history, None, CompactionSettings(enabled=False))
+    assert len(messages) == 41
+
+
+def test_summary_replaces_covered_turns():
+    history = make_history(20)
+    summary = {"text": "earlier facts", "covered_messages": 16}
+    messages = build_compacted_messages("sys", history, summary, CompactionSettings(keep_turns=2))
+    assert messages[1]["role"] == "system"
+    assert "earlier facts" in messages[1]["content"]
+    assert [m["content"] for m in messages[2:]] == [f"message {i}" for i in range(16, 20)]
+
+
+def test_prompt_size_is_constant_once_summary_caught_up():
+    settings = CompactionSettings(keep_turns=2)
+    sizes = set()
+    for n in (20, 50, 200):
+        summary = {"text": "s", "covered_messages": summary_target(n, settings)}
+        sizes.add(len(build_compacted_messages("sys", make_history(n), summary, settings)))
+    assert sizes == {6}
+
+
+def test_uncovered_gap_respects_token_budget():
+    history = make_history(30)
+    settings = CompactionSettings(keep_turns=1, token_budget=estimate_tokens("sys") + 4 * estimate_tokens("message 10"))
+    messages = build_compacted_messages("sys", history, None, settings)
+    # 2 сообщения хвоста + 2 самых свежих непокрытых сообщения
+    assert [m["content"] for m in messages[1:]] == ["message 26", "message 27", "message 28", "message 29"]
+
+
+def test_tail_is_trimmed_but_last_message_kept():
+    history = make_history(4)
+    history[-1]["content"] = "x" * 400
+    settings = CompactionSettings(keep_turns=2, token_budget=10)
+    messages = build_compacted_messages("sys", history, None, settings)
+    assert messages[-1]["content"] == "x" * 400
+    assert len(messages) == 2
+
+
+def test_build_summary_prompt_includes_previous_summary():
+    prompt = build_summary_prompt("old summary", make_history(2))
+    assert prompt[0]["role"] == "system"
+    assert "old summary" in prompt[1]["content"]
+    assert "user: message 0" in prompt[1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_folds_only_new_messages():
+    prompt_service = AsyncMock()
+    prompt_service.get_chat_completion = AsyncMock(return_value=" new summary ")
+    service = HistoryCompactionService(prompt_service)
+    session = {"history": make_history(12), "context_summary": {"text": "old", "covered_messages": 4}}
+
+    with patch("services.history_compaction_service.get_clarification_session", AsyncMock(return_value=session)), \
+         patch("services.history_compaction_service.update_clarification_session", AsyncMock()) as mock_update:
+        result = await service.refresh("s1", CompactionSettings(keep_turns=2))
+
+    assert result["text"] == "new summary"
+    assert result["covered_messages"] == 8
+    sent = prompt_service.get_chat_completion.call_args[0][0][1]["content"]
+    assert "message 4" in sent and "message 7" in sent
+    assert "message 3" not in sent and "message 8" not in sent
+    mock_update.assert_awaited_once_with("s1", context_summary=ANY)
+
+
+@pytest.mark.asyncio
+async def test_refresh_is_noop_when_summary_is_current():
+    prompt_service = AsyncMock()
+    service = HistoryCompactionService(prompt_service)
+    session = {"history": make_history(6), "context_summary": {"text": "old", "covered_messages": 2}}
+
+    with patch("services.history_compaction_service.get_clarification_session", AsyncMock(return_value=session)), \
+         patch("services.history_compaction_service.update_clarification_session", AsyncMock()) as mock_update:
+        await service.refresh("s1", CompactionSettings(keep_turns=2))
+
+    prompt_service.get_chat_completion.assert_not_called()
+    mock_update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_schedule_refresh_coalesces_per_session():
+    service = HistoryCompactionService(AsyncMock())
+    with patch.object(service, "refresh", AsyncMock()) as mock_refresh:
+        first = service.schedule_refresh("s1", CompactionSettings())
+        second = service.schedule_refresh("s1", CompactionSettings())
+        assert first is second
+        await first
+    mock_refresh.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_schedule_refresh_during_refresh_runs_once_more():
+    service = HistoryCompactionService(AsyncMock())
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_refresh(session_id, settings):
+        started.set()
+        await release.wait()
+
+    with patch.object(service, "refresh", AsyncMock(side_effect=slow_refresh)) as mock_refresh:
+        task = service.schedule_refresh("s1", CompactionSettings())
+        await started.wait()
+        assert service.schedule_refresh("s1", CompactionSettings(keep_turns=3)) is task
+        assert service.schedule_refresh("s1", CompactionSettings(keep_turns=5)) is task
+        release.set()
+        await task
+
+    assert mock_refresh.await_count == 2
+    assert mock_refresh.await_args.args[1].keep_turns == 5
+    assert "s1" not in service._in_flight and "s1" not in service._dirty
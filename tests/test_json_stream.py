@@ -0,0 +1,54 @@
+import json
+import pytest
+
+from utils.json_stream import IncrementalJSONParser, JSONStreamError
+
+
+def feed_all(text, step):
+    parser = IncrementalJSONParser()
+    items = []
+    for i in range(0, len(text), step):
+        items.extend(parser.feed(text[i:i + step]))
+    return parser, items
+
+
+@pytest.mark.parametrize("step", [1, 3, 7, 1000])
+def test_array_items_are_emitted_as_they_close(step):
+    data = [{"a": "x,]}\"y", "n": [1, {"b": None}]}, 2.5, "s\\\"", True, None, []]
+    parser, items = feed_all(json.dumps(data), step)
+    assert [item for _, item in items] == data
+    assert [index for index, _ in items] == list(range(len(data)))
+    assert parser.result() == data
+
+
+def test_item_available_before_document_ends():
+    parser = IncrementalJSONParser()
+    assert parser.feed('[{"id": 1}, {"id"') == [(0, {"id": 1})]
+
+
+def test_object_document_has_no_items_but_parses():
+    parser, items = feed_all('{"a": [1, 2]}', 2)
+    assert items == []
+    assert parser.result() == {"a": [1, 2]}
+
+
+@pytest.mark.parametrize("text", [
+    "Sure! Here is the JSON",
+    '[{"a": 1}}',
+    "[1, 2] extra",
+    "[1,,2]",
+    "[1, 2,]",
+    "[tru, 1]",
+])
+def test_irrecoverable_syntax_raises_early(text):
+    parser = IncrementalJSONParser()
+    with pytest.raises(JSONStreamError):
+        for ch in text:
+            parser.feed(ch)
+
+
+def test_incomplete_document_result_raises():
+    parser = IncrementalJSONParser()
+    parser.feed('[{"a": 1},')
+    with pytest.raises(JSONStreamError, match="incomplete"):
+        parser.result()
@@ -0,0 +1,60 @@
+"""
+Tests for the event-loop watchdog: a synchronous call inside a coroutine is reported
+with its call site, and the lag histogram is fed.
+"""
+import asyncio
+import logging
+import time
+
+import pytest
+
+from utils import loop_watchdog
+from utils.loop_watchdog import LOOP_BLOCKS, LOOP_LAG, LoopWatchdog
+
+
+def _blocking_call(seconds):
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_blocking_call_is_reported_with_call_site(caplog):
+    site = "test_loop_watchdog.py:_blocking_call"
+    before = LOOP_BLOCKS.labels(site).value
+    observed = LOOP_LAG.labels().count
+    watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+    with caplog.at_level(logging.WARNING, logger="utils.loop_watchdog"):
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_call(0.3)
+            await asyncio.sleep(0.05)
+        finally:
+            await watchdog.stop()
+
+    assert LOOP_BLOCKS.labels(site).value == before + 1
+    assert f"Event loop blocked for more than 50 ms in {site}" in caplog.text
+    assert "Event loop was blocked for" in caplog.text
+    assert LOOP_LAG.labels().count > observed
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_is_not_reported(caplog):
+    watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+    with caplog.at_level(logging.WARNING, logger="utils.loop_watchdog"):
+        watchdog.start()
+        await asyncio.sleep(0.2)
+        await watchdog.stop()
+    assert "blocked" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_start_from_env_is_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(loop_watchdog, "ENABLED", False)
+    assert loop_watchdog.start_from_env() is None
+
+    monkeypatch.setattr(loop_watchdog, "ENABLED", True)
+    watchdog = loop_watchdog.start_from_env()
+    try:
+        assert isinstance(watchdog, LoopWatchdog)
+    finally:
+        await watchdog.stop()
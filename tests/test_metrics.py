@@ -0,0 +1,208 @@
+"""
+Tests for utils.metrics and the places that feed it (middleware, repositories, LLM stream).
+"""
+import asyncio
+import os
+import types
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middleware import HTTP_REPOSITORY_CALLS, HTTP_REQUESTS, RequestContextMiddleware
+from services.llm_stream_service import LLMStreamService
+from groq_client import LLM_COMPLETION_TOKENS, LLM_REQUESTS, LLM_TIME_TO_FIRST_TOKEN
+from utils import metrics
+from utils.metrics import Counter, Gauge, Histogram, Registry, count_request_work, start_metrics_server, time_module
+
+
+def _value(metric, *labels):
+    return metric.labels(*labels).value
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    requests = registry.register(Counter("demo_requests_total", "Requests.", ("route",)))
+    depth = registry.register(Gauge("demo_depth", "Depth."))
+    requests.labels("/a").inc()
+    requests.labels("/a").inc(2)
+    requests.labels('say "hi"\n').inc()
+    depth.set(7)
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/a"} 3' in text
+    assert 'demo_requests_total{route="say \\"hi\\"\\n"} 1' in text
+    assert "demo_depth 7" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.register(Histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert 'demo_seconds_bucket{le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{le="1"} 3' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 4' in text
+    assert "demo_seconds_count 4" in text
+    assert "demo_seconds_sum 3.65" in text
+
+
+def test_register_returns_existing_metric_and_rejects_conflicts():
+    registry = Registry()
+    first = registry.register(Counter("demo_total", "Demo.", ("a",)))
+    assert registry.register(Counter("demo_total", "Demo.", ("a",))) is first
+    with pytest.raises(ValueError):
+        registry.register(Gauge("demo_total", "Demo.", ("a",)))
+    with pytest.raises(ValueError):
+        first.labels("x", "y")
+
+
+def _worker_registry(requests: int, latency: float, depth: float) -> Registry:
+    registry = Registry()
+    registry.register(Counter("demo_requests_total", "Requests.", ("route",))).labels("/a").inc(requests)
+    registry.register(Histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))).observe(latency)
+    registry.register(Gauge("demo_depth", "Depth.")).set(depth)
+    return registry
+
+
+def test_snapshots_of_worker_processes_are_summed(tmp_path):
+    live_pid, exited_pid = os.getpid(), 2 ** 22 + 12345
+    metrics.write_snapshot(str(tmp_path), _worker_registry(2, 0.05, 7), pid=live_pid)
+    metrics.write_snapshot(str(tmp_path), _worker_registry(3, 0.5, 9), pid=exited_pid)
+
+    merged = metrics.merge_snapshots(metrics.read_snapshots(str(tmp_path)))
+    text = merged.render()
+
+    # Счётчики и гистограммы завершившегося воркера остаются в сумме, его gauge — нет
+    assert 'demo_requests_total{route="/a"} 5' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert "demo_seconds_count 2" in text
+    assert f'demo_depth{{pid="{live_pid}"}} 7' in text
+    assert f'pid="{exited_pid}"' not in text
+
+
+def test_api_metrics_endpoint_merges_worker_snapshots(tmp_path, monkeypatch):
+    import server
+
+    other = _worker_registry(4, 0.05, 1)
+    metrics.write_snapshot(str(tmp_path), other, pid=os.getpid() + 100000)
+    monkeypatch.setattr(metrics, "MULTIPROC_DIR", str(tmp_path))
+
+    text = TestClient(server.app).get("/metrics").text
+    assert 'demo_requests_total{route="/a"} 4' in text
+    assert "# TYPE cache_requests_total counter" in text
+    assert os.path.exists(tmp_path / f"metrics-{os.getpid()}.json")
+
+
+@pytest.mark.asyncio
+async def test_time_module_records_latency_errors_and_request_calls():
+    module = types.ModuleType("repositories.metrics_demo_repository")
+
+    async def get_thing(thing_id):
+        return thing_id
+
+    async def broken():
+        raise RuntimeError("db down")
+
+    for fn in (get_thing, broken):
+        fn.__module__ = module.__name__
+        setattr(module, fn.__name__, fn)
+    time_module(module)
+    wrapped = module.get_thing
+    time_module(module)
+    assert module.get_thing is wrapped
+
+    with count_request_work() as work:
+        assert await module.get_thing(1) == 1
+        await asyncio.create_task(module.get_thing(2))
+        with pytest.raises(RuntimeError):
+            await module.broken()
+    assert work.repository_calls == 3
+
+    duration = metrics.REPOSITORY_DURATION.labels("metrics_demo_repository.get_thing")
+    assert duration.count == 2
+    assert _value(metrics.REPOSITORY_ERRORS, "metrics_demo_repository.broken") == 1
+    assert _value(metrics.REPOSITORY_ERRORS, "metrics_demo_repository.get_thing") == 0
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+
+    @app.get("/api/metrics-demo/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    async def validate_session(token):
+        return token == "good"
+
+    logger = MagicMock()
+    logger.bind.return_value = logger
+    app.add_middleware(
+        RequestContextMiddleware, logger=logger, validate_session=validate_session, test_mode=False
+    )
+    http = TestClient(app)
+
+    route = "/api/metrics-demo/{item_id}"
+    before_ok = _value(HTTP_REQUESTS, "GET", route, 200)
+    before_rejected = _value(HTTP_REQUESTS, "GET", "unmatched", 401)
+    before_observed = HTTP_REPOSITORY_CALLS.labels("GET", route).count
+
+    for item_id in (1, 2, 3):
+        assert http.get(f"/api/metrics-demo/{item_id}", headers={"Authorization": "Bearer good"}).status_code == 200
+    assert http.get("/api/metrics-demo/4").status_code == 401
+
+    assert _value(HTTP_REQUESTS, "GET", route, 200) == before_ok + 3
+    assert _value(HTTP_REQUESTS, "GET", "unmatched", 401) == before_rejected + 1
+    assert HTTP_REPOSITORY_CALLS.labels("GET", route).count == before_observed + 3
+    assert 'route="/api/metrics-demo/1"' not in metrics.render()
+
+
+@pytest.mark.asyncio
+async def test_stream_records_llm_metrics():
+    def chunk(text, completion_tokens=None):
+        c = MagicMock()
+        c.choices = [MagicMock()] if text else []
+        if text:
+            c.choices[0].delta.content = text
+        c.x_groq.usage.completion_tokens = completion_tokens
+        return c
+
+    groq = MagicMock()
+    raw = groq.client.chat.completions.with_raw_response.create.return_value
+    raw.parse.return_value = [chunk("a"), chunk("b"), chunk(None, completion_tokens=5)]
+    service = LLMStreamService(groq, MagicMock())
+
+    model = "metrics-demo-model"
+    result = "".join([c async for c in service.stream_chat([{"role": "user", "content": "hi"}], model)])
+
+    assert result == "ab"
+    assert _value(LLM_REQUESTS, model, "stream", "ok") == 1
+    assert LLM_TIME_TO_FIRST_TOKEN.labels(model).count == 1
+    assert _value(LLM_COMPLETION_TOKENS, model) == 5
+
+
+@pytest.mark.asyncio
+async def test_worker_metrics_server():
+    server = await start_metrics_server(0, host="127.0.0.1")
+    port = server.sockets[0].getsockname()[1]
+    try:
+        async def get(path):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        ok = await get("/metrics")
+        assert ok.startswith(b"HTTP/1.1 200 OK")
+        assert b"# TYPE cache_requests_total counter" in ok
+        assert (await get("/other")).startswith(b"HTTP/1.1 404")
+    finally:
+        server.close()
+        await server.wait_closed()
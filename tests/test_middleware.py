@@ -0,0 +1,97 @@
+"""
+Tests for the pure-ASGI RequestContextMiddleware on a minimal app.
+"""
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from middleware import RequestContextMiddleware
+
+
+def _app(test_mode=False):
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items():
+        return {"ok": True}
+
+    @app.get("/api/auth/login")
+    async def login():
+        return {"login": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/api/stream")
+    async def stream():
+        return StreamingResponse((f"chunk{i};" for i in range(100)), media_type="text/plain")
+
+    @app.get("/api/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    async def validate_session(token):
+        return token == "good"
+
+    logger = MagicMock()
+    logger.bind.return_value = logger
+    app.add_middleware(
+        RequestContextMiddleware,
+        logger=logger,
+        validate_session=validate_session,
+        test_mode=test_mode,
+    )
+    return app, logger
+
+
+@pytest.fixture
+def client():
+    app, logger = _app()
+    return TestClient(app, raise_server_exceptions=False), logger
+
+
+def test_correlation_id_generated_and_preserved(client):
+    http, _ = client
+    generated = http.get("/health").headers["X-Request-ID"]
+    assert len(generated) == 36
+    resp = http.get("/health", headers={"X-Request-ID": "abc-123"})
+    assert resp.headers["X-Request-ID"] == "abc-123"
+
+
+def test_api_requires_bearer_session(client):
+    http, _ = client
+    missing = http.get("/api/items")
+    assert missing.status_code == 401
+    assert "Bearer" in missing.json()["detail"]
+    assert "X-Request-ID" in missing.headers
+    assert http.get("/api/items", headers={"Authorization": "Bearer "}).status_code == 401
+    bad = http.get("/api/items", headers={"Authorization": "Bearer bad"})
+    assert bad.json() == {"detail": "Session expired or invalid"}
+    assert http.get("/api/items", headers={"Authorization": "Bearer good"}).json() == {"ok": True}
+
+
+def test_public_paths_and_test_mode_skip_auth(client):
+    http, _ = client
+    assert http.get("/api/auth/login").status_code == 200
+    assert http.get("/health").status_code == 200
+    app, _ = _app(test_mode=True)
+    assert TestClient(app).get("/api/items").status_code == 200
+
+
+def test_streaming_body_passes_through(client):
+    http, logger = client
+    resp = http.get("/api/stream", headers={"Authorization": "Bearer good"})
+    assert resp.text == "".join(f"chunk{i};" for i in range(100))
+    assert "X-Request-ID" in resp.headers
+    logger.info.assert_any_call("Request completed", status_code=200)
+
+
+def test_exception_is_logged_and_reraised(client):
+    http, logger = client
+    resp = http.get("/api/boom", headers={"Authorization": "Bearer good"})
+    assert resp.status_code == 500
+    assert logger.error.call_args[0][0] == "Request failed with 5xx"
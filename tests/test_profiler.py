@@ -0,0 +1,153 @@
+"""
+Tests for utils.profiler and the admin profiling endpoints.
+"""
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from utils import profiler
+
+
+def _blocking_call(stop: threading.Event):
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+def test_sample_stacks_sees_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_blocking_call, args=(stop,), name="busy-thread")
+    worker.start()
+    try:
+        stacks = profiler.sample_stacks(0.1, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = {stack: n for stack, n in stacks.items() if stack.startswith("busy-thread;")}
+    assert busy
+    assert all("_blocking_call (test_profiler.py:" in stack for stack in busy)
+
+    collapsed = profiler.render_collapsed(stacks)
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(count) == max(stacks.values())
+
+
+@pytest.mark.asyncio
+async def test_profile_shows_synchronous_call_blocking_the_loop():
+    async def blocking_handler():
+        time.sleep(0.2)  # синхронный вызов внутри корутины
+
+    profiling = asyncio.create_task(profiler.profile(0.15, interval=0.005))
+    await asyncio.sleep(0)
+    await blocking_handler()
+    stacks = await profiling
+
+    loop_stacks = [stack for stack in stacks if "blocking_handler (test_profiler.py:" in stack]
+    assert loop_stacks
+
+
+@pytest.mark.asyncio
+async def test_dump_tasks_shows_await_chain():
+    event = asyncio.Event()
+
+    async def inner():
+        await event.wait()
+
+    async def outer():
+        await inner()
+
+    task = asyncio.create_task(outer(), name="waiting-task")
+    await asyncio.sleep(0)
+    try:
+        tasks = {t["name"]: t for t in profiler.dump_tasks()}
+        waiting = tasks["waiting-task"]
+        assert waiting["state"] == "waiting"
+        assert [frame.split(" ")[0] for frame in waiting["stack"]][:3] == ["outer", "inner", "wait"]
+        assert "Future" in waiting["waiting_on"]
+        assert tasks[asyncio.current_task().get_name()]["state"] == "running"
+        assert "waiting-task [waiting]" in profiler.render_tasks(list(tasks.values()))
+    finally:
+        event.set()
+        await task
+
+
+@pytest.mark.asyncio
+async def test_profile_to_files(tmp_path):
+    collapsed, tasks = await profiler.profile_to_files(str(tmp_path / "profiles"), "worker-1", 0.05)
+    assert collapsed.endswith(".collapsed") and tasks.endswith(".tasks.txt")
+    assert "MainThread;" in open(collapsed).read()
+    assert "[running]" in open(tasks).read()
+
+
+def test_admin_profile_endpoint():
+    import server
+
+    http = TestClient(server.app)
+    assert http.post("/api/admin/profile?seconds=0.05").status_code == 401
+
+    headers = {"Authorization": "Bearer t"}
+    with patch("routers.auth.session_store.get", AsyncMock(return_value={"master_key_hash": "x"})):
+        resp = http.post("/api/admin/profile?seconds=0.05&interval_ms=5", headers=headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["pid"] == os.getpid()
+        assert body["samples"] > 0
+        assert body["collapsed"].strip()
+        assert any(t["state"] == "running" for t in body["tasks"])
+
+        text = http.post("/api/admin/profile?seconds=0.05&format=collapsed", headers=headers)
+        assert text.headers["content-type"].startswith("text/plain")
+        assert text.headers["x-worker-pid"] == str(os.getpid())
+        assert http.post("/api/admin/profile?seconds=120", headers=headers).status_code == 422
+        assert http.get("/api/admin/tasks", headers=headers).json()["pid"] == os.getpid()
+
+        with patch("routers.admin.cache_invalidation.publish", AsyncMock()) as publish:
+            resp = http.post("/api/admin/profile/all?seconds=2", headers=headers)
+        assert resp.status_code == 202
+        publish.assert_awaited_once_with("admin_profile", "2.0")
+
+
+@pytest.mark.asyncio
+async def test_profile_notification_writes_files_once(tmp_path, monkeypatch):
+    from routers import admin
+
+    monkeypatch.setattr(admin, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(admin, "_profile_task", None)
+
+    admin.profile_handler(None)  # переподключение слушателя — не профилируем
+    assert admin._profile_task is None
+    admin.profile_handler("0.05")
+    admin.profile_handler("0.05")
+    await admin._profile_task
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert len(files) == 2
+    assert files[0].startswith(f"api-{os.getpid()}-") and files[0].endswith(".collapsed")
+
+
+@pytest.mark.asyncio
+async def test_worker_sigusr1_runs_one_profile_at_a_time(tmp_path, monkeypatch):
+    import worker
+
+    started = asyncio.Event()
+
+    async def fake_profile(directory, prefix, duration):
+        started.set()
+        await asyncio.sleep(0.01)
+        return f"{directory}/{prefix}.collapsed", f"{directory}/{prefix}.tasks.txt"
+
+    mock = AsyncMock(side_effect=fake_profile)
+    monkeypatch.setattr(worker, "profile_to_files", mock)
+    monkeypatch.setattr(worker, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(worker, "_profile_task", None)
+
+    worker.handle_sigusr1()
+    worker.handle_sigusr1()
+    await started.wait()
+    await worker._profile_task
+    mock.assert_awaited_once()
+    assert mock.call_args.args[0] == str(tmp_path)
@@ -0,0 +1,95 @@
+import json
+import os
+import pytest
+from pathlib import Path
+
+from prompt_loader import PromptLoader, PromptRegistry, mode_key
+
+
+def write_manifest(base: Path, prompts):
+    (base / "prompts").mkdir(exist_ok=True)
+    entries = []
+    for prompt_id, text in prompts.items():
+        rel = f"prompts/{prompt_id}.txt"
+        (base / rel).write_text(text)
+        entries.append({"id": prompt_id, "file": rel})
+    (base / "prompts" / "manifest.json").write_text(json.dumps({"version": "1", "prompts": entries}))
+
+
+def bump_mtime(path: Path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_mode_key():
+    assert mode_key("02-idea-clarifier") == "02_IDEA_CLARIFIER"
+    assert mode_key("02sum-state-synthesizer") == "02sum_STATE_SYNTHESIZER"
+    assert mode_key("01-core-prompt") == "01_CORE"
+
+
+def test_shipped_manifest_resolves_ui_modes():
+    registry = PromptRegistry(Path(__file__).parent.parent)
+    assert registry.resolve("01_CORE") is not None
+    assert registry.resolve("02sum_STATE_SYNTHESIZER") is not None
+    assert registry.stats()["count"] > 0
+
+
+@pytest.mark.asyncio
+async def test_loader_serves_from_memory(tmp_path):
+    write_manifest(tmp_path, {"02-idea-clarifier": " clarify \n"})
+    loader = PromptLoader(None, base_dir=tmp_path)
+    (tmp_path / "prompts" / "02-idea-clarifier.txt").unlink()
+
+    assert await loader.get_system_prompt("02_IDEA_CLARIFIER", {}) == "clarify"
+    assert await loader.get_system_prompt("X", {"X": "02-idea-clarifier"}) == "clarify"
+    assert await loader.get_system_prompt("X", {"X": "missing"}) == "[Prompt 'missing' not found in catalog]"
+    assert await loader.get_system_prompt("NOPE", {}) == "[Mode 'NOPE' not implemented]"
+
+
+def test_reload_if_changed_swaps_snapshot(tmp_path):
+    write_manifest(tmp_path, {"01-a": "old"})
+    registry = PromptRegistry(tmp_path)
+    assert registry.reload_if_changed() is False
+
+    prompt_file = tmp_path / "prompts" / "01-a.txt"
+    prompt_file.write_text("new")
+    bump_mtime(prompt_file)
+    assert registry.reload_if_changed() is True
+    assert registry.get("01-a")["text"] == "new"
+    assert registry.stats()["bytes"] == 3
+
+
+def test_broken_manifest_keeps_previous_snapshot(tmp_path):
+    write_manifest(tmp_path, {"01-a": "text"})
+    registry = PromptRegistry(tmp_path)
+    manifest = tmp_path / "prompts" / "manifest.json"
+    manifest.write_text("{broken")
+    bump_mtime(manifest)
+
+    assert registry.reload_if_changed() is False
+    assert registry.get("01-a")["text"] == "text"
+
+
+@pytest.mark.asyncio
+async def test_worker_main_watches_prompt_registry(tmp_path, monkeypatch):
+    import asyncio
+    import worker
+    from unittest.mock import AsyncMock, MagicMock
+
+    write_manifest(tmp_path, {"01-core-prompt": "v1"})
+    registry = PromptRegistry(tmp_path, poll_interval=0.01)
+    monkeypatch.setattr(worker, "PromptLoader", lambda gh_token: MagicMock(registry=registry))
+    monkeypatch.setattr(worker, "init_pool", AsyncMock())
+    monkeypatch.setattr(worker, "close_pool", AsyncMock())
+    monkeypatch.setattr(worker.groq_client, "warm_up", lambda: None)
+    monkeypatch.setattr(worker, "METRICS_PORT", 0)
+    for loop_name in ("worker_loop", "recovery_loop", "queue_metrics_loop"):
+        monkeypatch.setattr(worker, loop_name, AsyncMock())
+    monkeypatch.setattr(worker, "shutdown_event", asyncio.Event())
+
+    main_task = asyncio.create_task(worker.main())
+    await asyncio.sleep(0.02)
+    assert registry.stats()["watching"]
+    worker.shutdown_event.set()
+    await main_task
+    assert not registry.stats()["watching"]
@@ -1,4 +1,7 @@
 # CHANGED: Fixed test_synthesizer_build_prompt to expect last 4 messages
+import asyncio
+import time
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from prompt_service import PromptService
@@ -48,6 +51,28 @@ async def test_get_chat_completion_failure(prompt_service, mock_groq_client):
     with pytest.raises(Exception, match="API error"):
         await prompt_service.get_chat_completion([], "model")
 
+@pytest.mark.asyncio
+async def test_get_chat_completion_does_not_block_event_loop(prompt_service, mock_groq_client):
+    def slow_completion(**kwargs):
+        time.sleep(0.2)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content="done"))])
+
+    mock_groq_client.create_completion.side_effect = slow_completion
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    try:
+        assert await prompt_service.get_chat_completion([], "model") == "done"
+    finally:
+        ticking.cancel()
+    assert ticks >= 5
+
 @pytest.mark.asyncio
 async def test_synthesize_conversation_state(prompt_service, mock_groq_client, mock_prompt_loader):
     mock_prompt_loader.get_system_prompt.return_value = "State synthesizer prompt"
@@ -137,3 +162,30 @@ async def test_synthesizer_synthesize_prompt_error(mock_prompt_service):
     result = await synth.synthesize(history, "model")
     assert result["completion_score"] == 0.0
     mock_prompt_service.get_chat_completion.assert_not_called()
+
+def test_synthesizer_build_fold_prompt_contains_state_and_new_messages():
+    synth = ConversationStateSynthesizer(AsyncMock())
+    prompt = synth.build_fold_prompt({"clear_context": ["budget is 10k"]}, [{"role": "user", "content": "Deadline is May"}])
+    assert "budget is 10k" in prompt
+    assert "user: Deadline is May" in prompt
+
+@pytest.mark.asyncio
+async def test_synthesizer_fold_returns_updated_state(mock_prompt_service):
+    synth = ConversationStateSynthesizer(mock_prompt_service)
+    result = await synth.fold(None, [{"role": "user", "content": "Hi"}], "model")
+    assert result["completion_score"] == 0.0
+    mock_prompt_service.get_chat_completion.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_synthesizer_fold_without_new_messages_skips_llm(mock_prompt_service):
+    synth = ConversationStateSynthesizer(mock_prompt_service)
+    previous = {"clear_context": ["a"]}
+    assert await synth.fold(previous, [], "model") is previous
+    mock_prompt_service.get_chat_completion.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_synthesizer_fold_invalid_json_raises(mock_prompt_service):
+    mock_prompt_service.get_chat_completion.return_value = "not json"
+    synth = ConversationStateSynthesizer(mock_prompt_service)
+    with pytest.raises(ValueError):
+        await synth.fold({"clear_context": ["a"]}, [{"role": "user", "content": "Hi"}], "model")
@@ -0,0 +1,40 @@
+import pytest
+from pydantic import ValidationError as PydanticValidationError
+
+from domain.prompt_template import TemplateError, compile_template, validate_node_template
+from schemas import WorkflowNodeCreate, WorkflowNodeUpdate
+
+
+def test_compile_extracts_fields_and_renders():
+    template = compile_template("A {user_input!r} B {all_artifacts:>5}")
+    assert template.fields == {"user_input", "all_artifacts"}
+    assert template.render({"user_input": "x", "all_artifacts": "y"}) == "A 'x' B     y"
+    assert compile_template("A {user_input!r} B {all_artifacts:>5}") is template
+
+
+def test_render_reports_missing_variables():
+    with pytest.raises(TemplateError, match="all_artifacts"):
+        compile_template("{all_artifacts}").render({})
+
+
+@pytest.mark.parametrize("source", ["Broken {", "{0}", "{item.attr}", "{x:{width}}"])
+def test_compile_rejects_unsupported_templates(source):
+    with pytest.raises(TemplateError):
+        compile_template(source)
+
+
+def test_validate_node_template_checks_available_variables():
+    config = {"user_prompt_template": "{businessRequirement} {user_input}", "required_input_types": ["BusinessRequirement"]}
+    assert validate_node_template(config).fields == {"businessRequirement", "user_input"}
+    with pytest.raises(TemplateError, match="unknown variables: other"):
+        validate_node_template({"user_prompt_template": "{other}"})
+    assert validate_node_template({}) is None
+
+
+def test_workflow_node_schemas_reject_bad_template():
+    with pytest.raises(PydanticValidationError):
+        WorkflowNodeCreate(node_id="n", prompt_key="p", position_x=0, position_y=0,
+                           config={"user_prompt_template": "{missing}"})
+    with pytest.raises(PydanticValidationError):
+        WorkflowNodeUpdate(config={"user_prompt_template": "oops {"})
+    assert WorkflowNodeUpdate(config=None).config is None
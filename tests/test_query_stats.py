@@ -0,0 +1,161 @@
+"""
+Tests for the instrumented connection in repositories.base: per-statement stats,
+slow-query log, per-request query counter and the admin endpoint.
+"""
+import logging
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import middleware
+from middleware import RequestContextMiddleware
+from repositories import base
+from repositories.base import _Connection, normalize_query, redact_params
+from utils.metrics import count_request_work
+
+
+def _raw_connection():
+    raw = MagicMock()
+    raw.fetch = AsyncMock(return_value=[("Seq Scan on t",), ("Buffers: shared hit=1",)])
+    raw.fetchrow = AsyncMock(return_value={"id": 1})
+    raw.fetchval = AsyncMock(return_value=1)
+    raw.execute = AsyncMock(return_value="UPDATE 1")
+    raw.close = AsyncMock()
+    raw.transaction.return_value = MagicMock(start=AsyncMock(), rollback=AsyncMock())
+    return raw
+
+
+@pytest.fixture
+def stats():
+    base.QUERY_STATS.reset()
+    yield base.QUERY_STATS
+    base.QUERY_STATS.reset()
+
+
+def test_normalize_query_groups_literals_and_whitespace():
+    a = normalize_query("SELECT * FROM artifacts\n   WHERE id = $1 AND type = 'X' LIMIT 10")
+    b = normalize_query("SELECT *  FROM artifacts WHERE id = $1 AND type = 'Y''s' LIMIT 5")
+    assert a == b == "SELECT * FROM artifacts WHERE id = $1 AND type = ? LIMIT ?"
+    assert normalize_query("SELECT t1.c2 FROM t1") == "SELECT t1.c2 FROM t1"
+
+
+def test_redact_params_keeps_only_types_and_sizes():
+    redacted = redact_params(("secret-token", 42, None, ["a", "b"]))
+    assert redacted == ["<str:12>", "<int>", "<NoneType>", "<list:2>"]
+    assert "secret" not in str(redacted)
+
+
+@pytest.mark.asyncio
+async def test_statements_are_aggregated_and_counted_per_request(stats):
+    conn = _Connection(_raw_connection())
+    with count_request_work() as work:
+        for node_id in range(3):
+            await conn.fetchrow("SELECT * FROM workflow_nodes WHERE id = $1", node_id)
+        await conn.execute("UPDATE workflows SET updated_at = NOW() WHERE id = $1", "w")
+    assert work.queries == 4
+
+    conn._conn.fetchval.side_effect = RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        await conn.fetchval("SELECT 1")
+
+    top = {row["statement"]: row for row in stats.snapshot(order_by="calls")}
+    assert top["SELECT * FROM workflow_nodes WHERE id = $1"]["calls"] == 3
+    assert top["SELECT ?"]["errors"] == 1
+    assert list(top)[0] == "SELECT * FROM workflow_nodes WHERE id = $1"
+
+    raw = conn._conn
+    await conn.close()
+    raw.close.assert_awaited_once()
+    assert conn.is_closed()
+
+
+@pytest.mark.asyncio
+async def test_slow_query_is_logged_with_redacted_params(stats, monkeypatch, caplog):
+    monkeypatch.setattr(base, "SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(base, "EXPLAIN_SLOW_QUERIES", False)
+    conn = _Connection(_raw_connection())
+    with caplog.at_level(logging.WARNING, logger="repositories.base"):
+        await conn.fetchrow("SELECT * FROM auth_sessions WHERE token_hash = $1", "very-secret-hash")
+    assert "Slow query" in caplog.text
+    assert "<str:16>" in caplog.text
+    assert "very-secret-hash" not in caplog.text
+    conn._conn.fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_explain_only_for_select_and_once_per_interval(stats, monkeypatch, caplog):
+    monkeypatch.setattr(base, "SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(base, "EXPLAIN_SLOW_QUERIES", True)
+    raw = _raw_connection()
+    conn = _Connection(raw)
+    with caplog.at_level(logging.WARNING, logger="repositories.base"):
+        await conn.fetchrow("SELECT * FROM runs WHERE id = $1", "r1")
+        await conn.fetchrow("SELECT * FROM runs WHERE id = $1", "r2")
+        await conn.execute("UPDATE runs SET status = $1", "DONE")
+    raw.fetch.assert_awaited_once_with("EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM runs WHERE id = $1", "r1")
+    assert "Buffers: shared hit=1" in caplog.text
+    raw.transaction.return_value.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_explain_is_rolled_back_and_side_effects_skipped(stats, monkeypatch, caplog):
+    monkeypatch.setattr(base, "SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(base, "EXPLAIN_SLOW_QUERIES", True)
+    raw = _raw_connection()
+    raw.fetch.side_effect = RuntimeError("permission denied")
+    conn = _Connection(raw)
+    with caplog.at_level(logging.WARNING, logger="repositories.base"):
+        await conn.fetchrow("SELECT * FROM runs WHERE id = $1", "r1")
+        await conn.fetchval("SELECT pg_notify($1, $2)", "cache_invalidation", "k")
+    raw.fetch.assert_awaited_once()
+    raw.transaction.return_value.rollback.assert_awaited_once()
+    assert "EXPLAIN failed: permission denied" in caplog.text
+
+
+def test_middleware_warns_about_many_queries(stats, monkeypatch):
+    monkeypatch.setattr(middleware, "QUERIES_PER_REQUEST_WARN", 5)
+    app = FastAPI()
+
+    @app.get("/api/graph")
+    async def graph():
+        conn = _Connection(_raw_connection())
+        for node_id in range(10):
+            await conn.fetchrow("SELECT * FROM workflow_nodes WHERE id = $1", node_id)
+        return {"ok": True}
+
+    logger = MagicMock()
+    logger.bind.return_value = logger
+    app.add_middleware(RequestContextMiddleware, logger=logger, validate_session=AsyncMock(), test_mode=True)
+
+    assert TestClient(app).get("/api/graph").status_code == 200
+    logger.warning.assert_called_once()
+    assert logger.warning.call_args.kwargs["db_queries"] == 10
+    assert middleware.HTTP_DB_QUERIES.labels("GET", "/api/graph").count == 1
+
+
+def test_admin_queries_endpoint_requires_session(stats):
+    import server
+
+    stats.record("SELECT 1", 0.002)
+    http = TestClient(server.app)
+    assert http.get("/api/admin/queries").status_code == 401
+
+    with patch("routers.auth.session_store.get", AsyncMock(return_value={"master_key_hash": "x"})), \
+         patch("routers.admin.cache_invalidation.publish", AsyncMock()) as publish:
+        resp = http.get("/api/admin/queries", headers={"Authorization": "Bearer t"})
+        assert resp.status_code == 200
+        assert resp.json()["pid"] == os.getpid()
+        assert resp.json()["statements"][0]["statement"] == "SELECT 1"
+        assert http.delete("/api/admin/queries", headers={"Authorization": "Bearer t"}).status_code == 204
+    assert stats.snapshot() == []
+    publish.assert_awaited_once_with("query_stats_reset", "query_stats_reset")
+
+    # Другой воркер получает уведомление и очищает свою таблицу; сброс всех кэшей (None) её не трогает
+    stats.record("SELECT 2", 0.001)
+    server.cache_listener.dispatch("query_stats_reset", None)
+    assert stats.snapshot()
+    server.cache_listener.dispatch("query_stats_reset", "query_stats_reset")
+    assert stats.snapshot() == []
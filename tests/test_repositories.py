@@ -8,8 +8,9 @@ import uuid
 import json
 import asyncpg
 from typing import Dict, Any
+from datetime import datetime, timedelta, timezone
 
-from repositories import run_repository, node_execution_repository
+from repositories import run_repository, node_execution_repository, artifact_repository, auth_session_repository
 from repositories.base import transaction
 
 def unique_name(prefix: str) -> str:
@@ -432,4 +433,55 @@ async def test_get_validated_execution_for_node_not_found(tx, test_run, test_nod
         node_definition_id=test_node,
         tx=tx
     )
-    assert validated is None
\ No newline at end of file
+    assert validated is None
+
+# ----------------------------------------------------------------------
+# Tests for content-addressed artifact storage
+# ----------------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_save_artifact_deduplicates_content(tx, test_project):
+    content = {"text": "same body", "items": [1, 2, 3]}
+    first = await artifact_repository.save_artifact("LLMResponse", content, project_id=test_project, tx=tx)
+    second = await artifact_repository.save_artifact("LLMResponse", content, project_id=test_project, tx=tx)
+
+    rows = await tx.conn.fetch(
+        "SELECT content, content_ref, content_hash FROM artifacts WHERE id = ANY($1::uuid[])", [first, second]
+    )
+    refs = {row["content_ref"] for row in rows}
+    assert len(refs) == 1
+    assert all(row["content"] is None for row in rows)
+    assert all(row["content_hash"] == row["content_ref"] for row in rows)
+    blobs = await tx.conn.fetchval("SELECT COUNT(*) FROM artifact_blobs WHERE hash = $1", refs.pop())
+    assert blobs == 1
+
+    artifact = await artifact_repository.get_artifact(second, tx=tx)
+    assert artifact["content"] == content
+    assert "blob_content" not in artifact
+
+@pytest.mark.asyncio
+async def test_save_artifact_keeps_explicit_content_hash(tx, test_project):
+    art_id = await artifact_repository.save_artifact(
+        "LLMResponse", {"text": "x"}, project_id=test_project, content_hash="explicit", tx=tx
+    )
+    row = await tx.conn.fetchrow("SELECT content_hash, content_ref FROM artifacts WHERE id = $1", art_id)
+    assert row["content_hash"] == "explicit"
+    assert row["content_ref"] != "explicit"
+
+@pytest.mark.asyncio
+async def test_legacy_inline_content_still_readable(tx, test_project, test_artifact):
+    artifact = await artifact_repository.get_artifact(test_artifact, tx=tx)
+    assert artifact["content"] == {"text": "test content"}
+    listed = await artifact_repository.get_artifacts(test_project, tx=tx)
+    assert listed[0]["content"] == {"text": "test content"}
+
+@pytest.mark.asyncio
+async def test_auth_sessions_expire_and_are_swept(tx):
+    now = datetime.now(timezone.utc)
+    await auth_session_repository.save_session("live", now, now + timedelta(hours=1), "h", tx=tx)
+    await auth_session_repository.save_session("dead", now - timedelta(hours=2), now - timedelta(hours=1), "h", tx=tx)
+    assert (await auth_session_repository.get_session("live", tx=tx))["master_key_hash"] == "h"
+    assert await auth_session_repository.get_session("dead", tx=tx) is None
+    assert await auth_session_repository.delete_expired_sessions(tx=tx) >= 1
+    await auth_session_repository.delete_session("live", tx=tx)
+    assert await auth_session_repository.get_session("live", tx=tx) is None
@@ -0,0 +1,28 @@
+"""
+Tests for the orjson-backed JSONResponse used as the app default.
+"""
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from utils.responses import JSONResponse
+
+
+def test_datetime_and_uuid_render_like_isoformat():
+    ts = datetime.datetime(2026, 3, 1, 12, 30, 5, 123456, tzinfo=datetime.timezone.utc)
+    uid = uuid.uuid4()
+    body = json.loads(JSONResponse({"created_at": ts, "id": uid, "day": ts.date()}).body)
+    assert body == {"created_at": ts.isoformat(), "id": str(uid), "day": ts.date().isoformat()}
+
+
+def test_fallback_types_and_unicode():
+    body = JSONResponse({"price": Decimal("1.5"), "tags": {"a"}, 1: "ключ"}).body
+    assert json.loads(body) == {"price": 1.5, "tags": ["a"], "1": "ключ"}
+    assert "ключ".encode() in body
+
+
+def test_media_type_and_status():
+    resp = JSONResponse({"ok": True}, status_code=201)
+    assert resp.status_code == 201
+    assert resp.media_type == "application/json"
@@ -0,0 +1,47 @@
+"""
+Tests for lazy startup: Groq client construction, pooled connections and readiness.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from groq_client import GroqClient
+from repositories.base import _Connection
+
+
+def test_groq_client_is_built_on_first_use():
+    client = GroqClient(api_key="key")
+    assert client._client is None
+    with patch("groq.Groq") as sdk:
+        assert client.client is sdk.return_value
+        assert client.client is sdk.return_value
+    sdk.assert_called_once()
+    assert sdk.call_args.kwargs["api_key"] == "key"
+
+
+@pytest.mark.asyncio
+async def test_pooled_connection_close_returns_it_to_the_pool():
+    pool, raw = MagicMock(), MagicMock()
+    pool.release = AsyncMock()
+    raw.fetchval = AsyncMock(return_value=1)
+    raw.is_closed.return_value = False
+    conn = _Connection(raw, pool)
+    assert await conn.fetchval("SELECT 1") == 1
+    assert not conn.is_closed()
+    await conn.close()
+    await conn.close()
+    pool.release.assert_awaited_once_with(raw)
+    assert conn.is_closed()
+
+
+def test_health_reports_readiness_separately():
+    import server
+    http = TestClient(server.app)
+    with patch.dict(server.readiness, {"dependencies": True, "database": False, "llm_client": True}):
+        assert http.get("/health").json() == {"status": "ok", "ready": False}
+        resp = http.get("/health/ready")
+        assert resp.status_code == 503
+        assert resp.json()["checks"]["database"] is False
+    with patch.dict(server.readiness, {"dependencies": True, "database": True, "llm_client": True}):
+        assert http.get("/health/ready").status_code == 200
@@ -0,0 +1,170 @@
+"""
+Tests for utils.tracing: sampling, span nesting, JSONL export and the middleware root span.
+"""
+import asyncio
+import json
+import types
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middleware import RequestContextMiddleware
+from utils import tracing
+from utils.tracing import current_span, instrument_module, record_span, span, start_trace, traced
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    return path
+
+
+def _spans(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_unsampled_trace_creates_nothing(trace_file):
+    with start_trace("root", sample_rate=0) as root:
+        assert root is None
+        with span("child") as child:
+            assert child is None
+        assert current_span() is None
+    assert _spans(trace_file) == []
+
+
+def test_nested_spans_are_exported_with_parents(trace_file):
+    with start_trace("root", "corr-1", sample_rate=1, method="GET") as root:
+        with span("child", n=1) as child:
+            with span("grandchild"):
+                pass
+        root.set(status_code=200)
+    assert current_span() is None
+
+    exported = {s["name"]: s for s in _spans(trace_file)}
+    assert set(exported) == {"root", "child", "grandchild"}
+    assert len({s["traceId"] for s in exported.values()}) == 1
+    assert exported["root"]["parentSpanId"] is None
+    assert exported["child"]["parentSpanId"] == root.span_id
+    assert exported["grandchild"]["parentSpanId"] == child.span_id
+    assert exported["root"]["attributes"] == {"method": "GET", "status_code": 200, "correlation_id": "corr-1"}
+    assert exported["child"]["endTimeUnixNano"] >= exported["child"]["startTimeUnixNano"]
+
+
+def test_discarded_trace_is_not_exported(trace_file):
+    with start_trace("poll", sample_rate=1) as root:
+        root.trace.discard()
+    assert _spans(trace_file) == []
+
+
+def test_exception_marks_span_as_error(trace_file):
+    with pytest.raises(ValueError):
+        with start_trace("root", sample_rate=1):
+            with span("failing"):
+                raise ValueError("bad")
+    exported = {s["name"]: s for s in _spans(trace_file)}
+    assert exported["failing"]["status"] == "ERROR"
+    assert exported["failing"]["attributes"]["error"] == "ValueError"
+    assert exported["root"]["status"] == "ERROR"
+
+
+@pytest.mark.asyncio
+async def test_context_follows_tasks_and_threads(trace_file):
+    async def in_task():
+        with span("task"):
+            await asyncio.sleep(0)
+
+    def in_thread():
+        with span("thread"):
+            pass
+
+    with start_trace("root", sample_rate=1) as root:
+        await asyncio.gather(asyncio.create_task(in_task()), asyncio.to_thread(in_thread))
+    exported = {s["name"]: s for s in _spans(trace_file)}
+    assert exported["task"]["parentSpanId"] == root.span_id
+    assert exported["thread"]["parentSpanId"] == root.span_id
+
+
+@pytest.mark.asyncio
+async def test_instrument_module_wraps_public_coroutines(trace_file):
+    module = types.ModuleType("repositories.fake_repository")
+
+    async def get_item(item_id):
+        return {"id": item_id}
+
+    async def _private():
+        return None
+
+    def sync_helper():
+        return None
+
+    for fn in (get_item, _private, sync_helper):
+        fn.__module__ = module.__name__
+        setattr(module, fn.__name__, fn)
+
+    instrument_module(module, "repo")
+    assert module.get_item is not get_item
+    assert module._private is _private
+    assert module.sync_helper is sync_helper
+
+    # Повторная инструментация не оборачивает дважды
+    wrapped = module.get_item
+    instrument_module(module, "repo")
+    assert module.get_item is wrapped
+
+    # Вне трассы — просто вызов
+    assert await module.get_item(1) == {"id": 1}
+    assert _spans(trace_file) == []
+
+    with start_trace("root", sample_rate=1):
+        assert await module.get_item(2) == {"id": 2}
+    names = [s["name"] for s in _spans(trace_file)]
+    assert "repo.fake_repository.get_item" in names
+
+
+@pytest.mark.asyncio
+async def test_traced_and_record_span(trace_file):
+    @traced("work")
+    async def work():
+        return 42
+
+    with start_trace("root", sample_rate=1) as root:
+        assert await work() == 42
+        start_ns = root.start_ns
+        record_span("llm.stream", start_ns, chunks=3)
+        # record_span не меняет текущий спан
+        assert current_span() is root
+    exported = {s["name"]: s for s in _spans(trace_file)}
+    assert exported["work"]["parentSpanId"] == root.span_id
+    assert exported["llm.stream"]["attributes"] == {"chunks": 3}
+    assert exported["llm.stream"]["startTimeUnixNano"] == start_ns
+
+
+def test_middleware_root_span_named_after_route(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "SAMPLE_RATE", 1.0)
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: int):
+        with span("handler"):
+            return {"id": item_id}
+
+    async def validate_session(token):
+        return True
+
+    logger = MagicMock()
+    logger.bind.return_value = logger
+    app.add_middleware(RequestContextMiddleware, logger=logger, validate_session=validate_session, test_mode=True)
+
+    response = TestClient(app).get("/api/items/7", headers={"X-Request-ID": "req-7"})
+    assert response.status_code == 200
+
+    exported = {s["name"]: s for s in _spans(trace_file)}
+    root = exported["GET /api/items/{item_id}"]
+    assert root["attributes"]["status_code"] == 200
+    assert root["attributes"]["correlation_id"] == "req-7"
+    assert exported["handler"]["parentSpanId"] == root["spanId"]
@@ -338,6 +338,20 @@ def test_truth_as_of(sync_client):
     resp = sync_client.get(f"/api/projects/{project_id}/truth", params={"as_of": "invalid-date"})
     assert resp.status_code == 422
 
+    # История истины: первый интервал закрыт моментом второй валидации, второй открыт
+    async def fetch_history():
+        async with transaction() as tx:
+            rows = await tx.conn.fetch("""
+                SELECT execution_id, valid_from, valid_to FROM project_truth_history
+                WHERE project_id = $1 AND node_definition_id = $2
+                ORDER BY valid_from
+            """, project_id, node_record_id)
+            return [dict(r) for r in rows]
+    history = asyncio.run(fetch_history())
+    assert [str(h["execution_id"]) for h in history] == [exec1_id, exec2_id]
+    assert history[0]["valid_to"] == history[1]["valid_from"]
+    assert history[1]["valid_to"] is None
+
 # ----------------------------------------------------------------------
 # Tests for validation and snapshot update
 # ----------------------------------------------------------------------
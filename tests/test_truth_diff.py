@@ -0,0 +1,84 @@
+"""
+Unit tests for the truth diff endpoint; the history query is mocked.
+"""
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import truth
+from routers.truth import build_truth_diff
+
+T1 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+T2 = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+
+def _row(node, before=None, after=None):
+    row = {"node_definition_id": node}
+    for prefix, side in (("from", before), ("to", after)):
+        row[f"{prefix}_execution_id"] = side and side[0]
+        row[f"{prefix}_artifact_id"] = side and uuid.uuid4()
+        row[f"{prefix}_logical_key"] = side and f"key-{node}"
+        row[f"{prefix}_version"] = side and side[1]
+        row[f"{prefix}_validated_at"] = side and T1
+    return row
+
+
+@pytest.fixture
+def client(mocker):
+    truth._diff_cache.clear()
+    app = FastAPI()
+    app.include_router(truth.router)
+    repo = mocker.patch.object(truth.truth_repository, "get_truth_diff", AsyncMock(return_value=[
+        _row("a", after=("e1", 1)),
+        _row("b", before=("e2", 1)),
+        _row("c", before=("e3", "2"), after=("e4", "5")),
+    ]))
+    return TestClient(app), repo
+
+
+def test_build_truth_diff_classifies_nodes():
+    diff = build_truth_diff([
+        _row("c", before=("e3", 2), after=("e4", 5)),
+        _row("a", after=("e1", 1)),
+        _row("b", before=("e2", 1)),
+        _row("d", before=("e5", "v1"), after=("e6", "v2")),
+    ])
+    assert [e["node_id"] for e in diff["added"]] == ["a"]
+    assert diff["added"][0]["from"] is None
+    assert [e["node_id"] for e in diff["removed"]] == ["b"]
+    assert diff["removed"][0]["to"] is None
+    assert [(e["node_id"], e["version_delta"]) for e in diff["changed"]] == [("c", 3), ("d", None)]
+
+
+def test_past_range_is_cached_and_immutable(client):
+    http, repo = client
+    params = {"from": T1.isoformat(), "to": T2.isoformat()}
+    first = http.get("/api/projects/p1/truth/diff", params=params)
+    second = http.get("/api/projects/p1/truth/diff", params=params)
+
+    assert first.status_code == 200
+    assert first.json() == second.json()
+    assert first.json()["changed"][0]["version_delta"] == 3
+    assert first.headers["cache-control"] == "private, max-age=31536000, immutable"
+    assert set(first.json()["added"][0]) == {"node_id", "from", "to"}
+    repo.assert_awaited_once()
+
+
+def test_range_ending_now_is_not_cached(client):
+    http, repo = client
+    params = {"from": T1.isoformat(), "to": datetime.now(timezone.utc).isoformat()}
+    http.get("/api/projects/p1/truth/diff", params=params)
+    resp = http.get("/api/projects/p1/truth/diff", params=params)
+    assert resp.headers["cache-control"] == "no-cache"
+    assert repo.await_count == 2
+
+
+def test_reversed_range_is_rejected(client):
+    http, repo = client
+    resp = http.get("/api/projects/p1/truth/diff", params={"from": T2.isoformat(), "to": T1.isoformat()})
+    assert resp.status_code == 422
+    repo.assert_not_awaited()
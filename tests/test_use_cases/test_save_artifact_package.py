@@ -45,7 +45,7 @@ async def test_save_duplicate_package(mock_db, mock_transaction):
         "id": "existing-id",
         "content_hash": "somehash"
     }
-    with patch("use_cases.save_artifact_package.compute_content_hash", return_value="somehash"):
+    with patch("use_cases.save_artifact_package.hash_serialized", return_value="somehash"):
         req = SavePackageRequest(
             project_id="proj-id",
             parent_id="parent-id",
@@ -65,7 +65,7 @@ async def test_save_with_increment_version(mock_db, mock_transaction):
         "version": "5",
         "content_hash": "oldhash"
     }
-    with patch("use_cases.save_artifact_package.compute_content_hash", return_value="newhash"):
+    with patch("use_cases.save_artifact_package.hash_serialized", return_value="newhash"):
         mock_db.save_artifact.return_value = "new-id"
 
         req = SavePackageRequest(
@@ -89,7 +89,7 @@ async def test_save_with_bad_version(mock_db, mock_transaction):
         "version": "abc",  # не число
         "content_hash": "oldhash"
     }
-    with patch("use_cases.save_artifact_package.compute_content_hash", return_value="newhash"):
+    with patch("use_cases.save_artifact_package.hash_serialized", return_value="newhash"):
         mock_db.save_artifact.return_value = "new-id"
 
         req = SavePackageRequest(
@@ -129,3 +129,41 @@ async def test_save_artifact_type_adds_ids(mock_db, mock_transaction):
     assert saved_content[0]["id"] == "existing-id"
     assert "id" in saved_content[1]
     assert saved_content[1]["id"] is not None
+
+@pytest.mark.asyncio
+async def test_save_invalid_package_rejected_before_write(mock_db, mock_transaction):
+    from validation import ValidatorRegistry, ValidationError
+    registry = ValidatorRegistry(loader=AsyncMock(return_value=None))
+    req = SavePackageRequest(
+        project_id="proj-id",
+        parent_id="parent-id",
+        artifact_type="BusinessRequirementPackage",
+        content=[{"description": "test"}]
+    )
+    with pytest.raises(ValidationError, match="missing required field 'priority'"):
+        await SaveArtifactPackageUseCase(registry).execute(req)
+    mock_transaction.assert_not_called()
+    mock_db.save_artifact.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_save_passes_serialized_body_to_blob(mock_db, mock_transaction):
+    from utils.hash import canonical_json, compute_content_hash
+    mock_db.get_last_version_by_parent_and_type.return_value = None
+    content = [{"description": "req1", "id": "r1"}]
+    req = SavePackageRequest(
+        project_id="proj-id",
+        parent_id="parent-id",
+        artifact_type="BusinessRequirementPackage",
+        content=content
+    )
+    await SaveArtifactPackageUseCase().execute(req)
+
+    kwargs = mock_db.save_artifact.call_args.kwargs
+    assert kwargs["serialized"] == canonical_json(content)
+    assert kwargs["content_ref"] == kwargs["content_hash"] == compute_content_hash(content)
+
+    # id, добавленный к элементу, меняет тело — готовая сериализация не передаётся
+    req.content = [{"description": "req2"}]
+    await SaveArtifactPackageUseCase().execute(req)
+    kwargs = mock_db.save_artifact.call_args.kwargs
+    assert kwargs["serialized"] is None and kwargs["content_ref"] is None
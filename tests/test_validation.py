@@ -69,3 +69,58 @@ def test_validate_json_output_item_not_dict():
 def test_required_fields_defined():
     assert "BusinessRequirementPackage" in REQUIRED_FIELDS
     assert "FunctionalRequirementPackage" in REQUIRED_FIELDS
+
+# ----------------------------------------------------------------------
+# Скомпилированные схемы и реестр валидаторов
+# ----------------------------------------------------------------------
+from unittest.mock import AsyncMock
+from validation import ValidatorRegistry, compile_schema
+
+PACKAGE_SCHEMA = {
+    "type": "array",
+    "minItems": 1,
+    "items": {
+        "type": "object",
+        "required": ["description", "priority"],
+        "properties": {
+            "priority": {"enum": ["HIGH", "MEDIUM", "LOW"]},
+            "acceptance_criteria": {"type": "array", "items": {"type": "string", "minLength": 1}},
+            "score": {"type": "integer", "minimum": 0},
+        },
+    },
+}
+
+def test_compile_schema_reports_paths():
+    check = compile_schema(PACKAGE_SCHEMA)
+    assert check([{"description": "d", "priority": "HIGH", "acceptance_criteria": ["ok"]}]) == (True, "OK")
+    assert check([]) == (False, "Content: expected at least 1 items, got 0")
+    assert check([{"description": "d"}]) == (False, "Item 0 missing required field 'priority'")
+    assert "Item 0.priority" in check([{"description": "d", "priority": "URGENT"}])[1]
+    assert check([{"description": "d", "priority": "LOW", "acceptance_criteria": ["a", ""]}])[1] == \
+        "Item 0.acceptance_criteria[1]: string shorter than 1"
+    assert "expected integer, got bool" in check([{"description": "d", "priority": "LOW", "score": True}])[1]
+
+def test_compile_schema_ignores_non_json_schema():
+    assert compile_schema({"fields": ["name"]}) is None
+    assert compile_schema(None) is None
+
+@pytest.mark.asyncio
+async def test_registry_compiles_once_and_invalidates():
+    loader = AsyncMock(return_value={"schema": {"type": "object", "required": ["title"]}})
+    registry = ValidatorRegistry(loader=loader)
+
+    assert await registry.validate({"title": "x"}, "Doc") == (True, "OK")
+    assert (await registry.validate({}, "Doc"))[0] is False
+    assert loader.await_count == 1
+
+    loader.return_value = {"schema": {"type": "object"}}
+    registry.invalidate("Doc")
+    assert await registry.validate({}, "Doc") == (True, "OK")
+    assert loader.await_count == 2
+
+@pytest.mark.asyncio
+async def test_registry_falls_back_to_required_fields():
+    registry = ValidatorRegistry(loader=AsyncMock(return_value=None))
+    valid, msg = await registry.validate([{"description": "x"}], "BusinessRequirementPackage")
+    assert valid is False and "missing required field 'priority'" in msg
+    assert await registry.get("UnknownType") is None
@@ -1,17 +1,29 @@
 # CHANGED: Added version argument to db.save_artifact
 import logging
 import uuid
+from typing import Optional
 from schemas import SavePackageRequest
 from repositories.base import transaction
 import db
-from utils.hash import compute_content_hash
+from utils.hash import canonical_json, hash_serialized
+from validation import ValidationError, ValidatorRegistry
 
 logger = logging.getLogger(__name__)
 
 class SaveArtifactPackageUseCase:
+    def __init__(self, validator_registry: Optional[ValidatorRegistry] = None):
+        self.validator_registry = validator_registry
+
     async def execute(self, req: SavePackageRequest):
+        # ADDED: невалидный пакет отклоняется до открытия транзакции
+        if self.validator_registry is not None:
+            valid, msg = await self.validator_registry.validate(req.content, req.artifact_type)
+            if not valid:
+                raise ValidationError(f"Invalid {req.artifact_type}: {msg}")
         try:
-            new_hash = compute_content_hash(req.content)
+            # CHANGED: тело сериализуется и хэшируется один раз — для проверки дубликата и для blob
+            serialized = canonical_json(req.content)
+            new_hash = hash_serialized(serialized)
             async with transaction() as tx:
                 last_pkg = await db.get_last_version_by_parent_and_type(
                     req.parent_id, req.artifact_type, tx=tx
@@ -33,6 +45,8 @@ class SaveArtifactPackageUseCase:
                     for r in content_to_save:
                         if 'id' not in r:
                             r['id'] = str(uuid.uuid4())
+                            # тело изменилось — blob сериализуется заново
+                            serialized = None
 
                 artifact_id = await db.save_artifact(
                     artifact_type=req.artifact_type,
@@ -43,7 +57,9 @@ class SaveArtifactPackageUseCase:
                     parent_id=req.parent_id,
                     content_hash=new_hash,
                     version=version,  # ADDED
-                    tx=tx
+                    tx=tx,
+                    serialized=serialized,
+                    content_ref=new_hash if serialized is not None else None,
                 )
             return {"id": artifact_id}
         except Exception as e:
@@ -0,0 +1,73 @@
+# ADDED: Compression of large artifact bodies with per-type preset dictionaries
+import json
+import zlib
+from collections import Counter
+from typing import Any, Iterable, Optional
+
+# Тела меньше порога хранятся как JSONB: выигрыш от сжатия не окупает потерю jsonb-запросов
+COMPRESSION_THRESHOLD = 8 * 1024
+# Окно deflate — 32 КБ, больший словарь zlib всё равно не использует
+MAX_DICT_SIZE = 32 * 1024
+COMPRESSION_LEVEL = 6
+ENCODING_JSON = "json"
+ENCODING_ZLIB = "zlib"
+
+_MAX_FRAGMENT = 80
+
+
+def compress(data: bytes, zdict: Optional[bytes] = None) -> bytes:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 15, zdict=zdict) if zdict \
+        else zlib.compressobj(COMPRESSION_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data: bytes, zdict: Optional[bytes] = None) -> bytes:
+    decompressor = zlib.decompressobj(15, zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _fragments(value: Any, out: Counter) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            out[json.dumps(key) + ": "] += 1
+            _fragments(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _fragments(item, out)
+    elif isinstance(value, str):
+        if len(value) <= _MAX_FRAGMENT:
+            out[json.dumps(value)] += 1
+        else:
+            # Длинный текст: повторяющиеся фразы из трёх слов («The system shall»)
+            words = value.split()
+            for i in range(len(words) - 2):
+                out[" ".join(words[i:i + 3]) + " "] += 1
+    elif value is not None and not isinstance(value, (int, float)):
+        out[json.dumps(value)] += 1
+
+
+def train_dictionary(samples: Iterable[Any], size: int = MAX_DICT_SIZE) -> bytes:
+    """
+    Builds a zlib preset dictionary from sample artifact bodies of one type:
+    object keys, short string values and three-word phrases of long texts that
+    repeat across samples, weighted by occurrences * length. Deflate encodes
+    references to the end of the dictionary most cheaply, so the most valuable
+    fragments go last.
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        _fragments(sample, counts)
+    ranked = sorted(
+        (fragment for fragment, n in counts.items() if n > 1),
+        key=lambda fragment: counts[fragment] * len(fragment),
+        reverse=True,
+    )
+    chosen = []
+    total = 0
+    for fragment in ranked:
+        encoded = fragment.encode()
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
@@ -0,0 +1,16 @@
+# ADDED: .env загружается один раз на процесс (раньше — и в server.py, и в repositories/base.py)
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+
+_loaded = False
+
+
+def load_env() -> None:
+    """Loads the project .env into os.environ; variables already set take precedence."""
+    global _loaded
+    if not _loaded:
+        load_dotenv(dotenv_path=ENV_PATH)
+        _loaded = True
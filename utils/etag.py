@@ -0,0 +1,42 @@
+# ADDED: ETags from cheap version markers and conditional GET handling
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    """
+    ETag from a version marker and the request parameters that shape the body.
+    Strong by default; weak for bodies that differ in volatile fields (e.g. a timestamp)
+    while being semantically the same.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110), so a W/ prefix is ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(candidate.strip()) == opaque for candidate in header.split(","))
+
+
+def etag_headers(etag: str) -> dict:
+    # no-cache: клиент хранит ответ, но перепроверяет его на каждом запросе
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """304 without a body when the client already has this version, otherwise None."""
+    if etag is not None and etag_matches(request, etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
@@ -1,7 +1,96 @@
 # ADDED: Utility for content hashing
 import hashlib
 import json
+from typing import Any, Iterator, Union
 
-def compute_content_hash(content):
-    """Compute SHA256 hash of sorted JSON content."""
-    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+# CHANGED: канонический JSON кодируется и хэшируется по частям, без строки всего документа.
+# sha256 оставлен: с SHA-NI он не медленнее blake2b (см. benchmarks/content_hash_bench.py),
+# а смена алгоритма сломала бы сравнение с уже сохранёнными content_hash / content_ref
+DEFAULT_ALGORITHM = "sha256"
+
+# Тот же кодировщик, что у json.dumps(sort_keys=True); encode() идёт через C-реализацию
+_encoder = json.JSONEncoder(sort_keys=True)
+# Контейнеры с меньшим числом элементов кодируются целиком одним вызовом encode()
+_STREAM_MIN_ITEMS = 64
+_BATCH_ITEMS = 256
+# Сколько текста копится перед передачей в хэш
+_FLUSH_CHARS = 64 * 1024
+
+
+def canonical_json(content) -> str:
+    """Canonical serialization used for hashing and for blob storage."""
+    return json.dumps(content, sort_keys=True)
+
+
+def _is_large(value: Any) -> bool:
+    return isinstance(value, (list, dict)) and len(value) >= _STREAM_MIN_ITEMS
+
+
+def _iter_canonical(value: Any, top: bool) -> Iterator[str]:
+    if isinstance(value, list) and value and (top or len(value) >= _STREAM_MIN_ITEMS):
+        yield "["
+        # Подряд идущие небольшие элементы кодируются пачками: один вызов C-кодировщика
+        # на _BATCH_ITEMS элементов, от результата отрезаются скобки списка
+        start = 0
+        n = len(value)
+        while start < n:
+            end = start
+            while end < n and end - start < _BATCH_ITEMS and not _is_large(value[end]):
+                end += 1
+            if start:
+                yield ", "
+            if end > start:
+                yield _encoder.encode(value[start:end])[1:-1]
+                start = end
+            else:
+                yield from _iter_canonical(value[start], False)
+                start += 1
+        yield "]"
+    elif isinstance(value, dict) and value and (top or len(value) >= _STREAM_MIN_ITEMS) \
+            and all(type(key) is str for key in value):
+        yield "{"
+        first = True
+        for key in sorted(value):
+            if not first:
+                yield ", "
+            first = False
+            yield _encoder.encode(key)
+            yield ": "
+            yield from _iter_canonical(value[key], False)
+        yield "}"
+    else:
+        # Листья и небольшие контейнеры — целиком в C; словари с нестроковыми ключами тоже,
+        # чтобы порядок и приведение ключей совпадали с json.dumps
+        yield _encoder.encode(value)
+
+
+def iter_canonical_json(content: Any) -> Iterator[str]:
+    """
+    Yields canonical_json(content) in pieces. Containers are walked element by
+    element only at the top level and where they have many elements; everything
+    else is encoded by the C encoder, so peak memory is bounded by the largest
+    small subtree rather than by the whole document.
+    """
+    return _iter_canonical(content, True)
+
+
+def hash_serialized(serialized: Union[str, bytes], algorithm: str = DEFAULT_ALGORITHM) -> str:
+    data = serialized.encode() if isinstance(serialized, str) else serialized
+    return hashlib.new(algorithm, data).hexdigest()
+
+
+def compute_content_hash(content, algorithm: str = DEFAULT_ALGORITHM):
+    """Hash of sorted JSON content, equal to hash_serialized(canonical_json(content))."""
+    digest = hashlib.new(algorithm)
+    pending = []
+    size = 0
+    for piece in iter_canonical_json(content):
+        pending.append(piece)
+        size += len(piece)
+        if size >= _FLUSH_CHARS:
+            digest.update("".join(pending).encode())
+            pending = []
+            size = 0
+    if pending:
+        digest.update("".join(pending).encode())
+    return digest.hexdigest()
@@ -0,0 +1,139 @@
+# ADDED: Incremental JSON parsing of streamed LLM output
+import json
+from typing import Any, List, Tuple
+
+_WS = " \t\r\n"
+_OPEN = {"[": "]", "{": "}"}
+_CLOSE = {"]", "}"}
+
+
+class JSONStreamError(ValueError):
+    """Поток заведомо не станет валидным JSON — дальнейшая генерация бесполезна."""
+
+
+class IncrementalJSONParser:
+    """
+    Consumes a JSON document chunk by chunk. When the top-level value is an array,
+    every element is decoded and returned by feed() as soon as it closes, so callers
+    can validate items while the rest is still being generated. Syntax that can
+    never become valid JSON (wrong first character, mismatched brackets, a broken
+    element, trailing data) raises JSONStreamError immediately.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._is_array = False
+        self._done = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._item_start = -1
+        self._after_comma = False
+        self._count = 0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def items_parsed(self) -> int:
+        return self._count
+
+    def feed(self, chunk: str) -> List[Tuple[int, Any]]:
+        """Добавляет фрагмент; возвращает [(index, item)] для закрывшихся элементов массива."""
+        if not chunk:
+            return []
+        self._text += chunk
+        items: List[Tuple[int, Any]] = []
+        text = self._text
+        i = self._pos
+        n = len(text)
+        while i < n:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                else:
+                    # Пропускаем тело строки до следующей кавычки или обратного слэша
+                    q = text.find('"', i)
+                    b = text.find("\\", i)
+                    nxt = min(x for x in (q, b, n) if x >= 0)
+                    i = nxt
+                    continue
+                i += 1
+                continue
+
+            if self._done:
+                if ch not in _WS:
+                    raise JSONStreamError(f"Unexpected data after the JSON value at offset {i}")
+                i += 1
+                continue
+
+            if not self._started:
+                if ch in _WS:
+                    i += 1
+                    continue
+                if ch not in _OPEN:
+                    raise JSONStreamError(f"Expected a JSON array or object, got {ch!r}")
+                self._started = True
+                self._is_array = ch == "["
+                self._stack.append(_OPEN[ch])
+                i += 1
+                continue
+
+            depth = len(self._stack)
+            if ch == '"':
+                self._in_string = True
+                if depth == 1 and self._is_array and self._item_start < 0:
+                    self._item_start = i
+            elif ch in _OPEN:
+                if depth == 1 and self._is_array and self._item_start < 0:
+                    self._item_start = i
+                self._stack.append(_OPEN[ch])
+            elif ch in _CLOSE:
+                if not self._stack or self._stack[-1] != ch:
+                    raise JSONStreamError(f"Mismatched {ch!r} at offset {i}")
+                if depth == 1 and self._after_comma and self._item_start < 0:
+                    raise JSONStreamError(f"Trailing comma at offset {i}")
+                self._stack.pop()
+                if not self._stack:
+                    if self._is_array and self._item_start >= 0:
+                        items.append(self._take_item(text, i))
+                    self._done = True
+            elif ch == ",":
+                if depth == 1 and self._is_array:
+                    if self._item_start < 0:
+                        raise JSONStreamError(f"Empty array element at offset {i}")
+                    items.append(self._take_item(text, i))
+                    self._after_comma = True
+            elif ch not in _WS and depth == 1 and self._is_array and self._item_start < 0:
+                self._item_start = i  # число, true/false/null
+            i += 1
+        self._pos = i
+        return items
+
+    def _take_item(self, text: str, end: int) -> Tuple[int, Any]:
+        raw = text[self._item_start:end]
+        self._item_start = -1
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Array element {self._count} is not valid JSON: {e.msg}") from e
+        index = self._count
+        self._count += 1
+        return index, item
+
+    def result(self) -> Any:
+        """Разбирает документ целиком после окончания потока."""
+        if not self._done:
+            raise JSONStreamError("JSON document is incomplete")
+        try:
+            return json.loads(self._text)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Response is not valid JSON: {e.msg}") from e
@@ -0,0 +1,123 @@
+# ADDED: Event-loop lag watchdog (LOOP_WATCHDOG=true)
+"""
+Задача-пульс на event loop спит interval секунд и меряет, насколько позже проснулась
+(лаг цикла). Поток-наблюдатель следит за временем последнего пульса: если цикл не
+отвечает дольше порога, он снимает стек потока цикла и пишет в лог место блокирующего
+вызова — самый глубокий кадр из кода проекта (а не из stdlib или site-packages).
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from utils.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("LOOP_WATCHDOG") == "true"
+THRESHOLD = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "100")) / 1000
+INTERVAL = 0.05
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_EXTERNAL_MARKERS = ("site-packages", "dist-packages", f"{os.sep}.venv{os.sep}", f"{os.sep}venv{os.sep}")
+
+LOOP_LAG = histogram(
+    "event_loop_lag_seconds", "Delay of the watchdog heartbeat behind its schedule.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_BLOCKS = counter("event_loop_blocks_total", "Event loop stalls longer than the threshold.", ("site",))
+
+
+def _is_project_file(filename: str) -> bool:
+    return filename.startswith(_PROJECT_ROOT) and not any(m in filename for m in _EXTERNAL_MARKERS)
+
+
+def blocking_site(frame) -> str:
+    """file:function of the innermost project frame of a stack (the innermost frame if none)."""
+    innermost = frame
+    while frame is not None:
+        if _is_project_file(frame.f_code.co_filename):
+            innermost = frame
+            break
+        frame = frame.f_back
+    if innermost is None:
+        return "unknown"
+    return f"{os.path.basename(innermost.f_code.co_filename)}:{innermost.f_code.co_name}"
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = THRESHOLD, interval: float = INTERVAL):
+        self.threshold = threshold
+        self.interval = min(interval, threshold / 2)
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_site: Optional[str] = None
+
+    def start(self) -> None:
+        """Must be called from the loop to watch."""
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started, threshold {self.threshold * 1000:.0f} ms")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            LOOP_LAG.observe(lag)
+            self._beat = now
+            if lag >= self.threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms at {self._last_site or 'unknown'}")
+                self._last_site = None
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if beat == reported_beat or time.monotonic() - beat < self.threshold:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            site = blocking_site(frame)
+            self._last_site = site
+            LOOP_BLOCKS.labels(site).inc()
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                f"Event loop blocked for more than {self.threshold * 1000:.0f} ms in {site}\n{stack}"
+            )
+
+
+def start_from_env() -> Optional[LoopWatchdog]:
+    """Starts a watchdog on the running loop when LOOP_WATCHDOG=true; None otherwise."""
+    if not ENABLED:
+        return None
+    watchdog = LoopWatchdog()
+    watchdog.start()
+    return watchdog
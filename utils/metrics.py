@@ -0,0 +1,482 @@
+# ADDED: In-process metrics registry (counters, gauges, histograms) in Prometheus text format
+"""
+Метрики процесса: API отдаёт их на /metrics, worker — на отдельном порту (WORKER_METRICS_PORT).
+Каждый процесс (в том числе каждый uvicorn-воркер) считает свои значения. Если за одним портом
+несколько uvicorn-воркеров (API_WORKERS>1), каждый пишет снимок своего реестра в
+METRICS_MULTIPROC_DIR, а /metrics складывает снимки всех процессов: счётчики и гистограммы
+суммируются, gauge отдаются по процессам с меткой pid.
+
+Дочерняя метрика с конкретными значениями меток создаётся один раз (labels()) и дальше
+обновляется без поиска по меткам, поэтому горячие места держат её в переменной модуля.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# ADDED: каталог снимков uvicorn-воркеров; пусто — каждый процесс отдаёт только свои метрики
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+SNAPSHOT_INTERVAL = 5.0
+
+# Секунды: от быстрых запросов к БД до долгих вызовов LLM
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # Последняя ячейка — +Inf; накопительные суммы считаются при выводе
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """(upper bound, cumulative count) pairs including +Inf."""
+        total, result = 0, []
+        for bound, n in zip((*self._bounds, float("inf")), self._counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{self._label_text(key)} {_format_value(child.value)}"
+
+    def _snapshot_value(self, child):
+        return child.value
+
+    def _merge_value(self, child, value) -> None:
+        child.inc(value)
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type_name,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(key), self._snapshot_value(child)] for key, child in list(self._children.items())],
+        }
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def _merge_value(self, child, value) -> None:
+        child.set(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in list(self._children.items()):
+            for bound, total in child.buckets():
+                yield f"{self.name}_bucket{self._label_text(key, ('le', _format_value(bound)))} {total}"
+            yield f"{self.name}_sum{self._label_text(key)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{self._label_text(key)} {child.count}"
+
+    def _snapshot_value(self, child):
+        return [list(child._counts), child.sum]
+
+    def _merge_value(self, child, value) -> None:
+        counts, total = value
+        if len(counts) != len(child._counts):
+            raise ValueError(f"{self.name}: bucket layout differs between processes")
+        with child._lock:
+            for i, n in enumerate(counts):
+                child._counts[i] += n
+            child._sum += total
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "buckets": list(self.bounds)}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Returns the already registered metric of that name (module reloads, repeated imports)."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in list(self._metrics.values())) + "\n"
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+
+REGISTRY = Registry()
+
+_METRIC_TYPES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(directory: str, registry: Registry = None, pid: int = None) -> None:
+    """Atomically replaces this process's snapshot file in directory."""
+    registry = registry or REGISTRY
+    pid = pid or os.getpid()
+    path = _snapshot_path(directory, pid)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def merge_snapshots(snapshots: Dict[int, Dict[str, dict]]) -> Registry:
+    """
+    Sums counters and histograms of several processes. Gauges keep one series per
+    live process (extra label pid); gauges of exited processes are dropped, while
+    their counters stay in the sums, so totals never go backwards on a worker restart.
+    """
+    merged = Registry()
+    for pid, snapshot in sorted(snapshots.items()):
+        alive = None
+        for name, data in snapshot.items():
+            cls = _METRIC_TYPES.get(data.get("type"))
+            if cls is None:
+                continue
+            is_gauge = cls is Gauge
+            if is_gauge:
+                if alive is None:
+                    alive = _pid_alive(pid)
+                if not alive:
+                    continue
+            labelnames = tuple(data["labelnames"]) + (("pid",) if is_gauge else ())
+            if cls is Histogram:
+                metric = Histogram(name, data["help"], labelnames, data["buckets"])
+            else:
+                metric = cls(name, data["help"], labelnames)
+            try:
+                metric = merged.register(metric)
+                for key, value in data["samples"]:
+                    child = metric.labels(*key, *((pid,) if is_gauge else ()))
+                    metric._merge_value(child, value)
+            except ValueError as e:
+                logger.warning(f"Skipping metric {name} of process {pid}: {e}")
+    return merged
+
+
+def read_snapshots(directory: str) -> Dict[int, Dict[str, dict]]:
+    snapshots = {}
+    for filename in os.listdir(directory):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        try:
+            pid = int(filename[len("metrics-"):-len(".json")])
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                snapshots[pid] = json.load(f)
+        except (ValueError, OSError) as e:
+            logger.warning(f"Unreadable metrics snapshot {filename}: {e}")
+    return snapshots
+
+
+def render_processes(directory: str) -> str:
+    """Metrics of every process that writes snapshots to directory (this one freshly)."""
+    write_snapshot(directory)
+    return merge_snapshots(read_snapshots(directory)).render()
+
+
+async def snapshot_loop(directory: str, interval: float = SNAPSHOT_INTERVAL) -> None:
+    """Keeps this process's snapshot fresh for scrapes answered by other workers."""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(write_snapshot, directory)
+            except OSError as e:
+                logger.warning(f"Metrics snapshot failed: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        # Последний снимок при остановке: счётчики процесса остаются в сумме
+        try:
+            write_snapshot(directory)
+        except OSError:
+            pass
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---------- общие метрики ----------
+
+CACHE_REQUESTS = counter("cache_requests_total", "In-process cache lookups.", ("cache", "result"))
+
+
+def cache_counters(cache: str):
+    """(hit, miss) children of cache_requests_total for one cache."""
+    return CACHE_REQUESTS.labels(cache, "hit"), CACHE_REQUESTS.labels(cache, "miss")
+
+
+class RequestWork:
+    """Database work done on behalf of one HTTP request (or worker job)."""
+
+    __slots__ = ("repository_calls", "queries", "query_seconds")
+
+    def __init__(self):
+        self.repository_calls = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+# CHANGED: счётчики вызовов репозиториев и SQL-запросов текущего запроса (None вне запроса)
+_request_work: ContextVar[Optional[RequestWork]] = ContextVar("mrak_request_work", default=None)
+
+REPOSITORY_DURATION = histogram(
+    "repository_call_duration_seconds", "Repository coroutine latency.", ("function",)
+)
+REPOSITORY_ERRORS = counter("repository_call_errors_total", "Repository calls that raised.", ("function",))
+
+
+@contextmanager
+def count_request_work():
+    """Counts repository calls and SQL statements made inside the block (and in tasks it spawns)."""
+    work = RequestWork()
+    token = _request_work.set(work)
+    try:
+        yield work
+    finally:
+        _request_work.reset(token)
+
+
+def current_request_work() -> Optional[RequestWork]:
+    return _request_work.get()
+
+
+def timed_repository(name: str):
+    """Decorator for repository coroutines: latency histogram, error counter, per-request call count."""
+    def decorator(fn):
+        duration = REPOSITORY_DURATION.labels(name)
+        errors = REPOSITORY_ERRORS.labels(name)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            work = _request_work.get()
+            if work is not None:
+                work.repository_calls += 1
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException:
+                errors.inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - started)
+        wrapper.__timed__ = True
+        return wrapper
+    return decorator
+
+
+def time_module(module) -> None:
+    """Wraps every public coroutine function defined in the module with timed_repository()."""
+    short = module.__name__.rsplit(".", 1)[-1]
+    for attr, fn in list(vars(module).items()):
+        if (
+            not attr.startswith("_")
+            and inspect.iscoroutinefunction(fn)
+            and getattr(fn, "__module__", None) == module.__name__
+            and not getattr(fn, "__timed__", False)
+        ):
+            setattr(module, attr, timed_repository(f"{short}.{attr}")(fn))
+
+
+# ---------- HTTP-эндпоинт для процессов без FastAPI (worker) ----------
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+        # Заголовки запроса не нужны, но их надо дочитать до пустой строки
+        while (await asyncio.wait_for(reader.readline(), timeout=5.0)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?", 1)[0] == "/metrics":
+            status, content_type, body = "200 OK", CONTENT_TYPE, render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError) as e:
+        logger.debug(f"Metrics scrape aborted: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port: int, host: str = "0.0.0.0") -> asyncio.AbstractServer:
+    """Minimal HTTP server answering GET /metrics (for the worker)."""
+    server = await asyncio.start_server(_handle_scrape, host, port)
+    logger.info(f"Metrics available on http://{host}:{port}/metrics")
+    return server
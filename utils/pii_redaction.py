@@ -0,0 +1,228 @@
+# ADDED: Multi-pattern PII redaction with streaming support
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from utils.metrics import cache_counters
+
+DEFAULT_CACHE_SIZE = 4096
+_cache_hit, _cache_miss = cache_counters("pii_redaction")
+# Левый контекст, который остаётся в буфере потока для lookbehind-проверок
+_CONTEXT_CHARS = 16
+_WHITESPACE = " \t\r\n"
+
+
+@dataclass(frozen=True)
+class RedactionRule:
+    """
+    One PII rule. `pattern` must use only non-capturing groups: all rules are
+    combined into one alternation of named groups and the match is attributed
+    by `lastgroup`. For rules whose matches may contain whitespace, `prefix_length`
+    bounds the part of a match before its last whitespace-free segment; the
+    streaming redactor holds back that many characters.
+
+    `triggers` are literal substrings of which every match contains at least one.
+    A rule takes part in the regex scan only if the text contains a trigger, and
+    substring checks run at memchr speed, unlike a per-position regex scan.
+    An empty tuple means the rule is always active.
+    """
+    name: str
+    pattern: str
+    replacement: str
+    prefix_length: int = 0
+    triggers: Tuple[str, ...] = ()
+
+
+DEFAULT_RULES: List[RedactionRule] = [
+    RedactionRule(
+        "EMAIL",
+        r"(?<![\w.+-])[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}",
+        "[EMAIL_REDACTED]",
+        triggers=("@",),
+    ),
+    RedactionRule(
+        "API_KEY",
+        r"(?:gsk_|sk-(?:proj-)?|ghp_|gho_|github_pat_|xox[abp]-)[A-Za-z0-9_-]{20,}|AKIA[0-9A-Z]{16}",
+        "[KEY_REDACTED]",
+        triggers=("gsk_", "sk-", "ghp_", "gho_", "github_pat_", "xox", "AKIA"),
+    ),
+    RedactionRule(
+        "JWT",
+        r"eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}",
+        "[TOKEN_REDACTED]",
+        triggers=("eyJ",),
+    ),
+    RedactionRule(
+        "BEARER",
+        r"(?:[Bb]earer|BEARER)[ \t]{1,4}[A-Za-z0-9._~+/-]{16,}=*",
+        "Bearer [TOKEN_REDACTED]",
+        prefix_length=10,
+        triggers=("earer", "EARER"),
+    ),
+    RedactionRule(
+        "PHONE",
+        # CHANGED: номер должен иметь структуру телефона (ведущий "+", скобки или разделители
+        # между группами): голые серии цифр — таймстемпы, ID заказов, хвосты UUID — не трогаем.
+        # Совпадение рядом с буквой/цифрой/hex, "_", "-" или "." отбрасывается.
+        r"(?<![\w+.-])(?:"
+        r"\+\d{1,3}[\s.-]?(?:\(\d{2,4}\)|\d{3})[\s.-]?\d{3}[\s.-]?\d{2}[\s.-]?\d{2}"
+        r"|(?:\d{1,3}[\s.-]?)?\(\d{3}\)[\s.-]?\d{3}[\s.-]?\d{2}[\s.-]?\d{2}"
+        r"|\d{3}[.-]\d{3}[.-]?\d{2}[.-]?\d{2}"
+        r"|\d{3} \d{3} \d{4}"
+        r")(?![\w-]|\.\d)",
+        "[PHONE_REDACTED]",
+        prefix_length=24,
+        triggers=tuple("0123456789"),
+    ),
+]
+
+
+@lru_cache(maxsize=256)
+def _compile(rules: Tuple[RedactionRule, ...]) -> "re.Pattern":
+    return re.compile("|".join(f"(?P<{rule.name}>{rule.pattern})" for rule in rules))
+
+
+class PIIRedactor:
+    """
+    Redacts PII with a single precompiled alternation of the rules (one pass per text).
+    Only rules whose triggers occur in the text are included in the alternation;
+    compiled patterns are cached per active rule subset. Redacted forms of whole messages are memoized by content hash, so re-sent
+    dialogue history costs a hash lookup instead of a regex scan.
+    """
+
+    def __init__(self, rules: Optional[Iterable[RedactionRule]] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        if not self.rules:
+            raise ValueError("PIIRedactor needs at least one rule")
+        self._replacements = {rule.name: rule.replacement for rule in self.rules}
+        self.rules = tuple(self.rules)
+        self.pattern = _compile(self.rules)
+        # Сколько символов хвоста поток обязан придержать, чтобы не разрезать совпадение с пробелами
+        self.holdback = max(rule.prefix_length for rule in self.rules)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def with_rules(self, extra: Iterable[RedactionRule]) -> "PIIRedactor":
+        return PIIRedactor(list(self.rules) + list(extra), self.cache_size)
+
+    def _replace(self, match: "re.Match") -> str:
+        return self._replacements[match.lastgroup]
+
+    def pattern_for(self, text: str) -> Optional["re.Pattern"]:
+        """Скомпилированная альтернатива только из правил, триггеры которых есть в тексте."""
+        active = tuple(
+            rule for rule in self.rules
+            if not rule.triggers or any(t in text for t in rule.triggers)
+        )
+        if not active:
+            return None
+        return self.pattern if len(active) == len(self.rules) else _compile(active)
+
+    def redact(self, text: str) -> str:
+        if not text:
+            return text
+        pattern = self.pattern_for(text)
+        if pattern is None:
+            return text
+        return pattern.sub(self._replace, text)
+
+    def redact_cached(self, text: str) -> str:
+        """redact() с LRU-кэшем по хэшу содержимого — для сообщений истории."""
+        if not text:
+            return text
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            _cache_hit.inc()
+            return cached
+        self.cache_misses += 1
+        _cache_miss.inc()
+        redacted = self.redact(text)
+        self._cache[key] = redacted
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return redacted
+
+    def redact_messages(self, messages: List[dict]) -> List[dict]:
+        result = []
+        for msg in messages:
+            filtered = msg.copy()
+            if msg.get("content"):
+                filtered["content"] = self.redact_cached(msg["content"])
+            result.append(filtered)
+        return result
+
+    def stream(self, max_buffer: int = 8192) -> "StreamRedactor":
+        return StreamRedactor(self, max_buffer)
+
+
+class StreamRedactor:
+    """
+    Incremental redaction of a chunked stream. Text is released only up to a point
+    no future chunk can turn into (part of) a match: the last whitespace-free run
+    (which may still grow into an email, key or token) is held back, plus
+    `holdback` characters before it for rules whose matches span whitespace.
+    A secret split across chunk boundaries is therefore redacted as a whole.
+    """
+
+    def __init__(self, redactor: PIIRedactor, max_buffer: int = 8192):
+        self.redactor = redactor
+        self.max_buffer = max(max_buffer, redactor.holdback * 2)
+        self._buf = ""
+        self._ctx = 0  # длина уже выданного левого контекста в начале буфера
+
+    def _safe_boundary(self) -> int:
+        buf = self._buf
+        run_start = len(buf)
+        while run_start > self._ctx and buf[run_start - 1] not in _WHITESPACE:
+            run_start -= 1
+        boundary = run_start - self.redactor.holdback
+        if boundary <= self._ctx and len(buf) - self._ctx >= self.max_buffer:
+            # Аварийный сброс: бесконечная «строка без пробелов» не должна копиться в памяти
+            boundary = len(buf) - self.redactor.holdback
+        return max(boundary, self._ctx)
+
+    def _emit(self, boundary: int) -> str:
+        buf, ctx = self._buf, self._ctx
+        out = []
+        pos = ctx
+        pattern = self.redactor.pattern_for(buf)
+        for match in (pattern.finditer(buf, ctx) if pattern else ()):
+            if match.start() >= boundary:
+                break
+            if match.end() > boundary:
+                # Совпадение пересекает границу — придерживаем его целиком
+                boundary = match.start()
+                break
+            out.append(buf[pos:match.start()])
+            out.append(self.redactor._replace(match))
+            pos = match.end()
+        if boundary <= ctx:
+            return ""
+        out.append(buf[pos:boundary])
+        keep_from = max(boundary - _CONTEXT_CHARS, 0)
+        self._buf = buf[keep_from:]
+        self._ctx = boundary - keep_from
+        return "".join(out)
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self._buf += chunk
+        return self._emit(self._safe_boundary())
+
+    def flush(self) -> str:
+        out = self._emit(len(self._buf))
+        self._buf = ""
+        self._ctx = 0
+        return out
+
+
+default_redactor = PIIRedactor()
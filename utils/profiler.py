@@ -0,0 +1,134 @@
+# ADDED: On-demand sampling profiler and asyncio task dump for live processes
+"""
+Профилировщик без зависимостей: отдельный поток каждые interval секунд снимает стеки
+всех потоков процесса (sys._current_frames) и считает одинаковые стеки. Результат —
+collapsed stacks ("frame;frame;frame count"), которые понимают flamegraph.pl,
+speedscope и inferno. Если event loop заблокирован синхронным вызовом, этот вызов
+виден на вершине стека потока MainThread.
+
+Дамп задач asyncio показывает для каждой задачи цепочку await до объекта, которого
+она ждёт.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 0.005
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    # collapsed-формат: от корня к листу, ';' разделяет кадры
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(duration: float, interval: float = DEFAULT_INTERVAL) -> Counter:
+    """Blocking: samples every thread but the calling one for duration seconds."""
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def render_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def profile(duration: float, interval: float = DEFAULT_INTERVAL) -> Counter:
+    """
+    Runs sample_stacks in its own thread (not the default executor, which may be
+    exhausted by the very calls being investigated) while the loop keeps running.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def run():
+        try:
+            result = sample_stacks(duration, interval)
+        except BaseException as e:
+            loop.call_soon_threadsafe(future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(future.set_result, result)
+
+    threading.Thread(target=run, name="mrak-profiler", daemon=True).start()
+    return await future
+
+
+def _await_chain(coro) -> Tuple[List[str], Optional[str]]:
+    """Frames of a suspended coroutine down its await chain, and what the innermost one awaits."""
+    frames = []
+    awaited = coro
+    while awaited is not None:
+        frame = getattr(awaited, "cr_frame", None) or getattr(awaited, "gi_frame", None) \
+            or getattr(awaited, "ag_frame", None)
+        nested = getattr(awaited, "cr_await", None) or getattr(awaited, "gi_yieldfrom", None) \
+            or getattr(awaited, "ag_await", None)
+        if frame is None and nested is None:
+            break
+        if frame is not None:
+            frames.append(_frame_label(frame))
+        awaited = nested
+    waiting_on = None if awaited is None or awaited is coro else repr(awaited)[:200]
+    return frames, waiting_on
+
+
+def dump_tasks(loop: Optional[asyncio.AbstractEventLoop] = None) -> List[Dict[str, Any]]:
+    """State of every pending task of the loop, the current task first."""
+    current = asyncio.current_task(loop)
+    result = []
+    for task in asyncio.all_tasks(loop):
+        coro = task.get_coro()
+        stack, waiting_on = _await_chain(coro)
+        result.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "state": "running" if task is current else "waiting",
+            "stack": stack,
+            "waiting_on": waiting_on,
+        })
+    result.sort(key=lambda t: (t["state"] != "running", t["name"]))
+    return result
+
+
+def render_tasks(tasks: List[Dict[str, Any]]) -> str:
+    lines = []
+    for task in tasks:
+        lines.append(f"{task['name']} [{task['state']}] {task['coroutine']}")
+        lines.extend(f"    {frame}" for frame in task["stack"])
+        if task["waiting_on"]:
+            lines.append(f"    awaiting {task['waiting_on']}")
+    return "\n".join(lines) + "\n"
+
+
+async def profile_to_files(directory: str, prefix: str, duration: float,
+                           interval: float = DEFAULT_INTERVAL) -> Tuple[str, str]:
+    """Profiles the process and writes <prefix>-<time>.collapsed and .tasks.txt; returns both paths."""
+    stacks = await profile(duration, interval)
+    tasks = dump_tasks()
+    base = os.path.join(directory, f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+        f.write(render_collapsed(stacks))
+    with open(f"{base}.tasks.txt", "w", encoding="utf-8") as f:
+        f.write(render_tasks(tasks))
+    return f"{base}.collapsed", f"{base}.tasks.txt"
@@ -0,0 +1,31 @@
+# ADDED: Project-wide JSON response class backed by orjson
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse as _StarletteJSONResponse
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    # orjson сам сериализует datetime, UUID, dataclass и enum; остальное — как в FastAPI
+    if isinstance(value, Decimal):
+        return float(value)
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class JSONResponse(_StarletteJSONResponse):
+    """
+    Drop-in replacement for fastapi.responses.JSONResponse. Serializes with orjson,
+    which handles datetime (ISO 8601, same as isoformat()) and UUID natively, so
+    repositories can return native types.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,174 @@
+# ADDED: Lightweight in-process tracing (request/job-scoped spans in a contextvar)
+"""
+Трасса открывается на входе (HTTP-запрос в middleware, задача в worker) и решает,
+попадает ли она в выборку (TRACE_SAMPLE_RATE, по умолчанию 0 — трассировка выключена).
+Вложенные спаны (роуты, функции репозиториев, вызовы LLM, фазы задачи) берут родителя
+из contextvar, поэтому сквозь await, asyncio.create_task и asyncio.to_thread контекст
+переносится сам. Вне выбранной трассы span() ничего не создаёт.
+
+Завершённая трасса пишется в TRACE_FILE (JSONL, по строке на спан) в полях OTLP:
+traceId, spanId, parentSpanId, name, startTimeUnixNano, endTimeUnixNano, attributes, status.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+
+class Trace:
+    __slots__ = ("trace_id", "correlation_id", "spans", "discarded")
+
+    def __init__(self, correlation_id: Optional[str]):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.correlation_id = correlation_id
+        self.spans: List["Span"] = []
+        self.discarded = False
+
+    def discard(self) -> None:
+        """Drops the trace instead of exporting it (e.g. a worker poll that found no job)."""
+        self.discarded = True
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        attributes = dict(self.attributes)
+        if self.trace.correlation_id:
+            attributes["correlation_id"] = self.trace.correlation_id
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": attributes,
+            "status": self.status,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("mrak_current_span", default=None)
+_export_lock = threading.Lock()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def export(trace: Trace) -> None:
+    lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in trace.spans if s.end_ns)
+    try:
+        with _export_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(lines)
+    except OSError as e:
+        logger.warning(f"Trace export to {TRACE_FILE} failed: {e}")
+
+
+@contextmanager
+def _run_span(trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+    span = Span(trace, name, parent_id, attributes)
+    trace.spans.append(span)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "ERROR"
+        span.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, correlation_id: Optional[str] = None, sample_rate: Optional[float] = None, **attributes):
+    """Root span; yields None when the trace is not sampled."""
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        yield None
+        return
+    trace = Trace(correlation_id)
+    try:
+        with _run_span(trace, name, None, attributes) as root:
+            yield root
+    finally:
+        if not trace.discarded:
+            export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child of the current span; yields None outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _run_span(parent.trace, name, parent.span_id, attributes) as child:
+        yield child
+
+
+def record_span(name: str, start_ns: int, **attributes) -> None:
+    """
+    Adds an already finished span (start_ns .. now) under the current span without
+    touching the contextvar — for async generators, whose body may resume in another context.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return
+    finished = Span(parent.trace, name, parent.span_id, attributes)
+    finished.start_ns = start_ns
+    finished.end_ns = time.time_ns()
+    parent.trace.spans.append(finished)
+
+
+def traced(name: str):
+    """Decorator for coroutine functions: runs each call in a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def instrument_module(module, prefix: str) -> None:
+    """Wraps every public coroutine function defined in the module with traced()."""
+    short = module.__name__.rsplit(".", 1)[-1]
+    for attr, fn in list(vars(module).items()):
+        if (
+            not attr.startswith("_")
+            and inspect.iscoroutinefunction(fn)
+            and getattr(fn, "__module__", None) == module.__name__
+            and not getattr(fn, "__traced__", False)
+        ):
+            setattr(module, attr, traced(f"{prefix}.{short}.{attr}")(fn))
@@ -2,10 +2,15 @@
 # Validation utilities for artifact generation
 
 import logging
-from typing import Any, List, Dict, Tuple
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
+
+from utils.metrics import cache_counters
 
 logger = logging.getLogger("validation")
 
+_cache_hit, _cache_miss = cache_counters("validator")
+
 class ValidationError(Exception):
     """Raised when artifact validation fails after retries."""
     pass
@@ -17,22 +22,316 @@ REQUIRED_FIELDS = {
     # Add more types as needed
 }
 
+Validator = Callable[[Any], Tuple[bool, str]]
+
+_OK = (True, "OK")
+
+# ADDED: компиляция схем artifact_types в валидаторы-замыкания
+
+_JSON_TYPES: Dict[str, Tuple[type, ...]] = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+_SCHEMA_KEYWORDS = {"type", "properties", "required", "items", "enum"}
+
+
+class SchemaCompileError(ValueError):
+    """Схема использует конструкции, которые компилятор не поддерживает."""
+
+
+def _where(path: str) -> str:
+    return path or "Content"
+
+
+def _type_check(type_names, path: str) -> Validator:
+    names = [type_names] if isinstance(type_names, str) else list(type_names)
+    unknown = [n for n in names if n not in _JSON_TYPES]
+    if unknown:
+        raise SchemaCompileError(f"Unsupported JSON type(s): {unknown}")
+    allowed = tuple(t for n in names for t in _JSON_TYPES[n])
+    # bool — подкласс int, но в JSON это разные типы
+    reject_bool = bool not in allowed
+    expected = " or ".join("list" if n == "array" else "dict" if n == "object" else n for n in names)
+
+    def check(value):
+        if isinstance(value, allowed) and not (reject_bool and isinstance(value, bool)):
+            return _OK
+        return False, f"{'Expected' if not path else _where(path) + ': expected'} {expected}, got {type(value).__name__}"
+    return check
+
+
+def _compile_node(schema: Dict[str, Any], path: str) -> Optional[Validator]:
+    """Compiles one schema node; returns None when the node imposes no constraints."""
+    if not isinstance(schema, dict):
+        raise SchemaCompileError(f"Schema at {_where(path)} is not an object")
+    checks: List[Validator] = []
+
+    if "type" in schema:
+        checks.append(_type_check(schema["type"], path))
+
+    if "enum" in schema:
+        options = list(schema["enum"])
+        hashable = all(isinstance(o, (str, int, float, bool, type(None))) for o in options)
+        option_set = frozenset(options) if hashable else None
+
+        def check_enum(value, options=options, option_set=option_set):
+            try:
+                ok = value in option_set if option_set is not None else value in options
+            except TypeError:
+                ok = False
+            return _OK if ok else (False, f"{_where(path)}: value {value!r} is not one of {options}")
+        checks.append(check_enum)
+
+    for key, op, message in (
+        ("minLength", lambda v, n: len(v) >= n, "shorter than {n}"),
+        ("maxLength", lambda v, n: len(v) <= n, "longer than {n}"),
+    ):
+        if key in schema:
+            def check_len(value, n=schema[key], op=op, message=message):
+                if isinstance(value, str) and not op(value, n):
+                    return False, f"{_where(path)}: string {message.format(n=n)}"
+                return _OK
+            checks.append(check_len)
+
+    for key, op, message in (
+        ("minimum", lambda v, n: v >= n, "less than {n}"),
+        ("maximum", lambda v, n: v <= n, "greater than {n}"),
+    ):
+        if key in schema:
+            def check_num(value, n=schema[key], op=op, message=message):
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and not op(value, n):
+                    return False, f"{_where(path)}: value {message.format(n=n)}"
+                return _OK
+            checks.append(check_num)
+
+    required = list(schema.get("required", []))
+    properties = schema.get("properties", {}) or {}
+    additional = schema.get("additionalProperties", True)
+    if required or properties or additional is False:
+        checks.append(_compile_object(required, properties, additional, path))
+
+    if "items" in schema or "minItems" in schema or "maxItems" in schema:
+        checks.append(_compile_array(schema.get("items"), schema.get("minItems"), schema.get("maxItems"), path))
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value):
+        for check in checks:
+            result = check(value)
+            if not result[0]:
+                return result
+        return _OK
+    # ADDED: валидатор элементов массива доступен для проверки ещё до конца генерации
+    for check in checks:
+        if hasattr(check, "check_item"):
+            check_all.check_item = check.check_item
+    return check_all
+
+
+def _compile_object(required: List[str], properties: Dict[str, Any], additional, path: str) -> Validator:
+    required_set = frozenset(required)
+    known = frozenset(properties)
+    prop_checks = []
+    for name, sub in properties.items():
+        check = _compile_node(sub, f"{path}.{name}" if path else name)
+        if check is not None:
+            prop_checks.append((name, check))
+    prefix = f"{path} " if path else ""
+
+    def check_object(value):
+        if not isinstance(value, dict):
+            return _OK  # тип проверяет отдельный type-валидатор
+        keys = value.keys()
+        # Быстрый путь: проверка множеств целиком выполняется в C
+        if not required_set <= keys:
+            for field in required:
+                if field not in value:
+                    return False, f"{prefix}missing required field '{field}'".strip()
+        for name, check in prop_checks:
+            if name in value:
+                result = check(value[name])
+                if not result[0]:
+                    return result
+        if additional is False and not keys <= known:
+            extra = sorted(k for k in keys if k not in known)
+            return False, f"{prefix}has unexpected field(s) {extra}".strip()
+        return _OK
+    return check_object
+
+
+def _compile_array(items: Optional[Dict[str, Any]], min_items, max_items, path: str) -> Validator:
+    item_check = _compile_node(items, f"{path}[]") if items is not None else None
+    item_is_dict = isinstance(items, dict) and items.get("type") == "object"
+    # Быстрый путь для типичного пакета «список объектов с обязательными полями»:
+    # весь список проверяется одним генератором, пообъектный разбор — только при ошибке
+    fast_required = None
+    if item_is_dict and set(items) <= {"type", "required", "properties"} and \
+            all(_compile_node(sub, "") is None for sub in (items.get("properties") or {}).values()):
+        fast_required = frozenset(items.get("required", []))
+    # Для верхнего уровня сохраняем привычные сообщения «Item N ...»
+    top_level = not path
+
+    def check_item(item, i):
+        """Проверяет один элемент массива (используется и при потоковом разборе)."""
+        if item_is_dict and top_level and not isinstance(item, dict):
+            return False, f"Item {i} is not a dict"
+        result = item_check(item)
+        if not result[0]:
+            label = f"Item {i}" if top_level else f"{path}[{i}]"
+            return False, _relabel(result[1], f"{path}[]", label)
+        return _OK
+
+    def check_array(value):
+        if not isinstance(value, list):
+            return _OK
+        n = len(value)
+        if min_items is not None and n < min_items:
+            return False, f"{_where(path)}: expected at least {min_items} items, got {n}"
+        if max_items is not None and n > max_items:
+            return False, f"{_where(path)}: expected at most {max_items} items, got {n}"
+        if item_check is None:
+            return _OK
+        if fast_required is not None and all(
+            type(item) is dict and fast_required <= item.keys() for item in value
+        ):
+            return _OK
+        for i, item in enumerate(value):
+            result = check_item(item, i)
+            if not result[0]:
+                return result
+        return _OK
+
+    if item_check is not None:
+        check_array.check_item = check_item
+    return check_array
+
+
+def _relabel(message: str, placeholder: str, label: str) -> str:
+    if message.startswith(placeholder):
+        return label + message[len(placeholder):]
+    if message.startswith("missing") or message.startswith("has unexpected"):
+        return f"{label} {message}"
+    return message
+
+
+def looks_like_json_schema(schema: Any) -> bool:
+    return isinstance(schema, dict) and bool(_SCHEMA_KEYWORDS & schema.keys())
+
+
+def compile_schema(schema: Any) -> Optional[Validator]:
+    """
+    Compiles the supported JSON Schema subset (type, enum, properties, required,
+    additionalProperties, items, min/maxItems, min/maxLength, minimum/maximum)
+    into a validator closure. Returns None for schemas that are not JSON Schema.
+    """
+    if not looks_like_json_schema(schema):
+        return None
+    check = _compile_node(schema, "")
+    return check or (lambda value: _OK)
+
+
+def item_validator(validator: Optional[Validator]) -> Optional[Callable[[Any, int], Tuple[bool, str]]]:
+    """Валидатор отдельного элемента для схем вида «массив элементов», иначе None."""
+    return getattr(validator, "check_item", None)
+
+
+def compile_required_fields(required: List[str]) -> Validator:
+    """Валидатор «список объектов с обязательными полями» (формат REQUIRED_FIELDS)."""
+    return compile_schema({
+        "type": "array",
+        "items": {"type": "object", "required": list(required)},
+    })
+
+
+_REQUIRED_FIELD_VALIDATORS: Dict[str, Validator] = {
+    artifact_type: compile_required_fields(fields) for artifact_type, fields in REQUIRED_FIELDS.items()
+}
+
+
 def validate_json_output(content: Any, artifact_type: str) -> Tuple[bool, str]:
     """
     Проверяет, что content соответствует ожидаемой структуре для artifact_type.
     Возвращает (True, "OK") если валидно, иначе (False, сообщение об ошибке).
     """
-    required = REQUIRED_FIELDS.get(artifact_type)
-    if not required:
+    validator = _REQUIRED_FIELD_VALIDATORS.get(artifact_type)
+    if validator is None:
         return True, "OK"  # no validation rules for this type
+    return validator(content)
 
-    if not isinstance(content, list):
-        return False, f"Expected list, got {type(content).__name__}"
 
-    for i, item in enumerate(content):
-        if not isinstance(item, dict):
-            return False, f"Item {i} is not a dict"
-        for field in required:
-            if field not in item:
-                return False, f"Item {i} missing required field '{field}'"
-    return True, "OK"
+async def _load_artifact_type(artifact_type: str) -> Optional[Dict[str, Any]]:
+    from repositories.artifact_type_repository import get_artifact_type
+    return await get_artifact_type(artifact_type)
+
+
+class ValidatorRegistry:
+    """
+    Кэш скомпилированных валидаторов по типам артефактов.
+
+    Схема берётся из artifact_types.schema и компилируется один раз; если схемы нет
+    или она не в формате JSON Schema, используется REQUIRED_FIELDS. Записи сбрасываются
+    через invalidate() при изменении типа, а ttl ограничивает устаревание в других
+    процессах (воркер).
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]] = _load_artifact_type,
+        ttl: Optional[float] = 60.0,
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[Optional[Validator], float]] = {}
+
+    async def get(self, artifact_type: str) -> Optional[Validator]:
+        """Возвращает валидатор типа или None, если для типа нет правил."""
+        entry = self._cache.get(artifact_type)
+        if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+            _cache_hit.inc()
+            return entry[0]
+        _cache_miss.inc()
+        validator = await self._build(artifact_type)
+        self._cache[artifact_type] = (validator, time.monotonic())
+        return validator
+
+    async def _build(self, artifact_type: str) -> Optional[Validator]:
+        try:
+            row = await self._loader(artifact_type)
+        except Exception as e:
+            logger.warning(f"Could not load schema for {artifact_type}, using built-in rules: {e}")
+            return _REQUIRED_FIELD_VALIDATORS.get(artifact_type)
+        schema = row.get("schema") if row else None
+        try:
+            validator = compile_schema(schema)
+        except SchemaCompileError as e:
+            logger.warning(f"Schema of artifact type {artifact_type} is not supported: {e}")
+            validator = None
+        if validator is None:
+            validator = _REQUIRED_FIELD_VALIDATORS.get(artifact_type)
+        return validator
+
+    async def validate(self, content: Any, artifact_type: str) -> Tuple[bool, str]:
+        validator = await self.get(artifact_type)
+        if validator is None:
+            return True, "OK"
+        return validator(content)
+
+    def invalidate(self, artifact_type: Optional[str] = None) -> None:
+        if artifact_type is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(artifact_type, None)
+
+
+# ADDED: тема уведомления о смене схемы типа артефакта (сброс кэша валидаторов в других процессах)
+INVALIDATION_TOPIC = "artifact_type"
+
+validator_registry = ValidatorRegistry()
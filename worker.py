@@ -3,21 +3,45 @@ import os
 import socket
 import logging
 import signal  # ADDED for graceful shutdown
-from dotenv import load_dotenv
+import time
 
-from repositories.base import get_connection, transaction
+from utils.env import load_env
+from repositories.base import close_pool, get_connection, init_pool, transaction
 from repositories import node_execution_repository, execution_queue_repository, artifact_repository, workflow_repository
 from artifact_service import ArtifactService
+from validation import validator_registry
 from groq_client import GroqClient
+from prompt_loader import PromptLoader
+from utils.metrics import counter, gauge, histogram, start_metrics_server
+from utils.profiler import profile_to_files
+from utils import loop_watchdog
+from utils.tracing import span, start_trace
 
-load_dotenv()
+load_env()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("worker")
 
 WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
 
+# CHANGED: GroqClient создаёт SDK-клиент лениво — импорт worker не загружает groq и httpx
 groq_client = GroqClient()
-artifact_service = ArtifactService(groq_client)
+artifact_service = ArtifactService(groq_client, validator_registry=validator_registry)
+
+# ADDED: метрики worker; отдаются на WORKER_METRICS_PORT (0 — не поднимать порт)
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))
+QUEUE_SAMPLE_INTERVAL = 15.0
+QUEUE_STATUSES = ("PENDING", "PROCESSING", "DONE", "FAILED")
+
+QUEUE_JOBS = gauge("worker_queue_jobs", "Jobs in execution_queue by status.", ("status",))
+CLAIM_DURATION = histogram("worker_claim_duration_seconds", "Claim transaction latency.", ("result",))
+JOB_DURATION = histogram("worker_job_duration_seconds", "Job processing time including completion.", ("outcome",))
+JOBS = counter("worker_jobs_total", "Processed jobs.", ("outcome",))
+JOB_RETRIES = counter("worker_job_retries_total", "Failed jobs re-enqueued for another attempt.")
+
+# ADDED: kill -USR1 <pid> снимает профиль на PROFILE_SECONDS секунд и пишет его в PROFILE_DIR
+PROFILE_SECONDS = float(os.getenv("WORKER_PROFILE_SECONDS", "10"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/mrak-profiles")
+_profile_task = None
 
 # ADDED for graceful shutdown
 shutdown_event = asyncio.Event()
@@ -27,16 +51,35 @@ def handle_sigterm():
     logger.info("Received SIGTERM/SIGINT, shutting down gracefully...")
     shutdown_event.set()
 
+async def _write_profile():
+    logger.info(f"Profiling worker for {PROFILE_SECONDS:g} s")
+    try:
+        collapsed, tasks = await profile_to_files(PROFILE_DIR, f"worker-{os.getpid()}", PROFILE_SECONDS)
+        logger.info(f"Profile written: {collapsed} (flamegraph input), {tasks} (asyncio tasks)")
+    except Exception as e:
+        logger.error(f"Profiling failed: {e}")
+
+
+def handle_sigusr1():
+    """Запускает профилирование, если оно ещё не идёт."""
+    global _profile_task
+    if _profile_task is not None and not _profile_task.done():
+        logger.info("Profile already running, SIGUSR1 ignored")
+        return
+    _profile_task = asyncio.create_task(_write_profile())
+
 async def perform_node_processing(node_exec: dict) -> str:
     """Выполняет логику узла: вызывает LLM, сохраняет артефакт, возвращает artifact_id."""
     node_id = node_exec['node_definition_id']
-    node = await workflow_repository.get_workflow_node_by_id(node_id)
-    if not node:
-        raise RuntimeError(f"Node {node_id} not found")
+    with span("job.load"):
+        node = await workflow_repository.get_workflow_node_by_id(node_id)
+        if not node:
+            raise RuntimeError(f"Node {node_id} not found")
 
     node_config = node.get('config', {})
     system_prompt = node_config.get('system_prompt')
     if system_prompt is None:
+        system_prompt = f"You are generating a {node.get('node_id')}."
     generation_config = {
         'system_prompt': system_prompt,
         'user_prompt_template': node_config.get('user_prompt_template'),
@@ -44,16 +87,19 @@ async def perform_node_processing(node_exec: dict) -> str:
     }
     artifact_type = node.get('node_id')
     input_artifact_ids = node_exec.get('input_artifact_ids') or []
-    input_artifacts = await artifact_repository.get_artifacts_by_ids(input_artifact_ids)
-
-    artifact_id = await artifact_service.generate_artifact(
-        artifact_type=artifact_type,
-        input_artifacts=input_artifacts,
-        user_input="",
-        model_id=None,
-        project_id=node_exec['project_id'],
-        generation_config=generation_config
-    )
+    with span("job.load", artifacts=len(input_artifact_ids)):
+        input_artifacts = await artifact_repository.get_artifacts_by_ids(input_artifact_ids)
+
+    # Внутри — спаны artifact.llm и artifact.save
+    with span("job.generate", artifact_type=artifact_type):
+        artifact_id = await artifact_service.generate_artifact(
+            artifact_type=artifact_type,
+            input_artifacts=input_artifacts,
+            user_input="",
+            model_id=None,
+            project_id=node_exec['project_id'],
+            generation_config=generation_config
+        )
     return artifact_id
 
 
@@ -61,59 +107,79 @@ async def worker_loop():
     """Основной цикл обработки задач."""
     while not shutdown_event.is_set():  # ADDED shutdown check
         try:
-            async with transaction() as tx:
-                job = await execution_queue_repository.claim_job(WORKER_ID, tx=tx)
-                if not job:
-                    # Ожидание с проверкой события
-                    await asyncio.sleep(0.5)
-                    continue
-
-                node_exec_id = job['node_execution_id']
-                # Блокируем и при необходимости обновляем статус выполнения
-                node_exec = await tx.conn.fetchrow(
-                    "SELECT * FROM node_executions WHERE id = $1 FOR UPDATE", node_exec_id
-                )
-                if not node_exec:
-                    await execution_queue_repository.complete_job(job['id'], success=False, tx=tx)
-                    continue
-
-                if node_exec['status'] != 'PROCESSING':
-                    await node_execution_repository.update_node_execution_status(
-                        node_exec_id, 'PROCESSING', tx=tx
-                    )
-
-                node_exec_dict = node_execution_repository._row_to_dict(node_exec)
-
-            # Вне транзакции выполняем долгую операцию
-            try:
-                artifact_id = await perform_node_processing(node_exec_dict)
-                # Успех
-                async with transaction() as tx:
-                    await node_execution_repository.update_node_execution_status(
-                        node_exec_id, "COMPLETED", output_artifact_id=artifact_id, tx=tx
-                    )
-                    await execution_queue_repository.complete_job(job['id'], success=True, tx=tx)
-                logger.info(f"Job {job['id']} completed, artifact {artifact_id}")
-            except Exception as e:
-                logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
-                async with transaction() as tx:
-                    await node_execution_repository.update_node_execution_status(
-                        node_exec_id, "FAILED", tx=tx
-                    )
-                    # Проверяем возможность повторной попытки
-                    node_exec = await tx.conn.fetchrow(
-                        "SELECT * FROM node_executions WHERE id = $1 FOR UPDATE", node_exec_id
-                    )
-                    if node_exec['attempt'] < node_exec['max_attempts']:
-                        new_exec_id = await node_execution_repository.create_retry_attempt(
-                            node_execution_repository._row_to_dict(node_exec), tx=tx
+            # ADDED: трасса задачи с фазами claim / load / generate (llm, save) / complete
+            with start_trace("worker.job", worker_id=WORKER_ID) as root:
+                claim_started = time.perf_counter()
+                with span("job.claim"):
+                    async with transaction() as tx:
+                        job = await execution_queue_repository.claim_job(WORKER_ID, tx=tx)
+                        CLAIM_DURATION.labels("job" if job else "empty").observe(time.perf_counter() - claim_started)
+                        if not job:
+                            if root is not None:
+                                root.trace.discard()
+                            # Ожидание с проверкой события
+                            await asyncio.sleep(0.5)
+                            continue
+
+                        node_exec_id = job['node_execution_id']
+                        if root is not None:
+                            root.set(job_id=str(job['id']), node_execution_id=str(node_exec_id))
+                        # Блокируем и при необходимости обновляем статус выполнения
+                        node_exec = await tx.conn.fetchrow(
+                            "SELECT * FROM node_executions WHERE id = $1 FOR UPDATE", node_exec_id
                         )
-                        await execution_queue_repository.enqueue(new_exec_id, tx=tx)
-                        # Текущую задачу помечаем как DONE (она выполнила свою работу)
-                        await execution_queue_repository.complete_job(job['id'], success=True, tx=tx)
-                    else:
-                        # Попытки исчерпаны – задача окончательно FAILED
-                        await execution_queue_repository.complete_job(job['id'], success=False, tx=tx)
+                        if not node_exec:
+                            await execution_queue_repository.complete_job(job['id'], success=False, tx=tx)
+                            continue
+
+                        if node_exec['status'] != 'PROCESSING':
+                            await node_execution_repository.update_node_execution_status(
+                                node_exec_id, 'PROCESSING', tx=tx
+                            )
+
+                        node_exec_dict = node_execution_repository._row_to_dict(node_exec)
+
+                # Вне транзакции выполняем долгую операцию
+                job_started = time.perf_counter()
+                try:
+                    artifact_id = await perform_node_processing(node_exec_dict)
+                    # Успех
+                    with span("job.complete", status="COMPLETED"):
+                        async with transaction() as tx:
+                            await node_execution_repository.update_node_execution_status(
+                                node_exec_id, "COMPLETED", output_artifact_id=artifact_id, tx=tx
+                            )
+                            await execution_queue_repository.complete_job(job['id'], success=True, tx=tx)
+                    JOBS.labels("completed").inc()
+                    JOB_DURATION.labels("completed").observe(time.perf_counter() - job_started)
+                    logger.info(f"Job {job['id']} completed, artifact {artifact_id}")
+                except Exception as e:
+                    logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
+                    with span("job.complete", status="FAILED"):
+                        async with transaction() as tx:
+                            await node_execution_repository.update_node_execution_status(
+                                node_exec_id, "FAILED", tx=tx
+                            )
+                            # Проверяем возможность повторной попытки
+                            node_exec = await tx.conn.fetchrow(
+                                "SELECT * FROM node_executions WHERE id = $1 FOR UPDATE", node_exec_id
+                            )
+                            if node_exec['attempt'] < node_exec['max_attempts']:
+                                new_exec_id = await node_execution_repository.create_retry_attempt(
+                                    node_execution_repository._row_to_dict(node_exec), tx=tx
+                                )
+                                await execution_queue_repository.enqueue(new_exec_id, tx=tx)
+                                # Текущую задачу помечаем как DONE (она выполнила свою работу)
+                                await execution_queue_repository.complete_job(job['id'], success=True, tx=tx)
+                                outcome = "retried"
+                            else:
+                                # Попытки исчерпаны – задача окончательно FAILED
+                                await execution_queue_repository.complete_job(job['id'], success=False, tx=tx)
+                                outcome = "failed"
+                    JOBS.labels(outcome).inc()
+                    JOB_DURATION.labels(outcome).observe(time.perf_counter() - job_started)
+                    if outcome == "retried":
+                        JOB_RETRIES.inc()
         except Exception as e:
             logger.error(f"Worker loop error: {e}", exc_info=True)
             # Короткая пауза перед следующей попыткой
@@ -138,15 +204,51 @@ async def recovery_loop():
             logger.error(f"Recovery error: {e}")
 
 
+async def queue_metrics_loop():
+    """Периодически обновляет глубину очереди по статусам."""
+    while not shutdown_event.is_set():
+        try:
+            counts = await execution_queue_repository.count_jobs_by_status()
+            for status in {*QUEUE_STATUSES, *counts}:
+                QUEUE_JOBS.labels(status).set(counts.get(status, 0))
+        except Exception as e:
+            logger.warning(f"Queue metrics update failed: {e}")
+        await asyncio.sleep(QUEUE_SAMPLE_INTERVAL)
+
+
 async def main():
     """Главная функция: настраивает сигналы и запускает циклы."""
     loop = asyncio.get_running_loop()
     # ADDED signal handlers
     for sig in (signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(sig, handle_sigterm)
+    loop.add_signal_handler(signal.SIGUSR1, handle_sigusr1)
+    # ADDED: LOOP_WATCHDOG=true — лог и метрика, когда что-то блокирует event loop
+    watchdog = loop_watchdog.start_from_env()
+
+    # ADDED: пул соединений и клиент LLM готовятся до первой задачи
+    try:
+        await init_pool()
+    except Exception as e:
+        logger.error(f"Database pool unavailable, using direct connections: {e}")
+    try:
+        await asyncio.to_thread(groq_client.warm_up)
+    except Exception as e:
+        logger.error(f"LLM client warm-up failed: {e}")
+    # ADDED: тот же реестр промптов и наблюдатель, что и в API, — правки prompts/ доходят до worker без рестарта
+    prompt_registry = PromptLoader(gh_token=os.getenv("GITHUB_TOKEN")).registry
+    prompt_registry.start_watching()
+
+    metrics_server = None
+    if METRICS_PORT:
+        try:
+            metrics_server = await start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            logger.error(f"Metrics port {METRICS_PORT} unavailable: {e}")
 
     worker_task = asyncio.create_task(worker_loop())
     recovery_task = asyncio.create_task(recovery_loop())
+    queue_metrics_task = asyncio.create_task(queue_metrics_loop())
 
     # Ожидаем сигнала завершения
     await shutdown_event.wait()
@@ -154,7 +256,15 @@ async def main():
     # Отменяем задачи и ждём их завершения
     worker_task.cancel()
     recovery_task.cancel()
-    await asyncio.gather(worker_task, recovery_task, return_exceptions=True)
+    queue_metrics_task.cancel()
+    await asyncio.gather(worker_task, recovery_task, queue_metrics_task, return_exceptions=True)
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    await prompt_registry.stop_watching()
+    await close_pool()
+    if watchdog is not None:
+        await watchdog.stop()
     logger.info("Shutdown complete")
 
 if __name__ == "__main__":